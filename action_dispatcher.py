@@ -0,0 +1,158 @@
+'''   background action dispatcher - keeps pyautogui / adb calls off the frame loop  '''
+
+import collections         # for the pending queue
+import threading           # for worker thread
+import time                # for pauses and timing
+from metrics import metrics  # action latency
+
+''' config '''
+
+MAX_PENDING = 32            # bounded queue - vision never waits on the output side
+
+
+class Action:
+    ''' one queued call (eg. pyautogui.click or adb swipe) '''
+
+    __slots__ = ("func", "args", "kwargs", "key", "pause", "queued_at", "origin")
+
+    def __init__(self, func, args, kwargs, key, pause, origin):
+        self.func = func                    # function to call on worker thread
+        self.args = args
+        self.kwargs = kwargs
+        self.key = key                      # coalesce key - newer action with same key replaces a pending one
+        self.pause = pause                  # seconds to wait after the call (eg. after click)
+        self.queued_at = time.perf_counter()
+        self.origin = origin or self.queued_at   # perf_counter of the frame / utterance that caused it
+
+
+class ActionDispatcher:
+    ''' runs actions on one worker thread from a bounded queue.
+    pointer moves are coalesced so only the newest position is sent,
+    clicks and swipes keep their order and are never merged '''
+
+    def __init__(self, max_pending=MAX_PENDING, name="actions", user_actions=True):
+        self.max_pending = max_pending
+        self.name = name
+        self.user_actions = user_actions    # actions reach the desktop / phone (time to first action)
+        self.pending = collections.deque()
+        self.cond = threading.Condition()
+        self.running = False
+        self.thread = None
+        self.busy = False                   # worker is running an action
+
+        # counters
+        self.submitted = 0
+        self.executed = 0
+        self.coalesced = 0                  # moves replaced by a newer move
+        self.dropped = 0                    # actions thrown away because queue was full
+        self.errors = 0
+        self.max_depth = 0
+
+    def start(self):
+        ''' start the worker thread '''
+        if self.running:
+            return self
+        self.running = True
+        self.thread = threading.Thread(target=self._worker, name=self.name, daemon=True)
+        self.thread.start()
+        return self
+
+    def submit(self, func, *args, key=None, pause=0.0, origin=None, **kwargs):
+        ''' queue an action, never blocks. returns False if it had to be dropped.
+        origin - perf_counter when the gesture was seen, for gesture -> action latency '''
+        action = Action(func, args, kwargs, key, pause, origin)
+        with self.cond:
+            self.submitted += 1
+            if key is not None and self.pending and self.pending[-1].key == key:
+                self.pending[-1] = action                # newest position wins
+                self.coalesced += 1
+                return True
+            if len(self.pending) >= self.max_pending and not self._drop_stale():
+                self.dropped += 1                        # nothing stale to drop - drop the new one
+                metrics.count(f"actions.dropped.{self.name}")
+                return False
+            self.pending.append(action)
+            self.max_depth = max(self.max_depth, len(self.pending))
+            metrics.gauge(f"queue.{self.name}", len(self.pending))
+            self.cond.notify()
+        return True
+
+    def move(self, func, *args, **kwargs):
+        ''' queue a pointer move - only the newest pending move is kept '''
+        return self.submit(func, *args, key="move", **kwargs)
+
+    def _drop_stale(self):
+        ''' make room by dropping the oldest coalescable action (a stale move) '''
+        for i, action in enumerate(self.pending):
+            if action.key is not None:
+                del self.pending[i]
+                self.dropped += 1
+                metrics.count(f"actions.dropped.{self.name}")
+                return True
+        return False
+
+    def _worker(self):
+        ''' worker loop - run actions in order '''
+        while True:
+            with self.cond:
+                while self.running and not self.pending:
+                    self.cond.wait()
+                if not self.pending:                     # stopped and drained
+                    return
+                action = self.pending.popleft()
+                self.busy = True
+            try:
+                with metrics.timer(f"action.{self.name}"):
+                    action.func(*action.args, **action.kwargs)
+                metrics.observe(f"gesture_to_action.{self.name}", time.perf_counter() - action.origin)
+                if self.user_actions:
+                    metrics.action_done(self.name)
+                if action.pause:
+                    time.sleep(action.pause)
+            except Exception as e:
+                self.errors += 1
+                metrics.error(f"{self.name} dispatcher", e)
+            finally:
+                with self.cond:
+                    self.busy = False
+                    self.executed += 1
+                    self.cond.notify_all()
+
+    def wait_idle(self, timeout=None):
+        ''' block until every queued action has run (for tests / shutdown) '''
+        deadline = None if timeout is None else time.perf_counter() + timeout
+        with self.cond:
+            while self.pending or self.busy:
+                remaining = None if deadline is None else deadline - time.perf_counter()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self.cond.wait(remaining)
+        return True
+
+    def stop(self, drain=True, timeout=1.0):
+        ''' stop worker, by default after running what is still queued '''
+        with self.cond:
+            if not drain:
+                self.dropped += len(self.pending)
+                self.pending.clear()
+            self.running = False
+            self.cond.notify_all()
+        if self.thread is not None:
+            self.thread.join(timeout=timeout)
+
+    @property
+    def depth(self):
+        return len(self.pending)
+
+    def stats(self):
+        ''' queue depth and counters '''
+        with self.cond:
+            return {
+                "depth": len(self.pending),
+                "max_depth": self.max_depth,
+                "submitted": self.submitted,
+                "executed": self.executed,
+                "coalesced": self.coalesced,
+                "dropped": self.dropped,
+                "errors": self.errors,
+            }
@@ -0,0 +1,287 @@
+'''   shared ADB transport - one long lived "adb shell" per device  '''
+
+import os                  # for environment config
+import queue               # for passing output lines from reader thread
+import shlex               # for splitting the ADB command from env
+import subprocess          # for running the adb process
+import sys                 # for benchmark entry point
+import threading           # for reader thread and locking
+import time                # for timeouts and measurement
+import itertools           # for unique sentinel ids
+from metrics import metrics  # adb command latency
+
+''' config '''
+
+DEFAULT_TIMEOUT = 3.0           # seconds to wait for one command (same as the old subprocess.run timeout)
+MAX_RETRIES = 1                 # reconnect and retry this many times when the shell dies
+SENTINEL = "__RC_DONE__"        # marker echoed after every command so we know where its output ends
+
+
+def adb_base_command():
+    ''' adb executable as a list - can be overridden with ADB env variable
+    eg. ADB="python fake_adb.py" to run everything without a phone '''
+    return shlex.split(os.environ.get("ADB", "adb"))
+
+
+def adb_command(*args, serial=None, adb=None):
+    ''' build full adb command list, with "-s serial" when a device is chosen '''
+    command = list(adb or adb_base_command())
+    if serial:
+        command += ["-s", serial]
+    return command + list(args)
+
+
+def strip_adb_prefix(command):
+    ''' turn old style ["adb", "shell", "input", ...] lists into a shell line "input ..." '''
+    if isinstance(command, str):
+        return command
+    parts = list(command)
+    if parts and parts[0] == "adb":
+        parts = parts[1:]
+    if parts and parts[0] == "shell":
+        parts = parts[1:]
+    return " ".join(shlex.quote(p) for p in parts)
+
+
+def split_commands(line):
+    ''' "a; b 'c;d'" -> ["a", "b 'c;d'"] - splits on ; outside quotes like the device shell, keeps quoting as is '''
+    commands = []
+    current = []
+    quote = None                    # ' or " we are inside of
+    escaped = False
+    for char in line:
+        if escaped:
+            escaped = False
+        elif char == "\\" and quote != "'":
+            escaped = True
+        elif quote:
+            if char == quote:
+                quote = None
+        elif char in "'\"":
+            quote = char
+        elif char == ";":
+            commands.append("".join(current).strip())
+            current = []
+            continue
+        current.append(char)
+    commands.append("".join(current).strip())
+    return [c for c in commands if c]
+
+
+def list_devices(adb=None, timeout=DEFAULT_TIMEOUT):
+    ''' parse "adb devices" - [(serial, state)], state is "device" when ready
+    (others: offline, unauthorized, ...) '''
+    result = subprocess.run(adb_command("devices", adb=adb), capture_output=True, text=True, timeout=timeout)
+    devices = []
+    for line in result.stdout.splitlines():
+        parts = line.split()
+        if len(parts) < 2 or line.startswith(("*", "List of")):   # daemon messages and header
+            continue
+        devices.append((parts[0], parts[1]))
+    return devices
+
+
+def ready_devices(adb=None, timeout=DEFAULT_TIMEOUT):
+    ''' serials of devices that accept commands '''
+    return [serial for serial, state in list_devices(adb, timeout) if state == "device"]
+
+
+class AdbError(Exception):
+    ''' raised when the shell could not run a command (timeout, dead process, ...) '''
+
+
+class AdbTimeout(AdbError):
+    ''' command did not finish in time - never retried, it may already have run on the phone '''
+
+
+class AdbResult:
+    ''' output of one shell command '''
+
+    def __init__(self, command, returncode, output, elapsed):
+        self.command = command          # shell line that was sent
+        self.returncode = returncode    # exit status reported by the device shell
+        self.output = output            # stdout + stderr text
+        self.elapsed = elapsed          # seconds from write to sentinel
+
+    @property
+    def ok(self):
+        return self.returncode == 0
+
+    def __repr__(self):
+        return f"AdbResult({self.command!r}, rc={self.returncode}, {self.elapsed*1000:.1f}ms)"
+
+
+class AdbShell:
+    ''' keeps one "adb shell" process open and writes commands into its stdin.
+    every command is followed by "echo SENTINEL id $?" so the reply (and exit code)
+    can be matched to the command without waiting for the process to exit '''
+
+    def __init__(self, serial=None, adb=None, timeout=DEFAULT_TIMEOUT):
+        self.serial = serial                  # device serial (None = default device)
+        self.adb = adb                        # adb command list (None = from ADB env)
+        self.timeout = timeout                # default per-command timeout
+        self.process = None                   # running adb shell process
+        self.lines = None                     # queue filled by reader thread
+        self.reader = None                    # reader thread
+        self.lock = threading.Lock()          # one command at a time on the pipe
+        self.ids = itertools.count(1)         # sentinel ids
+        self.connects = 0                     # how many times the process was started
+
+    def connect(self):
+        ''' start the shell process (called on first command and after failures) '''
+        self.close()
+        self.process = subprocess.Popen(adb_command("shell", serial=self.serial, adb=self.adb),
+                                        stdin=subprocess.PIPE,
+                                        stdout=subprocess.PIPE,
+                                        stderr=subprocess.STDOUT,
+                                        text=True,
+                                        bufsize=1)                   # line buffered
+        self.lines = queue.Queue()
+        self.reader = threading.Thread(target=self._read_output,
+                                       args=(self.process, self.lines),
+                                       daemon=True)
+        self.reader.start()
+        self.connects += 1
+        metrics.count("adb.connects")
+
+    @property
+    def restarts(self):
+        ''' how many times we had to reconnect '''
+        return max(self.connects - 1, 0)
+
+    def _read_output(self, process, lines):
+        ''' reader thread - push every output line, None when the process ends '''
+        for line in process.stdout:
+            lines.put(line.rstrip("\n"))
+        lines.put(None)
+
+    @property
+    def alive(self):
+        return self.process is not None and self.process.poll() is None
+
+    def run(self, command, timeout=None):
+        ''' run one shell line and return AdbResult, reconnecting if the shell died '''
+        command = strip_adb_prefix(command)
+        timeout = self.timeout if timeout is None else timeout
+        with self.lock:
+            for attempt in range(MAX_RETRIES + 1):
+                try:
+                    if not self.alive:
+                        self.connect()
+                    return self._send(command, timeout)
+                except AdbTimeout:
+                    self.close()                              # unknown state - start fresh next time
+                    metrics.count("adb.timeouts")
+                    raise
+                except (AdbError, OSError) as e:
+                    self.close()
+                    if attempt == MAX_RETRIES:
+                        raise AdbError(f"{command}: {e}") from e
+
+    def _send(self, command, timeout):
+        ''' write command + sentinel and collect lines until the sentinel comes back '''
+        token = f"{SENTINEL}{next(self.ids)}"
+        start = time.perf_counter()
+        self.process.stdin.write(f"{command}\necho {token} $?\n")
+        self.process.stdin.flush()
+
+        deadline = start + timeout
+        output = []
+        while True:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                raise AdbTimeout(f"timed out after {timeout}s")
+            try:
+                line = self.lines.get(timeout=remaining)
+            except queue.Empty:
+                raise AdbTimeout(f"timed out after {timeout}s")
+            if line is None:
+                raise AdbError("adb shell exited")
+            if line == token or line.startswith(token + " "):
+                returncode = int(line[len(token):].strip() or 0)
+                elapsed = time.perf_counter() - start
+                metrics.observe("adb", elapsed)
+                return AdbResult(command, returncode, "\n".join(output), elapsed)
+            if line.startswith(SENTINEL):
+                continue                                       # late reply of a timed out command
+            output.append(line)
+
+    def close(self):
+        ''' stop the shell process '''
+        process, self.process = self.process, None
+        if process is None:
+            return
+        try:
+            if process.poll() is None:
+                process.stdin.write("exit\n")
+                process.stdin.flush()
+                process.wait(timeout=0.5)
+        except Exception:
+            pass
+        if process.poll() is None:
+            process.kill()
+            process.wait()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+''' one shared shell per device for the whole program '''
+
+_shells = {}
+_shells_lock = threading.Lock()
+
+
+def get_shell(serial=None):
+    ''' return (and create once) the shared AdbShell for a device '''
+    with _shells_lock:
+        if serial not in _shells:
+            _shells[serial] = AdbShell(serial)
+        return _shells[serial]
+
+
+def shell(command, serial=None, timeout=None):
+    ''' run a command on the shared shell, print result like the old run_adb did '''
+    try:
+        result = get_shell(serial).run(command, timeout)
+    except AdbError as e:
+        metrics.error("adb", e)
+        return None
+    if not result.ok:
+        print(f"Command failed: {result.output.strip()}")
+    return result
+
+
+def close_all():
+    ''' close every shared shell '''
+    with _shells_lock:
+        for s in _shells.values():
+            s.close()
+        _shells.clear()
+
+
+def benchmark(count=50, command="input swipe 500 500 500 1500"):
+    ''' compare one subprocess per command against the persistent shell '''
+    start = time.perf_counter()
+    for _ in range(count):
+        subprocess.run(adb_command("shell", *shlex.split(command)), capture_output=True, timeout=DEFAULT_TIMEOUT)
+    per_process = (time.perf_counter() - start) / count
+
+    with AdbShell() as s:
+        s.run("true")                                   # connect before timing
+        start = time.perf_counter()
+        for _ in range(count):
+            s.run(command)
+        persistent = (time.perf_counter() - start) / count
+
+    print(f"subprocess per command : {per_process*1000:.2f} ms")
+    print(f"persistent shell       : {persistent*1000:.2f} ms")
+    print(f"speedup                : {per_process/persistent:.1f}x")
+
+
+'''run benchmark - eg. ADB="python fake_adb.py" python adb_transport.py 100'''
+if __name__ == "__main__":
+    benchmark(int(sys.argv[1]) if len(sys.argv) > 1 else 50)
@@ -0,0 +1,183 @@
+'''   background audio debug logger - never blocks recognition
+
+utterances are queued (bounded, dropped when full) and written by one thread as
+  wav     - normal WAV files (default)
+  pcm     - raw PCM samples
+  pcm.gz  - gzip compressed raw PCM
+every file gets a line in index.jsonl (time, sample rate, width, duration ...), and the
+directory is pruned to MAX_BYTES / MAX_AGE, oldest files first
+'''
+
+import gzip                # for compressed segments
+import itertools           # for sequence numbers
+import json                # for index lines
+import os                  # for files
+import queue               # for bounded queue
+import threading           # for writer thread
+import time                # for timestamps
+import wave                # for WAV files
+from datetime import datetime  # for readable file names
+
+from metrics import metrics  # write time and dropped segments
+
+''' config '''
+
+MAX_PENDING = 16                    # queued utterances before new ones are dropped
+MAX_BYTES = 200 * 1024 * 1024       # directory size limit
+MAX_AGE = 7 * 24 * 3600             # seconds - older segments are deleted
+INDEX_FILE = "index.jsonl"
+FORMATS = ("wav", "pcm", "pcm.gz")
+
+
+class AudioLogWriter:
+    ''' writes audio segments on a background thread with a bounded queue and rotation '''
+
+    def __init__(self, directory, fmt="wav", max_pending=MAX_PENDING, max_bytes=MAX_BYTES, max_age=MAX_AGE):
+        if fmt not in FORMATS:
+            raise ValueError(f"Unknown audio log format '{fmt}' (use {', '.join(FORMATS)})")
+        self.directory = directory
+        self.fmt = fmt
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.pending = queue.Queue(maxsize=max_pending)
+        self.seq = itertools.count(1)
+        self.thread = None
+        self.lock = threading.Lock()
+        self.files = None               # [(mtime, path, size)] oldest first, loaded on first write
+        self.total = 0                  # bytes in self.files
+
+        # counters
+        self.written = 0
+        self.dropped = 0
+
+    def submit(self, audio, prefix=""):
+        ''' queue an sr.AudioData (or (raw bytes, rate, width)) - returns False if dropped '''
+        if self.thread is None:
+            self.start()
+        try:
+            self.pending.put_nowait((audio, prefix, time.time(), next(self.seq)))
+            return True
+        except queue.Full:
+            self.dropped += 1
+            metrics.count("audio_log.dropped")
+            return False
+
+    def start(self):
+        with self.lock:
+            if self.thread is None:
+                os.makedirs(self.directory, exist_ok=True)
+                self.thread = threading.Thread(target=self._worker, name="audio-log", daemon=True)
+                self.thread.start()
+
+    def _worker(self):
+        while True:
+            item = self.pending.get()
+            if item is None:
+                return
+            try:
+                with metrics.timer("audio_log.write"):
+                    self._write(*item)
+            except Exception as e:
+                metrics.error("audio log", e)
+            finally:
+                self.pending.task_done()
+
+    def filename(self, prefix, created, seq):
+        ''' unique and sortable - timestamp with milliseconds plus a sequence number '''
+        stamp = datetime.fromtimestamp(created).strftime("%Y%m%d_%H%M%S")
+        return f"{prefix}{stamp}_{int(created * 1000) % 1000:03d}_{seq:06d}.{self.fmt}"
+
+    def _write(self, audio, prefix, created, seq):
+        if isinstance(audio, tuple):
+            data, rate, width = audio
+        else:
+            data, rate, width = audio.get_raw_data(), audio.sample_rate, audio.sample_width
+        name = self.filename(prefix, created, seq)
+        path = os.path.join(self.directory, name)
+
+        if self.fmt == "wav":
+            with wave.open(path, "wb") as wf:
+                wf.setnchannels(1)             # mono audio
+                wf.setsampwidth(width)
+                wf.setframerate(rate)
+                wf.writeframes(data)
+        elif self.fmt == "pcm.gz":
+            with gzip.open(path, "wb", compresslevel=3) as f:
+                f.write(data)
+        else:
+            with open(path, "wb") as f:
+                f.write(data)
+
+        size = os.path.getsize(path)
+        entry = {"file": name, "seq": seq, "time": created, "prefix": prefix, "format": self.fmt,
+                 "sample_rate": rate, "sample_width": width, "channels": 1,
+                 "duration": len(data) / (rate * width), "bytes": size}
+        with open(os.path.join(self.directory, INDEX_FILE), "a") as f:
+            f.write(json.dumps(entry) + "\n")
+
+        self.written += 1
+        if self.files is None:
+            self._scan()
+        else:
+            self.files.append((created, path, size))
+            self.total += size
+        self._rotate()
+
+    def _scan(self):
+        ''' load existing segments from the directory '''
+        self.files = []
+        for name in os.listdir(self.directory):
+            if name == INDEX_FILE or not name.endswith(FORMATS):
+                continue
+            path = os.path.join(self.directory, name)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            self.files.append((stat.st_mtime, path, stat.st_size))
+        self.files.sort()
+        self.total = sum(size for _, _, size in self.files)
+
+    def _rotate(self):
+        ''' delete oldest segments until under size and age limits '''
+        removed = False
+        oldest_allowed = time.time() - self.max_age
+        while self.files and (self.total > self.max_bytes or self.files[0][0] < oldest_allowed):
+            _, path, size = self.files.pop(0)
+            self.total -= size
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            removed = True
+        if removed:
+            self._rewrite_index()
+
+    def _rewrite_index(self):
+        ''' drop index lines of deleted files '''
+        index = os.path.join(self.directory, INDEX_FILE)
+        kept = {os.path.basename(path) for _, path, _ in self.files}
+        try:
+            with open(index) as f:
+                lines = [line for line in f if json.loads(line).get("file") in kept]
+        except (OSError, ValueError):
+            return
+        with open(index + ".tmp", "w") as f:
+            f.writelines(lines)
+        os.replace(index + ".tmp", index)
+
+    def flush(self):
+        ''' wait until everything queued is written '''
+        if self.thread is not None:
+            self.pending.join()
+
+    def close(self):
+        ''' write what is queued and stop the thread '''
+        if self.thread is not None:
+            self.pending.put(None)
+            self.thread.join(timeout=5)
+            self.thread = None
+
+    def stats(self):
+        return {"written": self.written, "dropped": self.dropped, "pending": self.pending.qsize(),
+                "bytes": self.total}
@@ -0,0 +1,545 @@
+'''   offline replay and benchmark - no webcam, microphone or phone needed
+
+  python benchmark.py record   clip.mp4 clip.jsonl               # video -> landmark stream (once)
+  python benchmark.py mouse    clip.jsonl [--labels labels.json] # replay through DesktopMouse
+  python benchmark.py gestures clip.mp4   [--labels labels.json] [--events events.jsonl]  # replay through SwipeGestures
+  python benchmark.py events   events.jsonl [--labels labels.json] # replay a gesture event stream (gesture_state)
+  python benchmark.py voice    wavs/      --labels labels.json   # replay WAVs through AndroidVoiceController
+  python benchmark.py roi      clip.mp4 [--per-frame]            # full frame vs hand ROI inference time
+  python benchmark.py filters  clip.jsonl [--latency 0.05]       # pointer filter lag / jitter
+  python benchmark.py render   clip.jsonl                        # preview cost of every render mode
+
+landmark stream (JSON lines): first line {"width": 1280, "height": 720, "fps": 30},
+then one line per frame {"t": 0.033, "landmarks": [[x, y, z] * 21] or null, "label": "click"}
+("label" is optional ground truth - an action expected on that frame)
+
+labels file: vision - [{"t": 1.2, "action": "down"}, ...]
+             voice  - {"scroll_up_01.wav": "scroll up", ...}
+voice stand-in recognizer: "transcript" reads the text from <file>.txt next to each WAV
+'''
+
+import argparse            # for command line
+import contextlib          # for silencing handler prints
+import glob                # for finding WAV files
+import io                  # for silencing handler prints
+import json                # for streams, labels and report
+import os                  # for paths
+import time                # for timing
+
+from action_dispatcher import ActionDispatcher
+from metrics import metrics
+
+''' config '''
+
+MATCH_TOLERANCE = 0.25      # seconds - emitted action counts as correct if within this of the label
+RENDER_MODES = ["full", "preview:10", "downscale:0.5", "preview:10,downscale:0.5", "headless"]
+
+'''mediapipe hand skeleton - the lines draw_landmarks draws'''
+HAND_CONNECTIONS = [(0, 1), (1, 2), (2, 3), (3, 4), (0, 5), (5, 6), (6, 7), (7, 8), (5, 9), (9, 10),
+                    (10, 11), (11, 12), (9, 13), (13, 14), (14, 15), (15, 16), (13, 17), (0, 17),
+                    (17, 18), (18, 19), (19, 20)]
+
+
+''' landmark streams '''
+
+class Point:
+    ''' stands in for a mediapipe landmark (x, y, z normalized) '''
+
+    __slots__ = ("x", "y", "z")
+
+    def __init__(self, x, y, z=0.0):
+        self.x = x
+        self.y = y
+        self.z = z
+
+
+class HandLandmarks:
+    ''' stands in for mediapipe NormalizedLandmarkList - .landmark[0..20] '''
+
+    def __init__(self, points):
+        self.landmark = [Point(*p) for p in points]
+
+
+def load_stream(path):
+    ''' read landmark stream file -> (header, frames) '''
+    header = {"width": 1280, "height": 720, "fps": 30}
+    frames = []
+    with open(path) as f:
+        for line in f:
+            if not line.strip():
+                continue
+            item = json.loads(line)
+            if "t" not in item:
+                header.update(item)
+            else:
+                frames.append(item)
+    return header, frames
+
+
+def record_stream(video, out=None):
+    ''' run mediapipe on a video file once and return (header, frames), optionally save as JSON lines '''
+    import cv2
+    from vision_pipeline import VisionPipeline
+
+    cap = cv2.VideoCapture(video)
+    header = {"width": int(cap.get(cv2.CAP_PROP_FRAME_WIDTH)),
+              "height": int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT)),
+              "fps": cap.get(cv2.CAP_PROP_FPS) or 30}
+    cap.release()
+
+    frames = []
+
+    def collect(frame):
+        hands = frame.results.multi_hand_landmarks
+        points = [[p.x, p.y, p.z] for p in hands[0].landmark] if hands else None
+        frames.append({"t": frame.index / header["fps"], "landmarks": points})
+
+    stats = VisionPipeline(video, realtime=False).run(collect)
+    header["inference_fps"] = stats["fps"]
+    if out:
+        with open(out, "w") as f:
+            f.write(json.dumps(header) + "\n")
+            for frame in frames:
+                f.write(json.dumps(frame) + "\n")
+    return header, frames
+
+
+def open_stream(path):
+    ''' landmark stream file or video file '''
+    if path.endswith((".jsonl", ".json")):
+        return load_stream(path)
+    return record_stream(path)
+
+
+''' recording stubs '''
+
+class RecordingPyAutoGUI:
+    ''' stands in for pyautogui - counts calls, optional delay like a slow desktop '''
+
+    def __init__(self, size=(1920, 1080), delay=0.0):
+        self.screen = size
+        self.delay = delay
+        self.calls = []
+        self.FAILSAFE = False
+        self.PAUSE = 0.0
+
+    def size(self):
+        return self.screen
+
+    def moveTo(self, x, y, duration=0.0):
+        time.sleep(self.delay)
+        self.calls.append(("move", x, y))
+
+    def click(self):
+        time.sleep(self.delay)
+        self.calls.append(("click",))
+
+
+class RecordingShell:
+    ''' stands in for the adb shell - records commands, optional per command delay '''
+
+    def __init__(self, delay=0.0):
+        self.delay = delay
+        self.commands = []
+
+    def __call__(self, command):
+        return self.run(command)
+
+    def run(self, command, timeout=None):
+        from adb_transport import AdbResult, strip_adb_prefix
+        command = strip_adb_prefix(command)
+        if command.startswith("wm "):                   # screen query of touch_mapper - not a device action
+            return AdbResult(command, 0, "Physical size: 1080x2340\nPhysical density: 440", 0.0)
+        time.sleep(self.delay)
+        self.commands.append(command)
+        return AdbResult(command, 0, "", self.delay)
+
+    def close(self):
+        pass
+
+
+class RecordingDispatcher(ActionDispatcher):
+    ''' dispatcher that remembers which stream time every action was submitted at '''
+
+    def __init__(self, name, describe):
+        super().__init__(name=name)
+        self.describe = describe        # function(func, args) -> action name (None = not an event)
+        self.stream_time = 0.0          # set by replay loop before every frame
+        self.events = []                # (stream time, action)
+
+    def submit(self, func, *args, **kwargs):
+        action = self.describe(func, args)
+        if action:
+            self.events.append((self.stream_time, action))
+        return super().submit(func, *args, **kwargs)
+
+
+''' scoring '''
+
+def score_events(emitted, expected, tolerance=MATCH_TOLERANCE):
+    ''' greedy match of emitted (t, action) against labelled (t, action) within tolerance '''
+    used = [False] * len(emitted)
+    hits = 0
+    per_action = {}
+    for t, action in expected:
+        stats = per_action.setdefault(action, {"expected": 0, "hit": 0, "emitted": 0})
+        stats["expected"] += 1
+        for i, (et, ea) in enumerate(emitted):
+            if not used[i] and ea == action and abs(et - t) <= tolerance:
+                used[i] = True
+                hits += 1
+                stats["hit"] += 1
+                break
+    for _, action in emitted:
+        per_action.setdefault(action, {"expected": 0, "hit": 0, "emitted": 0})["emitted"] += 1
+    precision = hits / len(emitted) if emitted else (1.0 if not expected else 0.0)
+    recall = hits / len(expected) if expected else 1.0
+    f1 = 2 * precision * recall / (precision + recall) if precision + recall else 0.0
+    return {"expected": len(expected), "emitted": len(emitted), "correct": hits,
+            "wasted": len(emitted) - hits, "precision": precision, "recall": recall,
+            "f1": f1, "per_action": per_action}
+
+
+def commands_per_gesture(accuracy):
+    ''' device commands per labelled gesture - 1.0 with nothing wasted is the goal '''
+    def ratio(count, expected):
+        return count / expected if expected else None
+    report = {"total": ratio(accuracy["emitted"], accuracy["expected"]),
+              "wasted_per_gesture": ratio(accuracy["wasted"], accuracy["expected"])}
+    for action, stats in accuracy["per_action"].items():
+        report[action] = ratio(stats["emitted"], stats["expected"])
+    return report
+
+
+def load_vision_labels(path, frames):
+    ''' labels from file and/or "label" fields in the stream '''
+    expected = [(f["t"], f["label"]) for f in frames if f.get("label")]
+    if path:
+        with open(path) as f:
+            expected += [(item["t"], item["action"]) for item in json.load(f)]
+    return sorted(expected)
+
+
+def latency_report(name):
+    ''' per-event latency collected by the dispatcher through metrics '''
+    histogram = metrics.histograms.get(f"gesture_to_action.{name}")
+    return histogram.summary() if histogram else {}
+
+
+''' replays '''
+
+def replay_frames(frames, handle, dispatcher, header, realtime=False):
+    ''' feed frames into handle(hand, t, origin) - as fast as possible, or paced at stream
+    timestamps like a live camera (realtime) - return fps report '''
+    start = time.perf_counter()
+    for frame in frames:
+        if realtime:
+            time.sleep(max(0.0, frame["t"] - (time.perf_counter() - start)))
+        dispatcher.stream_time = frame["t"]
+        points = frame.get("landmarks")
+        hand = HandLandmarks(points) if points else None
+        handle(hand, frame["t"], time.perf_counter())
+    handler_time = time.perf_counter() - start
+    dispatcher.wait_idle(timeout=30)
+    total_time = time.perf_counter() - start
+    return {"frames": len(frames),
+            "handler_fps": len(frames) / handler_time if handler_time else 0.0,
+            "end_to_end_fps": len(frames) / total_time if total_time else 0.0,
+            "stream_seconds": frames[-1]["t"] if frames else 0.0,
+            "inference_fps": header.get("inference_fps")}
+
+
+def bench_mouse(args):
+    ''' replay landmarks through DesktopMouse.handle_gestures with a recording pyautogui '''
+    from mouse_control import DesktopMouse
+
+    header, frames = open_stream(args.source)
+    backend = RecordingPyAutoGUI(delay=args.action_delay)
+    names = {"moveTo": None, "click": "click"}
+    dispatcher = RecordingDispatcher("mouse", lambda func, a: names.get(func.__name__))
+    clock = {"t": 0.0}
+    mouse = DesktopMouse(backend=backend, actions=dispatcher, clock=lambda: clock["t"])
+
+    def handle(hand, t, origin):
+        clock["t"] = t
+        if hand is not None:
+            mouse.handle_gestures(hand.landmark[8], hand.landmark[4], origin=origin)
+
+    report = replay_frames(frames, handle, dispatcher, header, args.realtime)
+    dispatcher.stop()
+    report["dispatcher"] = dispatcher.stats()
+    report["pointer_moves_sent"] = sum(1 for c in backend.calls if c[0] == "move")
+    report["latency"] = latency_report("mouse")
+    report["accuracy"] = score_events(dispatcher.events, load_vision_labels(args.labels, frames), args.tolerance)
+    return report
+
+
+def bench_gestures(args):
+    ''' replay landmarks through SwipeGestures with a recording adb shell '''
+    from gesture_state import SWIPES
+    from hand_gestures import SwipeGestures
+
+    header, frames = open_stream(args.source)
+    shell = RecordingShell(delay=args.action_delay)
+    names = {command: gesture for gesture, command in SWIPES.items()}
+    dispatcher = RecordingDispatcher("swipes", lambda func, a: names.get(" ".join(a[0].split()[:2])) if a else None)
+    gestures = SwipeGestures(send=shell, actions=dispatcher, events=args.events)
+
+    def handle(hand, t, origin):
+        if hand is not None:
+            gestures.handle_landmarks(hand, header["width"], header["height"], origin=origin, t=t)
+        else:
+            gestures.hand_lost(t)
+
+    report = replay_frames(frames, handle, dispatcher, header, args.realtime)
+    dispatcher.stop()
+    gestures.log.close()
+    report["dispatcher"] = dispatcher.stats()
+    report["device_commands"] = len(shell.commands)
+    report["events"] = gestures.log.counts()
+    report["latency"] = latency_report("swipes")
+    report["accuracy"] = score_events(dispatcher.events, load_vision_labels(args.labels, frames), args.tolerance)
+    report["commands_per_gesture"] = commands_per_gesture(report["accuracy"])
+    return report
+
+
+def bench_events(args):
+    ''' replay a recorded gesture event stream through TouchMapper and a recording adb shell '''
+    from gesture_state import SWIPES, load_events, replay_events
+    from touch_mapper import TouchMapper
+
+    events = load_events(args.source)
+    shell = RecordingShell(delay=args.action_delay)
+    start = time.perf_counter()
+    sent = replay_events(events, TouchMapper(shell), SWIPES, args.realtime)
+    fired = [(item["t"], item["gesture"]) for item in events if item["event"] == "fire"]
+    expected = load_vision_labels(args.labels, []) if args.labels else []
+    accuracy = score_events(fired, expected, args.tolerance)
+    return {"events": len(events),
+            "device_commands": len(shell.commands),
+            "per_gesture": sent,
+            "replay_seconds": time.perf_counter() - start,
+            "accuracy": accuracy,
+            "commands_per_gesture": commands_per_gesture(accuracy) if expected else None}
+
+
+class TranscriptRecognizer:
+    ''' local stand-in recognizer - returns the text of <wav>.txt for the current file '''
+
+    def __init__(self):
+        self.current = None             # path of WAV being recognized
+
+    def __call__(self, audio):
+        import speech_recognition as sr
+        path = os.path.splitext(self.current)[0] + ".txt"
+        if not os.path.exists(path):
+            raise sr.UnknownValueError()
+        with open(path) as f:
+            return f.read().strip()
+
+
+def bench_voice(args):
+    ''' replay WAV files through AndroidVoiceController.process_audio with a recording shell '''
+    import speech_recognition as sr
+    from speech_recognization import AndroidVoiceController
+
+    files = sorted(glob.glob(os.path.join(args.source, "*.wav"))) if os.path.isdir(args.source) else [args.source]
+    labels = {}
+    if args.labels:
+        with open(args.labels) as f:
+            labels = json.load(f)
+
+    shell = RecordingShell(delay=args.action_delay)
+    transcript = TranscriptRecognizer()
+    controller = AndroidVoiceController(shell=shell)
+    controller.debug_audio = False
+    if args.recognizer == "transcript":
+        controller.recognizers = [("transcript", transcript)]
+    else:
+        controller.recognizers = [r for r in controller.recognizers if r[0] == args.recognizer]
+
+    results = []
+    audio_seconds = 0.0
+    start = time.perf_counter()
+    for path in files:
+        with sr.AudioFile(path) as source:
+            audio = controller.recognizer.record(source)
+            audio_seconds += source.DURATION
+        transcript.current = path
+        t0 = time.perf_counter()
+        matched = controller.process_audio(audio, heard_at=t0)
+        results.append({"file": os.path.basename(path),
+                        "expected": labels.get(os.path.basename(path)),
+                        "matched": matched,
+                        "latency_ms": (time.perf_counter() - t0) * 1000})
+    elapsed = time.perf_counter() - start
+
+    labelled = [r for r in results if r["expected"] is not None]
+    correct = sum(1 for r in labelled if r["matched"] == r["expected"])
+    latencies = sorted(r["latency_ms"] for r in results)
+    return {"files": len(files),
+            "files_per_sec": len(files) / elapsed if elapsed else 0.0,
+            "realtime_factor": audio_seconds / elapsed if elapsed else 0.0,
+            "latency_p50_ms": latencies[len(latencies) // 2] if latencies else 0.0,
+            "latency_max_ms": latencies[-1] if latencies else 0.0,
+            "device_commands": len(shell.commands),
+            "accuracy": correct / len(labelled) if labelled else None,
+            "results": results}
+
+
+def _percentiles(values):
+    values = sorted(values)
+    if not values:
+        return {}
+    pick = lambda q: values[min(len(values) - 1, int(q * len(values)))] * 1000
+    return {"mean_ms": sum(values) / len(values) * 1000, "p50_ms": pick(0.50), "p95_ms": pick(0.95)}
+
+
+def bench_roi(args):
+    ''' run every frame of a video through full frame and ROI tracking, time both side by side '''
+    import cv2
+    from roi_tracking import HandTracker
+
+    full = HandTracker(roi=False, max_num_hands=1)
+    roi = HandTracker(roi=True, max_num_hands=1)
+    cap = cv2.VideoCapture(args.source)
+    rows = []
+    while True:
+        success, image = cap.read()
+        if not success:
+            break
+        image = cv2.flip(image, 1)
+        timings = []
+        tips = []
+        for tracker in (full, roi):
+            start = time.perf_counter()
+            results = tracker.process(image.copy())        # copy - cropping must not see the other run's buffer
+            timings.append(time.perf_counter() - start)
+            hands = results.multi_hand_landmarks
+            tips.append((hands[0].landmark[8].x, hands[0].landmark[8].y) if hands else None)
+        error = None
+        if tips[0] and tips[1]:
+            error = ((tips[0][0] - tips[1][0]) ** 2 + (tips[0][1] - tips[1][1]) ** 2) ** 0.5
+        rows.append({"frame": len(rows), "full_ms": timings[0] * 1000, "roi_ms": timings[1] * 1000,
+                     "tip_error": error})
+    cap.release()
+    full.close()
+    roi.close()
+
+    full_times = [r["full_ms"] / 1000 for r in rows]
+    roi_times = [r["roi_ms"] / 1000 for r in rows]
+    errors = [r["tip_error"] for r in rows if r["tip_error"] is not None]
+    report = {"frames": len(rows),
+              "full": _percentiles(full_times),
+              "roi": {**_percentiles(roi_times), **roi.stats()},
+              "speedup": sum(full_times) / sum(roi_times) if sum(roi_times) else None,
+              "index_tip_error_mean": sum(errors) / len(errors) if errors else None}
+    if args.per_frame:
+        report["per_frame"] = rows
+    return report
+
+
+def bench_filters(args):
+    ''' score every pointer filter on the index tip trace of a recording (screen pixels) '''
+    import numpy as np
+    import pointer_filters
+
+    header, frames = open_stream(args.source)
+    frames = [f for f in frames if f.get("landmarks")]
+    times = np.array([f["t"] for f in frames])
+    points = np.array([f["landmarks"][8][:2] for f in frames]) * (1920, 1080)
+    candidates = {
+        "ema": pointer_filters.make_filter("ema", alpha=0.2),
+        "ema+predict": pointer_filters.make_filter("ema", predict=True, alpha=0.2),
+        "one_euro": pointer_filters.make_filter("one_euro"),
+        "one_euro+predict": pointer_filters.make_filter("one_euro", predict=True),
+    }
+    return {"frames": len(frames), "latency_s": args.latency,
+            "filters": {name: pointer_filters.evaluate(f, times, points, args.latency)
+                        for name, f in candidates.items()}}
+
+
+def draw_overlay(canvas, points):
+    ''' same drawing work as the mouse preview - skeleton, pinch line and four text lines '''
+    import cv2
+    h, w = canvas.shape[:2]
+    s = w / 1280
+    if points:
+        pixels = [(int(p[0] * w), int(p[1] * h)) for p in points]
+        for a, b in HAND_CONNECTIONS:
+            cv2.line(canvas, pixels[a], pixels[b], (224, 224, 224), 2)
+        for p in pixels:
+            cv2.circle(canvas, p, 2, (0, 0, 255), -1)
+        cv2.line(canvas, pixels[8], pixels[4], (0, 255, 0), 2)
+    for row, text in enumerate(["Desktop Mouse Control", "Touch thumb and index to click",
+                                "Click Threshold: 4.0%", "Queue: 0  Dropped: 0"]):
+        cv2.putText(canvas, text, (int(20 * s), int((40 + 40 * row) * s)), cv2.FONT_HERSHEY_SIMPLEX,
+                    (1 if row == 0 else 0.7) * s, (255, 255, 255), max(1, round(2 * s)))
+
+
+def bench_render(args):
+    ''' time the render stage (overlay + window) for every render_policy mode on a landmark stream.
+    the window is only measured when OpenCV can open one (not with opencv-python-headless) '''
+    import numpy as np
+    from render_policy import RenderPolicy, preview_available
+
+    header, frames = open_stream(args.source)
+    base = np.random.default_rng(0).integers(0, 255, (header["height"], header["width"], 3), dtype=np.uint8)
+    window = "render benchmark" if preview_available() else None
+    modes = {}
+    for mode in RENDER_MODES:
+        policy = RenderPolicy.parse(mode, window)
+        busy = 0.0
+        for frame in frames:
+            image = base.copy()                         # fresh camera frame (not timed)
+            start = time.perf_counter()
+            if policy.should_render(frame["t"]):
+                canvas = policy.canvas(image)
+                draw_overlay(canvas, frame.get("landmarks"))
+                policy.show(canvas)
+            busy += time.perf_counter() - start
+        policy.close()
+        per_frame = busy / len(frames) if frames else 0.0
+        modes[mode] = {"render_ms_per_frame": per_frame * 1000,
+                       "max_fps": 1.0 / per_frame if per_frame else None,
+                       "busy_ms_per_stream_second": busy * 1000 / max(frames[-1]["t"], 1e-9) if frames else 0.0,
+                       **policy.stats()}
+    full = modes["full"]["render_ms_per_frame"]
+    for report in modes.values():
+        report["frame_time_freed_ms"] = full - report["render_ms_per_frame"]
+    return {"frames": len(frames), "size": [header["width"], header["height"]],
+            "window_measured": window is not None, "modes": modes}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="offline replay and benchmark")
+    parser.add_argument("mode", choices=["record", "mouse", "gestures", "events", "voice", "roi", "filters", "render"])
+    parser.add_argument("source", help="video, landmark stream (.jsonl), WAV file or folder of WAVs")
+    parser.add_argument("out", nargs="?", help="record: output landmark stream")
+    parser.add_argument("--labels", help="ground truth file")
+    parser.add_argument("--tolerance", type=float, default=MATCH_TOLERANCE, help="seconds for label matching")
+    parser.add_argument("--realtime", action="store_true", help="pace replay at the stream timestamps")
+    parser.add_argument("--action-delay", type=float, default=0.0, help="simulated seconds per pyautogui/adb call")
+    parser.add_argument("--recognizer", default="transcript", choices=["transcript", "google", "sphinx"])
+    parser.add_argument("--latency", type=float, default=0.05, help="filters: pipeline latency to compensate (s)")
+    parser.add_argument("--per-frame", action="store_true", help="roi: include every frame's timings")
+    parser.add_argument("--events", help="gestures: write the gesture event stream to this file")
+    parser.add_argument("--verbose", action="store_true", help="show prints from the controllers")
+    args = parser.parse_args(argv)
+
+    if args.mode == "record":
+        header, frames = record_stream(args.source, args.out or os.path.splitext(args.source)[0] + ".jsonl")
+        print(json.dumps({"frames": len(frames), **header}, indent=2))
+        return
+
+    metrics.enabled = True                   # dispatcher latency histograms, no reporter thread
+    bench = {"mouse": bench_mouse, "gestures": bench_gestures, "events": bench_events, "voice": bench_voice, "roi": bench_roi,
+             "filters": bench_filters, "render": bench_render}[args.mode]
+    output = contextlib.nullcontext() if args.verbose else contextlib.redirect_stdout(io.StringIO())
+    with output:
+        report = bench(args)
+    print(json.dumps(report, indent=2, default=str))
+
+
+if __name__ == "__main__":
+    main()
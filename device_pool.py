@@ -0,0 +1,275 @@
+'''   multi device fan out - one persistent "adb -s <serial> shell" worker per phone
+
+every command goes to all devices (or a group) at the same time. each device has its
+own worker thread, so commands stay in order per device and a slow or dead phone
+only delays itself - gesture handlers (pool(command)) do not wait for the devices at all,
+and a device with MAX_BACKLOG commands still queued skips new ones until it catches up.
+per device latency, failures and skipped commands are kept for the report.
+
+  ADB="python fake_adb.py" FAKE_ADB_SERIALS=a,b,c FAKE_ADB_SLOW=c=0.2 python device_pool.py
+'''
+
+import concurrent.futures  # for per device workers
+import sys                 # for benchmark entry point
+import threading           # for stats lock
+import time                # for timing
+
+import adb_transport                     # AdbShell, device discovery
+from metrics import Histogram, metrics   # per device latency
+
+''' config '''
+
+'''named groups of serials - eg. {"pixels": ["emulator-5554", "emulator-5556"]}'''
+DEVICE_GROUPS = {}
+
+MAX_BACKLOG = 32            # commands queued per device before new ones are skipped for it (~1 s of drag at 30 fps)
+
+
+class FanoutResult:
+    ''' results of one command on several devices - looks like AdbResult for callers that
+    only check .ok / .output / .elapsed (eg. AndroidVoiceController.run_adb) '''
+
+    def __init__(self, command, results, elapsed):
+        self.command = command
+        self.results = results          # serial -> AdbResult or exception
+        self.elapsed = elapsed          # seconds until the slowest device answered
+
+    @property
+    def failed(self):
+        return {serial: r for serial, r in self.results.items()
+                if isinstance(r, Exception) or not r.ok}
+
+    @property
+    def ok(self):
+        return bool(self.results) and not self.failed
+
+    @property
+    def returncode(self):
+        return 0 if self.ok else 1
+
+    @property
+    def output(self):
+        lines = []
+        for serial, r in self.results.items():
+            text = str(r) if isinstance(r, Exception) else r.output.strip()
+            if text:
+                lines.append(f"[{serial}] {text}")
+        return "\n".join(lines)
+
+    def latencies(self):
+        ''' serial -> milliseconds (None for devices that failed with an error) '''
+        return {serial: None if isinstance(r, Exception) else r.elapsed * 1000
+                for serial, r in self.results.items()}
+
+    def __repr__(self):
+        return f"FanoutResult({self.command!r}, {len(self.results) - len(self.failed)}/{len(self.results)} ok, {self.elapsed*1000:.1f}ms)"
+
+
+class DeviceWorker:
+    ''' one device - persistent shell + single thread so commands keep their order '''
+
+    def __init__(self, serial, timeout=adb_transport.DEFAULT_TIMEOUT):
+        self.serial = serial
+        self.shell = adb_transport.AdbShell(serial, timeout=timeout)
+        self.executor = concurrent.futures.ThreadPoolExecutor(max_workers=1, thread_name_prefix=f"adb-{serial}")
+        self.latency = Histogram()
+        self.lock = threading.Lock()
+        self.backlog = 0                # commands queued or running
+        self.commands = 0
+        self.failures = 0
+        self.skipped = 0                # not queued, backlog was full
+
+    def submit(self, command, timeout=None):
+        ''' queue command - future, or None when MAX_BACKLOG commands are still waiting '''
+        with self.lock:
+            if self.backlog >= MAX_BACKLOG:
+                self.skipped += 1
+                metrics.count(f"adb.skipped.{self.serial}")
+                return None
+            self.backlog += 1
+        future = self.executor.submit(self._run, command, timeout)
+        future.add_done_callback(self._done)
+        return future
+
+    def _done(self, future):
+        with self.lock:
+            self.backlog -= 1
+
+    def _run(self, command, timeout):
+        self.commands += 1
+        try:
+            if callable(command):
+                command = command(self.serial)          # rendered for this device (eg. touch_mapper.PerDevice)
+            result = self.shell.run(command, timeout)
+        except adb_transport.AdbError:
+            self.failures += 1
+            metrics.count(f"adb.failures.{self.serial}")
+            raise
+        self.latency.observe(result.elapsed)
+        metrics.observe(f"adb.{self.serial}", result.elapsed)
+        if not result.ok:
+            self.failures += 1
+            metrics.count(f"adb.failures.{self.serial}")
+        return result
+
+    def close(self):
+        self.executor.shutdown(wait=True, cancel_futures=True)     # a dead phone does not hold up the exit
+        self.shell.close()
+
+    def stats(self):
+        return dict(self.latency.summary(), commands=self.commands, failures=self.failures, skipped=self.skipped)
+
+
+class DevicePool:
+    ''' workers for several devices. serials=None - every ready device from "adb devices" '''
+
+    def __init__(self, serials=None, groups=None, timeout=adb_transport.DEFAULT_TIMEOUT):
+        self.timeout = timeout
+        self.groups = dict(DEVICE_GROUPS if groups is None else groups)
+        self.lock = threading.Lock()
+        self.workers = {}               # serial -> DeviceWorker
+        for serial in (adb_transport.ready_devices() if serials is None else serials):
+            self.workers[serial] = DeviceWorker(serial, timeout)
+
+    @property
+    def serials(self):
+        return list(self.workers)
+
+    def refresh(self):
+        ''' pick up newly connected devices and drop the ones that are gone - returns (added, removed) '''
+        ready = adb_transport.ready_devices()
+        with self.lock:
+            added = [s for s in ready if s not in self.workers]
+            removed = [s for s in self.workers if s not in ready]
+            for serial in added:
+                self.workers[serial] = DeviceWorker(serial, self.timeout)
+            for serial in removed:
+                self.workers.pop(serial).close()
+        return added, removed
+
+    def select(self, group=None):
+        ''' None - all devices, group name, serial or list of serials '''
+        if group is None:
+            return self.serials
+        if isinstance(group, str):
+            group = self.groups.get(group, [group])
+        missing = [s for s in group if s not in self.workers]
+        if missing:
+            raise ValueError(f"Unknown device(s): {', '.join(missing)}")
+        return list(group)
+
+    def submit(self, command, group=None, timeout=None):
+        ''' start command on every selected device - serial -> future (None - skipped, backlog full).
+        command can be a function(serial) -> shell line, called in the device worker '''
+        if not callable(command):
+            command = adb_transport.strip_adb_prefix(command)
+        with self.lock:
+            return {serial: self.workers[serial].submit(command, timeout) for serial in self.select(group)}
+
+    def run(self, command, group=None, timeout=None):
+        ''' run command on every selected device at the same time, wait for all - FanoutResult '''
+        start = time.perf_counter()
+        futures = self.submit(command, group, timeout)
+        results = {}
+        for serial, future in futures.items():
+            if future is None:
+                results[serial] = adb_transport.AdbError(f"{MAX_BACKLOG} commands still queued, skipped")
+                continue
+            try:
+                results[serial] = future.result()
+            except Exception as e:
+                results[serial] = e
+        elapsed = time.perf_counter() - start
+        metrics.observe("adb.fanout", elapsed)
+        return FanoutResult(str(command) if callable(command) else adb_transport.strip_adb_prefix(command),
+                            results, elapsed)
+
+    def __call__(self, command):
+        ''' send(command) for gesture handlers - queues the command on every device and returns
+        right away (serial -> future), failures are printed when a device answers '''
+        futures = self.submit(command)
+        for serial, future in futures.items():
+            if future is not None:
+                future.add_done_callback(lambda f, serial=serial: self._report(serial, f))
+        return futures
+
+    def _report(self, serial, future):
+        ''' print a failed command like adb_transport.shell (runs on the device worker) '''
+        try:
+            result = future.result()
+        except Exception as e:
+            print(f"Command failed on {serial}: {str(e)}")
+            return
+        if not result.ok:
+            print(f"Command failed on {serial}: {result.output.strip()}")
+
+    def stats(self):
+        return {serial: worker.stats() for serial, worker in self.workers.items()}
+
+    def close(self):
+        with self.lock:
+            for worker in self.workers.values():
+                worker.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def open_devices(spec=None):
+    ''' command line device choice -> DevicePool
+    None          - None, keep using the shared shell of the default device (single phone)
+    "all"         - pool of every ready device
+    "a,b" / group - pool of those serials (or a DEVICE_GROUPS name)
+    DevicePool    - returned as it is (opened ahead, eg. by remotecontrol) '''
+    if isinstance(spec, DevicePool):
+        return spec
+    if not spec:
+        return None
+    if spec == "all":
+        return DevicePool()
+    if spec in DEVICE_GROUPS:
+        return DevicePool(DEVICE_GROUPS[spec])
+    return DevicePool(spec.split(","))
+
+
+def devices_option(argv):
+    ''' value of --devices=... from argv (None when not given) '''
+    for arg in argv:
+        if arg.startswith("--devices="):
+            return arg.split("=", 1)[1]
+    return None
+
+
+def benchmark(count=20, command="input swipe 500 500 500 1500"):
+    ''' one device after the other vs all at once '''
+    with DevicePool() as pool:
+        if not pool.serials:
+            print("No devices found")
+            return
+        pool.run("true")                                # connect every shell before timing
+
+        start = time.perf_counter()
+        for _ in range(count):
+            for serial in pool.serials:
+                pool.run(command, group=[serial])
+        sequential = (time.perf_counter() - start) / count
+
+        start = time.perf_counter()
+        for _ in range(count):
+            pool.run(command)
+        parallel = (time.perf_counter() - start) / count
+
+        print(f"devices                : {', '.join(pool.serials)}")
+        print(f"one device at a time   : {sequential*1000:.2f} ms per command")
+        print(f"fan out                : {parallel*1000:.2f} ms per command")
+        for serial, stats in pool.stats().items():
+            print(f"  {serial:20} p50 {stats['p50_ms']:7.2f} ms  p95 {stats['p95_ms']:7.2f} ms  "
+                  f"failures {stats['failures']}/{stats['commands']}  skipped {stats['skipped']}")
+
+
+'''run benchmark - eg. ADB="python fake_adb.py" FAKE_ADB_SERIALS=a,b,c python device_pool.py 20'''
+if __name__ == "__main__":
+    benchmark(int(sys.argv[1]) if len(sys.argv) > 1 else 20)
@@ -0,0 +1,116 @@
+'''   fake "adb" for testing and benchmarking without a phone
+use it with:  ADB="python fake_adb.py" python adb_transport.py
+
+env config:
+  FAKE_ADB_SERIALS  - comma separated serials reported by "adb devices" (default emulator-5554)
+  FAKE_ADB_DELAY    - seconds each "input" command takes on the device (default 0)
+  FAKE_ADB_STARTUP  - seconds to start a process, like adb server round trip (default 0.05)
+  FAKE_ADB_LOG      - file where every executed device command is appended
+  FAKE_ADB_SLOW     - extra seconds per command for some devices, eg. "emulator-5556=0.2,R58M=0.05"
+  FAKE_ADB_OFFLINE  - comma separated serials listed as "offline" (commands fail)
+'''
+
+import os                  # for env config
+import shlex               # for parsing shell lines
+import sys                 # for argv / stdin / stdout
+import time                # for simulated delays
+from adb_transport import split_commands  # ; outside quotes
+
+SERIALS = [s for s in os.environ.get("FAKE_ADB_SERIALS", "emulator-5554").split(",") if s]
+OFFLINE = [s for s in os.environ.get("FAKE_ADB_OFFLINE", "").split(",") if s]
+SLOW = {s.split("=")[0]: float(s.split("=")[1]) for s in os.environ.get("FAKE_ADB_SLOW", "").split(",") if "=" in s}
+SCREEN_SIZE = "1080x2340"       # reported by "wm size"
+SCREEN_DENSITY = "440"          # reported by "wm density"
+
+
+def log(serial, line):
+    ''' append executed command to log file (serial<TAB>time<TAB>command) '''
+    path = os.environ.get("FAKE_ADB_LOG")
+    if path:
+        with open(path, "a") as f:
+            f.write(f"{serial}\t{time.time():.6f}\t{line}\n")
+
+
+def run_line(serial, line, last_rc):
+    ''' execute one shell line, return exit code '''
+    rc = last_rc
+    for part in split_commands(line):               # "a; b; c" runs one after another
+        rc = run_command(serial, part, rc)
+    return rc
+
+
+def run_command(serial, line, last_rc):
+    ''' emulate the few device commands this project uses '''
+    try:
+        args = shlex.split(line)
+    except ValueError:
+        print(f"/system/bin/sh: syntax error: {line}")
+        return 2
+    name = args[0]
+
+    if name == "echo":
+        print(" ".join(str(last_rc) if a == "$?" else a for a in args[1:]))
+        return 0
+    if name in ("true", ":"):
+        return 0
+    if name == "sleep":
+        time.sleep(float(args[1]))
+        return 0
+    if name == "input":
+        time.sleep(float(os.environ.get("FAKE_ADB_DELAY", "0")) + SLOW.get(serial, 0.0))
+        log(serial, line)
+        return 0
+    if name == "wm" and args[1:2] == ["size"]:
+        print(f"Physical size: {SCREEN_SIZE}")
+        return 0
+    if name == "wm" and args[1:2] == ["density"]:
+        print(f"Physical density: {SCREEN_DENSITY}")
+        return 0
+    print(f"/system/bin/sh: {name}: inaccessible or not found")
+    return 127
+
+
+def main(argv):
+    time.sleep(float(os.environ.get("FAKE_ADB_STARTUP", "0.05")))
+
+    serial = SERIALS[0] if SERIALS else None
+    if argv[:1] == ["-s"]:
+        serial, argv = argv[1], argv[2:]
+        if serial in OFFLINE:
+            print("adb: device offline", file=sys.stderr)
+            return 1
+        if serial not in SERIALS:
+            print(f"adb: device '{serial}' not found", file=sys.stderr)
+            return 1
+
+    if argv[:1] == ["devices"]:
+        print("List of devices attached")
+        for s in SERIALS + OFFLINE:
+            print(f"{s}\t{'offline' if s in OFFLINE else 'device'}")
+        print()
+        return 0
+
+    if argv[:1] != ["shell"]:
+        print(f"fake adb: unsupported command {argv}", file=sys.stderr)
+        return 1
+    if serial is None:
+        print("adb: no devices/emulators found", file=sys.stderr)
+        return 1
+
+    if len(argv) > 1:                               # one shot "adb shell input ..."
+        rc = run_line(serial, " ".join(argv[1:]), 0)
+        sys.stdout.flush()
+        return rc
+
+    rc = 0                                          # interactive shell reading stdin
+    for line in sys.stdin:
+        line = line.strip()
+        if line == "exit":
+            break
+        rc = run_line(serial, line, rc)
+        sys.stdout.flush()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,219 @@
+'''   swipe gesture state machine - one device command per hand motion
+
+velocity of the index tip over the last WINDOW seconds, normalized to the frame
+(frame widths / heights per second, so the thresholds do not depend on the camera).
+every gesture goes  idle -> fired -> (speed under the hysteresis level) -> idle  and can
+not fire again during its cooldown. the stroke back after a swipe (opposite direction)
+is ignored for RETURN_COOLDOWN after the swipe ended, and all commands share a rate limit.
+
+every decision is written to an event stream (JSON lines) that can be replayed later
+against a phone or a recording shell to count device commands per gesture:
+  {"t": 1.23, "event": "fire", "gesture": "down", "speed": 4.8}
+  {"t": 1.31, "event": "suppressed", "gesture": "down", "reason": "cooldown"}
+  {"t": 1.52, "event": "release", "gesture": "down"}
+'''
+
+import collections         # for sample window
+import json                # for event stream files
+import time                # for replay pacing
+
+''' config '''
+
+NOMINAL_FPS = 30.0          # pixel thresholds (pixels per frame) are at this frame rate
+WINDOW = 0.1                # seconds of samples the velocity is measured over (3 frames at 30 fps)
+HYSTERESIS = 0.5            # gesture ends when speed drops under this part of its threshold
+COOLDOWN = 0.5              # seconds before the same gesture can fire again
+RETURN_COOLDOWN = 0.4       # seconds after a gesture ended that the opposite one is ignored (hand moving back)
+MAX_RATE = 4.0              # commands per second (all gestures together)
+BURST = 2                   # commands allowed back to back before the rate limit applies
+
+'''minimun required pixel movement for scrolling / swipes (per frame at NOMINAL_FPS - converted to
+hand speed for the size of every frame, see SwipeDetector.pixel_thresholds)'''
+SCROLL_PIXELS = 85
+SWIPE_PIXELS = 95
+
+'''phone swipe for every gesture - finger direction on the phone, sized by touch_mapper
+(hand speed is added to the command, eg. "swipe down 4.20")'''
+SWIPES = {
+    "down": "swipe down",
+    "up": "swipe up",
+    "left": "swipe right",
+    "right": "swipe left",
+}
+
+'''gesture names as in SWIPES - axis and sign of the index tip movement in the (mirrored) frame'''
+GESTURES = {"down": (1, 1), "up": (1, -1), "left": (0, 1), "right": (0, -1)}
+OPPOSITE = {"down": "up", "up": "down", "left": "right", "right": "left"}
+
+
+class RateLimiter:
+    ''' token bucket - rate commands per second, burst back to back '''
+
+    def __init__(self, rate=MAX_RATE, burst=BURST):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.last = None
+
+    def allow(self, t):
+        if self.last is not None:
+            self.tokens = min(self.burst, self.tokens + (t - self.last) * self.rate)
+        self.last = t
+        if self.tokens >= 1.0:
+            self.tokens -= 1.0
+            return True
+        return False
+
+
+class EventLog:
+    ''' gesture events in memory, optionally appended to a JSON lines file '''
+
+    def __init__(self, path=None):
+        self.events = []
+        self.file = open(path, "w") if path else None
+
+    def add(self, t, event, gesture=None, **fields):
+        item = {"t": round(t, 4), "event": event, "gesture": gesture, **fields}
+        self.events.append(item)
+        if self.file:
+            self.file.write(json.dumps(item) + "\n")
+
+    def counts(self):
+        ''' "fire", "release", "suppressed.cooldown", ... -> number of events '''
+        counts = collections.Counter()
+        for item in self.events:
+            counts[item["event"] + (f".{item['reason']}" if "reason" in item else "")] += 1
+        return dict(counts)
+
+    def close(self):
+        if self.file:
+            self.file.close()
+            self.file = None
+
+
+def load_events(path):
+    with open(path) as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def replay_events(events, send, commands, realtime=False):
+    ''' send the fired gestures of an event stream again - commands maps gesture -> swipe command
+    (speed is appended like SwipeGestures does). returns gesture -> commands sent '''
+    sent = collections.Counter()
+    start = time.perf_counter()
+    first = events[0]["t"] if events else 0.0
+    for item in events:
+        if item["event"] != "fire":
+            continue
+        if realtime:
+            time.sleep(max(0.0, item["t"] - first - (time.perf_counter() - start)))
+        send(f"{commands[item['gesture']]} {item['speed']:.2f}")
+        sent[item["gesture"]] += 1
+    return dict(sent)
+
+
+class SwipeDetector:
+    ''' index tip samples -> at most one gesture per hand motion.
+    scroll_speed - frame heights / s for up / down, swipe_speed - frame widths / s for left / right '''
+
+    def __init__(self, scroll_speed, swipe_speed, window=WINDOW, hysteresis=HYSTERESIS, cooldown=COOLDOWN,
+                 return_cooldown=RETURN_COOLDOWN, limiter=None, log=None):
+        self.thresholds = (swipe_speed, scroll_speed)   # per axis (x, y)
+        self.window = window
+        self.hysteresis = hysteresis
+        self.cooldown = cooldown
+        self.return_cooldown = return_cooldown
+        self.limiter = limiter or RateLimiter()
+        self.log = log or EventLog()
+        self.samples = collections.deque()      # (t, x, y) normalized
+        self.aspect = 16 / 9                     # frame width / height - compares x and y movement in pixels
+        self.active = None                       # gesture waiting for release, None - idle
+        self.fired_at = {}                       # gesture -> time it last fired
+        self.last_gesture = None                 # last gesture that fired
+        self.last_ended = None                   # time it was released
+
+    def pixel_thresholds(self, scroll, swipes, width, height, fps=NOMINAL_FPS):
+        ''' thresholds as pixels per frame at fps (scroll up / down, swipes left / right)
+        -> frame heights / widths per second for this frame size '''
+        self.thresholds = (swipes * fps / width, scroll * fps / height)
+        self.aspect = width / height
+
+    def velocity(self):
+        ''' (frame widths / s, frame heights / s) over the window, None with too few samples '''
+        if len(self.samples) < 2:
+            return None
+        t0, x0, y0 = self.samples[0]
+        t1, x1, y1 = self.samples[-1]
+        if t1 - t0 < 1e-3:
+            return None
+        return (x1 - x0) / (t1 - t0), (y1 - y0) / (t1 - t0)
+
+    def candidate(self, velocity):
+        ''' gesture whose threshold the dominant movement crosses, or None '''
+        vx, vy = velocity
+        if abs(vy) > abs(vx) * self.aspect:     # priortize verical movement first (compared in pixels)
+            axis, value = 1, vy
+        else:
+            axis, value = 0, vx
+        if abs(value) <= self.thresholds[axis]:
+            return None
+        sign = 1 if value > 0 else -1
+        return next(g for g, a in GESTURES.items() if a == (axis, sign))
+
+    def blocked(self, gesture, t):
+        ''' reason this gesture may not fire now, or None '''
+        if t - self.fired_at.get(gesture, -1e9) < self.cooldown:
+            return "cooldown"
+        if self.last_gesture == OPPOSITE[gesture] and self.last_ended is not None and \
+                t - self.last_ended < self.return_cooldown:
+            return "return"
+        return None
+
+    def update(self, t, x, y):
+        ''' add a sample - returns (gesture, speed in frame heights / s) when a command should be sent '''
+        self.samples.append((t, x, y))
+        while len(self.samples) > 2 and t - self.samples[0][0] > self.window:
+            self.samples.popleft()
+        velocity = self.velocity()
+        if velocity is None:
+            return None
+        return self.decide(t, velocity)
+
+    def decide(self, t, velocity):
+        ''' state machine step for a velocity (frame widths / s, frame heights / s) measured elsewhere,
+        eg. over a landmark ring buffer - returns (gesture, speed) when a command should be sent '''
+        if self.active is not None:             # fired / suppressed - wait until the motion ends
+            axis, sign = GESTURES[self.active]
+            if velocity[axis] * sign < self.thresholds[axis] * self.hysteresis:
+                self.release(t)
+            return None
+
+        gesture = self.candidate(velocity)
+        if gesture is None:
+            return None
+        self.active = gesture
+        reason = self.blocked(gesture, t)
+        if reason is None and not self.limiter.allow(t):
+            reason = "rate"
+        if reason:
+            self.log.add(t, "suppressed", gesture, reason=reason)
+            return None
+
+        speed = float((velocity[0] * self.aspect) ** 2 + velocity[1] ** 2) ** 0.5
+        self.fired_at[gesture] = t
+        self.last_gesture, self.last_ended = gesture, None
+        self.log.add(t, "fire", gesture, speed=round(speed, 3))
+        return gesture, speed
+
+    def lost(self, t):
+        ''' hand left the frame - the motion is over '''
+        self.samples.clear()
+        if self.active is not None:
+            self.release(t)
+
+    def release(self, t):
+        ''' motion of the active gesture is over '''
+        if self.active == self.last_gesture and self.last_ended is None:
+            self.last_ended = t                 # return cooldown starts here
+        self.log.add(t, "release", self.active)
+        self.active = None
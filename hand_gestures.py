@@ -1,88 +1,136 @@
-import cv2
-import mediapipe as mp
-import subprocess
+import sys
+import adb_transport  # persistent adb shell (one process for all swipes)
+from device_pool import devices_option, open_devices  # --devices=all / serials - send to several phones
+from touch_mapper import DragStream, TouchMapper      # swipes sized for each phone screen
+from render_policy import render_options              # --render= / --control= flags
+from action_dispatcher import ActionDispatcher  # sends swipes without stalling the frame loop
+from vision_pipeline import VisionPipeline, draw_hand  # threaded capture -> inference -> render
+from metrics import metrics                     # per-stage timing
+from gesture_state import EventLog, SwipeDetector  # cooldown / hysteresis / rate limit, event stream
+from gesture_state import SCROLL_PIXELS, SWIPE_PIXELS, SWIPES  # thresholds and phone commands (no mediapipe - benchmark replays)
 
-'''for mediapipe hand traking solutoins'''
-mp_hands = mp.solutions.hands  
 
-'''drawings for landmarks here for hands'''
-mp_drawing = mp.solutions.drawing_utils
+'''skip mediapipe while nothing moves and no hand was seen recently'''
+idle_gate = True
 
+'''phone finger follows the hand (continuous drag) instead of discrete swipes'''
+drag = False
 
-'''minimun required pixel movement for scrolling'''
-scroll = 85
-swipes = 95
 
-'''open webcam'''
-cap = cv2.VideoCapture(0)
 
-'''will store previous position of index finger (y-axis),(x-axis)'''
-prev_y = None
-prev_x = None
+class SwipeGestures:
 
+    def __init__(self, send=None, actions=None, drag=False, events=None):
+        '''send(command) runs a command on the phone - TouchMapper over adb shell (or a recording stub for offline replay)'''
+        self.send = send or TouchMapper()
 
-with mp_hands.Hands(
-        max_num_hands=1, # use only one hand
-        min_detection_confidence=0.6, # minimun detection of hand - 60 percent hand should be visible
-        min_tracking_confidence=0.6) as hands: # minimun traking 
+        '''background queue for adb swipes - swipes keep their order'''
+        self.actions = actions or ActionDispatcher(name="swipes")
+        self.actions.start()
 
-    '''loop till closed - close manually'''
-    while cap.isOpened(): # while camera is opened
+        '''continuous drag mode - touch down when the hand shows up, move with it, touch up when it leaves'''
+        self.drag = DragStream(self.send, self.actions) if drag else None
 
-        success, image = cap.read() # read frames of camera
+        '''index finger velocity over a short window -> one command per motion (see gesture_state)
+        events - file to record the gesture event stream to (replay with benchmark.py events)'''
+        self.log = EventLog(events)
+        self.detector = SwipeDetector(0.0, 0.0, log=self.log)    # thresholds set per frame size
 
-        '''if faliure skip to next frame'''
-        if not success:
-            continue
-        
-        '''horizontal flip'''
-        image = cv2.flip(image, 1)
-        image_rgb = cv2.cvtColor(image, cv2.COLOR_BGR2RGB) # convert BGR to RGB
-        results = hands.process(image_rgb) # detect hands
+    def handle_frame(self, frame):
+        '''render/dispatch stage - called on main thread for every inferred frame'''
+        image = frame.image
+        results = frame.results
 
         '''if hands are detected'''
         if results.multi_hand_landmarks:
-            '''draw landmarks'''
             hand_landmarks = results.multi_hand_landmarks[0]
-            mp_drawing.draw_landmarks(image, hand_landmarks, mp_hands.HAND_CONNECTIONS)
-
-            '''from normalized to pixel'''           
-            index_finger_tip_y = hand_landmarks.landmark[8].y * image.shape[0]
-            index_finger_tip_x = hand_landmarks.landmark[8].x * image.shape[0]
-
-            '''if we have previous position'''
-            if prev_y is not None and prev_x is not None :
-                dy = index_finger_tip_y - prev_y # calculate verticle movement
-                dx = index_finger_tip_x - prev_x
-
-                if abs(dy) > abs(dx): # priortize verical movement first
-                    if dy > scroll:
-                        print("down")
-                        subprocess.run(["adb", "shell", "input", "swipe", "500", "500", "500", "1500"])
-                    elif dy < -scroll:
-                        print("up")
-                        subprocess.run(["adb", "shell", "input", "swipe", "500", "1500", "500", "500"]),
-            
-                else:
-                    if dx > swipes:
-                        print("left")
-                        subprocess.run(["adb", "shell", "input", "swipe", "200", "500", "1000", "500"])
-
-                    elif dx < -swipes:
-                        print("right")
-                        subprocess.run(["adb","shell","input","swipe","1000","500","200","500"])
-
-
-                
-
-            prev_y = index_finger_tip_y
-            prev_x = index_finger_tip_x
-
-        cv2.imshow('Hand Gesture Control', image)
-        if cv2.waitKey(5) & 0xFF == 27:
-            break
-
-cap.release()
-cv2.destroyAllWindows()
-
-
+            self.handle_landmarks(hand_landmarks, image.shape[1], image.shape[0], origin=frame.captured_at)
+
+            '''draw landmarks - only on frames that are shown (see render_policy)'''
+            if frame.canvas is not None:
+                with metrics.timer("draw"):
+                    draw_hand(frame.canvas, hand_landmarks)
+
+        else:
+            self.hand_lost(frame.captured_at)
+
+    def hand_lost(self, t):
+        '''no hand in this frame - motion over, lift the finger in drag mode'''
+        self.detector.lost(t)
+        if self.drag:
+            self.drag.release(origin=t)
+
+    def handle_landmarks(self, hand_landmarks, width, height, origin=None, t=None):
+        '''swipe / scroll detection from one hand - returns detected gesture or None
+        t - capture time of the frame (stream time in replays), origin - for gesture -> action latency'''
+        if self.drag:
+            tip = hand_landmarks.landmark[8]
+            self.drag.update(tip.x, tip.y, origin=origin)
+            return None
+
+        '''normalized tip position - velocity is in frame widths / heights per second'''
+        tip = hand_landmarks.landmark[8]
+        self.detector.pixel_thresholds(SCROLL_PIXELS, SWIPE_PIXELS, width, height)
+        fired = self.detector.update(origin if t is None else t, tip.x, tip.y)
+        if fired is None:
+            return None
+
+        gesture, speed = fired
+        print(gesture)
+        '''hand speed in frame heights per second - faster hand, longer and quicker swipe'''
+        self.actions.submit(self.send, f"{SWIPES[gesture]} {speed:.2f}", origin=origin)
+        return gesture
+
+    def close(self):
+        '''finish queued swipes and close adb shell'''
+        self.actions.stop()
+        self.log.close()
+        print(f"Dispatcher stats: {self.actions.stats()}")
+        print(f"Gesture events: {self.log.counts()}")
+        adb_transport.close_all()
+
+
+def make_pipeline(source=0, render=None, control_port=None):
+    '''webcam (or video file) pipeline - capture, inference and render run on separate threads
+    render - "full", "headless", "preview:10", "downscale:0.5" (see render_policy)'''
+    return VisionPipeline(source,
+                      window='Hand Gesture Control',
+                      idle_gate=idle_gate, # low inference rate while idle
+                      max_num_hands=1, # use only one hand
+                      min_detection_confidence=0.6, # minimun detection of hand - 60 percent hand should be visible
+                      min_tracking_confidence=0.6, # minimun traking 
+                      render=render, # preview policy
+                      control_port=control_port) # local "quit" socket for headless units
+
+
+def main(source=0, devices=None, drag=drag, render=None, control_port=None, pipeline=None, events=None):
+    '''devices - None (default phone), "all", "serial,serial", a DEVICE_GROUPS name or an open DevicePool
+    drag - stream the hand as a continuous touch drag instead of swipes
+    events - JSON lines file for the gesture event stream (see gesture_state)
+    pipeline - camera / model already prepared (see remotecontrol), otherwise made here'''
+    pipeline = pipeline or make_pipeline(source, render, control_port)
+    pool = open_devices(devices)
+    gestures = SwipeGestures(send=TouchMapper(pool), drag=drag, events=events)
+    metrics.configure()                     # RC_METRICS=jsonl / prom:file to export timings
+
+    '''loop till closed - close manually (ESC)'''
+    try:
+        stats = pipeline.run(gestures.handle_frame)
+        print(f"Pipeline stats: {stats}")
+    except IOError as e:
+        print(f"Error: {str(e)}")
+        sys.exit(1)
+    finally:
+        gestures.close()
+        if pool:
+            print(f"Device stats: {pool.stats()}")
+            pool.close()
+        metrics.close()
+
+
+if __name__ == "__main__":
+    args = [a for a in sys.argv[1:] if not a.startswith("--")]
+    render, control_port = render_options(sys.argv)
+    events = next((a.split("=", 1)[1] for a in sys.argv if a.startswith("--events=")), None)
+    main(args[0] if args else 0, devices=devices_option(sys.argv), drag=drag or "--drag" in sys.argv,
+         render=render, control_port=control_port, events=events)
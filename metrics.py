@@ -0,0 +1,292 @@
+'''   per-stage latency instrumentation and metrics export
+
+enable with env variables (off by default, near zero cost when off):
+  RC_METRICS=jsonl            - print one JSON line per interval to stdout
+  RC_METRICS=jsonl:stats.log  - append JSON lines to a file
+  RC_METRICS=prom:metrics.prom - rewrite Prometheus text file every interval
+  RC_METRICS_INTERVAL=5       - seconds between dumps
+'''
+
+import bisect              # for bucket lookup
+import json                # for JSON lines export
+import os                  # for env config and atomic file replace
+import threading           # for lock and reporter thread
+import time                # for timing
+
+''' config '''
+
+# histogram bucket upper bounds in seconds (0.5 ms ... ~16 s, doubling)
+BUCKETS = tuple(0.0005 * 2 ** i for i in range(16))
+DEFAULT_INTERVAL = 5.0
+
+
+class Histogram:
+    ''' fixed bucket latency histogram - constant memory, approximate percentiles '''
+
+    __slots__ = ("counts", "count", "total", "max")
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1)    # last slot = over the biggest bucket
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def observe(self, seconds):
+        self.counts[bisect.bisect_left(BUCKETS, seconds)] += 1
+        self.count += 1
+        self.total += seconds
+        if seconds > self.max:
+            self.max = seconds
+
+    def percentile(self, q):
+        ''' linear interpolation inside the bucket that holds the q-th sample '''
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for i, n in enumerate(self.counts):
+            if n and seen + n >= rank:
+                low = BUCKETS[i - 1] if i > 0 else 0.0
+                high = BUCKETS[i] if i < len(BUCKETS) else self.max
+                return min(low + (high - low) * (rank - seen) / n, self.max)
+            seen += n
+        return self.max
+
+    def summary(self):
+        ''' milliseconds summary for JSON output '''
+        return {
+            "count": self.count,
+            "mean_ms": self.total / self.count * 1000 if self.count else 0.0,
+            "p50_ms": self.percentile(0.50) * 1000,
+            "p95_ms": self.percentile(0.95) * 1000,
+            "p99_ms": self.percentile(0.99) * 1000,
+            "max_ms": self.max * 1000,
+        }
+
+
+class _NullTimer:
+    ''' returned by timer() when metrics are off - does nothing '''
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_TIMER = _NullTimer()
+
+
+class _Timer:
+    ''' context manager that records elapsed time into a histogram '''
+
+    __slots__ = ("metrics", "name", "start")
+
+    def __init__(self, metrics, name):
+        self.metrics = metrics
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.metrics.observe(self.name, time.perf_counter() - self.start)
+        return False
+
+
+class Metrics:
+    ''' registry of histograms, counters and gauges.
+    every method returns right away when disabled '''
+
+    def __init__(self):
+        self.enabled = False
+        self.lock = threading.Lock()
+        self.histograms = {}
+        self.counters = {}
+        self.gauges = {}
+        self.rates = {}                 # counter name -> (last value, last time) for per second rates
+        self.started_at = time.time()
+        self.reporter = None
+        self.startup = None             # [program start, first action] perf_counter - see mark_start
+
+    def timer(self, name):
+        ''' with metrics.timer("inference"): ... '''
+        if not self.enabled:
+            return _NULL_TIMER
+        return _Timer(self, name)
+
+    def observe(self, name, seconds):
+        ''' record one latency sample (seconds) '''
+        if not self.enabled:
+            return
+        with self.lock:
+            histogram = self.histograms.get(name)
+            if histogram is None:
+                histogram = self.histograms[name] = Histogram()
+            histogram.observe(seconds)
+
+    def count(self, name, n=1):
+        ''' increase a counter (frames, dropped, errors ...) '''
+        if not self.enabled:
+            return
+        with self.lock:
+            self.counters[name] = self.counters.get(name, 0) + n
+
+    def gauge(self, name, value):
+        ''' set a current value (queue depth ...) '''
+        if not self.enabled:
+            return
+        with self.lock:
+            self.gauges[name] = value
+
+    def mark_start(self, t=None):
+        ''' program start (perf_counter) - the first action_done() after it prints the time to first action '''
+        self.startup = [time.perf_counter() if t is None else t, None]
+
+    def action_done(self, name):
+        ''' an action reached the desktop / phone (cheap after the first call, works when disabled too) '''
+        startup = self.startup
+        if startup is None or startup[1] is not None:
+            return
+        with self.lock:
+            if startup[1] is not None:
+                return
+            startup[1] = time.perf_counter()
+        elapsed = startup[1] - startup[0]
+        print(f"Time to first action ({name}): {elapsed:.2f} s")
+        self.gauge("startup.first_action", elapsed)
+
+    def error(self, stage, error):
+        ''' print error like before and count it per stage '''
+        print(f"Error in {stage}: {str(error)}")
+        self.count(f"errors.{stage}")
+
+    def snapshot(self):
+        ''' current values as a plain dict, with per second rate for every counter (eg. frames -> fps) '''
+        now = time.time()
+        with self.lock:
+            rates = {}
+            for name, value in self.counters.items():
+                last_value, last_time = self.rates.get(name, (0, self.started_at))
+                if now > last_time:
+                    rates[name] = (value - last_value) / (now - last_time)
+                self.rates[name] = (value, now)
+            return {
+                "time": now,
+                "uptime": now - self.started_at,
+                "latency": {name: h.summary() for name, h in self.histograms.items()},
+                "counters": dict(self.counters),
+                "rates": rates,
+                "gauges": dict(self.gauges),
+            }
+
+    def to_json(self):
+        return json.dumps(self.snapshot(), sort_keys=True)
+
+    def to_prometheus(self, prefix="remotecontrol"):
+        ''' Prometheus text exposition format '''
+        lines = []
+        with self.lock:
+            if self.histograms:
+                lines.append(f"# TYPE {prefix}_stage_seconds histogram")
+            for name, h in sorted(self.histograms.items()):
+                label = f'stage="{name}"'
+                cumulative = 0
+                for bound, n in zip(BUCKETS, h.counts):
+                    cumulative += n
+                    lines.append(f'{prefix}_stage_seconds_bucket{{{label},le="{bound:g}"}} {cumulative}')
+                lines.append(f'{prefix}_stage_seconds_bucket{{{label},le="+Inf"}} {h.count}')
+                lines.append(f"{prefix}_stage_seconds_sum{{{label}}} {h.total:.6f}")
+                lines.append(f"{prefix}_stage_seconds_count{{{label}}} {h.count}")
+            for name, value in sorted(self.counters.items()):
+                metric = f"{prefix}_{_metric_name(name)}_total"
+                lines.append(f"# TYPE {metric} counter")
+                lines.append(f"{metric} {value}")
+            for name, value in sorted(self.gauges.items()):
+                metric = f"{prefix}_{_metric_name(name)}"
+                lines.append(f"# TYPE {metric} gauge")
+                lines.append(f"{metric} {value}")
+        return "\n".join(lines) + "\n"
+
+    def reset(self):
+        with self.lock:
+            self.histograms.clear()
+            self.counters.clear()
+            self.gauges.clear()
+            self.rates.clear()
+            self.started_at = time.time()
+
+    def configure(self, spec=None, interval=None):
+        ''' turn metrics on from a spec like "jsonl", "jsonl:file" or "prom:file" (default from env) '''
+        spec = os.environ.get("RC_METRICS", "") if spec is None else spec
+        if not spec:
+            return self
+        interval = float(os.environ.get("RC_METRICS_INTERVAL", DEFAULT_INTERVAL)) if interval is None else interval
+        kind, _, path = spec.partition(":")
+        if kind not in ("jsonl", "prom"):
+            print(f"Unknown RC_METRICS format '{kind}' (use jsonl or prom)")
+            return self
+        self.enabled = True
+        self.reporter = MetricsReporter(self, kind, path or None, interval).start()
+        return self
+
+    def close(self):
+        ''' stop reporter after a final dump '''
+        if self.reporter is not None:
+            self.reporter.stop()
+            self.reporter = None
+
+
+def _metric_name(name):
+    return "".join(c if c.isalnum() else "_" for c in name)
+
+
+class MetricsReporter:
+    ''' background thread that dumps metrics every interval '''
+
+    def __init__(self, metrics, kind, path=None, interval=DEFAULT_INTERVAL):
+        self.metrics = metrics
+        self.kind = kind                # "jsonl" or "prom"
+        self.path = path                # None - stdout
+        self.interval = interval
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self._loop, name="metrics", daemon=True)
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def _loop(self):
+        while not self.stopped.wait(self.interval):
+            self.dump()
+
+    def dump(self):
+        try:
+            if self.kind == "jsonl":
+                line = self.metrics.to_json()
+                if self.path:
+                    with open(self.path, "a") as f:
+                        f.write(line + "\n")
+                else:
+                    print(line)
+            else:
+                text = self.metrics.to_prometheus()
+                if self.path:
+                    tmp = self.path + ".tmp"             # replace whole file so scrapers never read half of it
+                    with open(tmp, "w") as f:
+                        f.write(text)
+                    os.replace(tmp, self.path)
+                else:
+                    print(text)
+        except OSError as e:
+            print(f"Error writing metrics: {str(e)}")
+
+    def stop(self):
+        self.stopped.set()
+        self.thread.join(timeout=1)
+        self.dump()
+
+
+''' shared registry for the whole program '''
+metrics = Metrics()
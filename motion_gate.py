@@ -0,0 +1,103 @@
+'''   motion gated idle mode - skip mediapipe when nothing moves and no hand was seen recently  '''
+
+import cv2                 # for thumbnail resize
+import numpy as np         # for frame difference
+from metrics import metrics  # wake latency and skipped frames
+
+''' config '''
+
+THUMB_SIZE = (64, 36)       # grayscale thumbnail used for the motion check (width, height)
+MOTION_THRESHOLD = 4.0      # mean absolute pixel change (0-255) that counts as motion
+HAND_HOLD = 1.5             # seconds to stay active after the last hand was seen
+IDLE_FPS = 2.0              # inference rate while idle (still catches a hand held perfectly still)
+
+
+class NoHands:
+    ''' results for a skipped frame - looks like mediapipe results with no hand '''
+    multi_hand_landmarks = None
+    multi_handedness = None
+
+
+NO_HANDS = NoHands()
+
+
+class MotionGate:
+    ''' decides per frame whether to run inference.
+    active - hand seen in the last HAND_HOLD seconds, every frame is inferred
+    idle   - only frames with motion (or one every 1/IDLE_FPS seconds) are inferred '''
+
+    def __init__(self, threshold=MOTION_THRESHOLD, hand_hold=HAND_HOLD, idle_fps=IDLE_FPS,
+                 thumb_size=THUMB_SIZE):
+        self.threshold = threshold
+        self.hand_hold = hand_hold
+        self.idle_interval = 1.0 / idle_fps
+        self.thumb_size = thumb_size
+        self.previous = None            # last thumbnail (int16)
+        self.last_hand = None           # time hand was last seen
+        self.last_inference = None      # time of last inference
+        self.motion_since = None        # first motion time while idle (for wake latency)
+        self.motion = 0.0               # last motion score
+        self.now = 0.0                  # capture time of current frame
+
+        # counters
+        self.inferred = 0
+        self.skipped = 0
+        self.wakeups = 0
+        self.wake_latency = []          # seconds from first motion to hand detected
+
+    @property
+    def active(self):
+        return self.last_hand is not None and self.now - self.last_hand < self.hand_hold
+
+    def should_infer(self, image, now):
+        ''' image - BGR frame, now - perf_counter of capture '''
+        self.now = now
+        thumb = cv2.resize(image, self.thumb_size, interpolation=cv2.INTER_AREA)
+        gray = thumb.astype(np.int16).sum(axis=2) // 3               # cheap grayscale
+        if self.previous is None:
+            self.motion = 255.0
+        else:
+            self.motion = float(np.abs(gray - self.previous).mean())
+        self.previous = gray
+
+        run = self.active
+        if not run and self.motion > self.threshold:
+            run = True
+            if self.motion_since is None:                            # idle -> woke up by motion
+                self.motion_since = now
+                self.wakeups += 1
+        if not run and (self.last_inference is None or now - self.last_inference >= self.idle_interval):
+            run = True                                               # slow idle sampling
+
+        if run:
+            self.inferred += 1
+            self.last_inference = now
+        else:
+            self.skipped += 1
+            metrics.count("frames.idle_skipped")
+        metrics.gauge("motion", self.motion)
+        return run
+
+    def report(self, results, now):
+        ''' tell the gate what inference found '''
+        if results.multi_hand_landmarks:
+            if self.motion_since is not None:
+                latency = now - self.motion_since
+                self.wake_latency.append(latency)
+                metrics.observe("wake", latency)
+            self.motion_since = None
+            self.last_hand = now
+        elif self.motion_since is not None and now - self.motion_since > self.hand_hold:
+            self.motion_since = None                                 # motion without a hand (eg. someone walking by)
+
+    def stats(self):
+        total = self.inferred + self.skipped
+        latency = sorted(self.wake_latency)
+        return {
+            "state": "active" if self.active else "idle",
+            "gate_inferred": self.inferred,
+            "gate_skipped": self.skipped,
+            "skip_ratio": self.skipped / total if total else 0.0,
+            "wakeups": self.wakeups,
+            "wake_latency_p50_ms": latency[len(latency) // 2] * 1000 if latency else None,
+        }
@@ -1,45 +1,56 @@
 '''   import essential libraries and modules  '''
 
 import cv2                 # for cam and vision
-import mediapipe as mp     # for hand detection and traking
 import pyautogui           # for mouse control on desktop
 import time                # for time measurement 
 import numpy as np         # for maths
 import sys                 # system utilities 
-
-'''  Initialize MediaPipe  '''
-
-mp_hands = mp.solutions.hands               # mediapipe hand-traking model  
-mp_drawing = mp.solutions.drawing_utils     # mediapipe drawing tools
+from action_dispatcher import ActionDispatcher  # runs pyautogui calls off the frame loop
+from vision_pipeline import VisionPipeline, draw_hand  # threaded capture -> inference -> render
+from metrics import metrics                     # per-stage timing
+from pointer_filters import make_filter         # pointer smoothing / prediction
+from render_policy import render_options        # --render= / --control= flags
 
 ''' config '''
 
 MOUSE_SENSITIVITY = 3.5         # Pointer movement speed
 CLICK_DISTANCE = 0.04           # Distance threshold for click detection (4% of frame width)
 CLICK_COOLDOWN = 0.3            # Minimum time between clicks
-MOVEMENT_SMOOTHING = 0.2        # Smoothing factor for mouse movements (0-1)
+CLICK_PAUSE = 0.1               # Pause after click (on dispatcher thread, not the frame loop)
+MOVEMENT_SMOOTHING = 0.2        # Smoothing factor for mouse movements (0-1) - "ema" filter only
+POINTER_FILTER = "one_euro"     # "one_euro" (adaptive, less lag when moving fast) or "ema" (fixed smoothing)
+POINTER_PREDICTION = True       # Move pointer ahead by the measured pipeline latency
+ROI_TRACKING = False            # Run inference on a crop around the last hand (full frame when lost) - measure with benchmark.py roi first
+IDLE_GATE = True                # Skip inference while nothing moves and no hand was seen recently
 
 ''' class for implementaion '''
 
 class DesktopMouse:
-    def __init__(self):
-        self.screen_width, self.screen_height = pyautogui.size()  # gets your screen resolution (e.g - 1920 x 1080)
+    def __init__(self, backend=pyautogui, actions=None, clock=time.time, pointer_filter=None):
+        self.backend = backend                                    # pyautogui (or a recording stub for offline replay)
+        self.clock = clock                                        # time source for click cooldown
+        self.screen_width, self.screen_height = backend.size()    # gets your screen resolution (e.g - 1920 x 1080)
         self.prev_x = None                                        # previous mouse position on x axis
         self.prev_y = None                                        # previous mouse position on y axis
         self.last_click_time = 0                                  # timestamp for last click
         self.smoothed_x = None                                    # x position - smoothed (for stability)
         self.smoothed_y = None                                    # y position - smoothed (for stability)
+        self.filter = pointer_filter or default_filter()          # smoothing filter for the pointer
+        
+        self.actions = actions or ActionDispatcher(name="mouse")  # background queue for moves and clicks
+        self.actions.start()
         
-        pyautogui.FAILSAFE = False                                # disabled fail safe (to prevent crashes)                              
-        pyautogui.PAUSE = 0.01                                    # delay between pyautogui actions
+        backend.FAILSAFE = False                                  # disabled fail safe (to prevent crashes)                              
+        backend.PAUSE = 0.01                                      # delay between pyautogui actions
 
 
     
-    def handle_gestures(self, index_tip, thumb_tip):
+    def handle_gestures(self, index_tip, thumb_tip, origin=None):
 
-        ''' Process all hand gestures for desktop control '''
+        ''' Process all hand gestures for desktop control
+        origin - time the frame was captured (for gesture -> action latency) '''
 
-        current_time = time.time()  # save current time in variable
+        current_time = self.clock()  # save current time in variable
         
         # Calculate distance between fingers (normalized 0-1)
 
@@ -53,19 +64,15 @@ class DesktopMouse:
         y_pos = int(index_tip.y * self.screen_height)
         
         # Apply smoothing to mouse movements
-        '''in else block : if we have last position of x and y then we will add value according hyper-parameter
-         here, MOVEMENT_SMOOTHING = 2 so, 20% of new position + 80% of previous position'''
-
-        if self.smoothed_x is None: 
-            self.smoothed_x = x_pos      # for first movement 
-            self.smoothed_y = y_pos
-        else:
-            self.smoothed_x = MOVEMENT_SMOOTHING * x_pos + (1 - MOVEMENT_SMOOTHING) * self.smoothed_x
-            self.smoothed_y = MOVEMENT_SMOOTHING * y_pos + (1 - MOVEMENT_SMOOTHING) * self.smoothed_y
+        '''filter (see pointer_filters) - "ema" is the old fixed smoothing: 20% of new position + 80% of previous,
+        "one_euro" smooths less the faster the hand moves, prediction moves ahead by the frame's latency'''
+
+        latency = time.perf_counter() - origin if origin else 0.0
+        self.smoothed_x, self.smoothed_y = self.filter.filter((x_pos, y_pos), current_time, latency)
         
-        # Move mouse pointer (with smoothing)
+        # Move mouse pointer (with smoothing) - queued, stale moves are merged so only newest is sent
 
-        pyautogui.moveTo(int(self.smoothed_x), int(self.smoothed_y), duration=0.01)
+        self.actions.move(self.backend.moveTo, int(self.smoothed_x), int(self.smoothed_y), duration=0.01, origin=origin)
         
         # Click detection (finger touch)
 
@@ -73,92 +80,110 @@ class DesktopMouse:
         then we consider it as click , new click will only consider after given time in CLICK_COOLDOWN'''
 
         if distance < CLICK_DISTANCE and current_time - self.last_click_time > CLICK_COOLDOWN:
-            pyautogui.click() 
+            self.actions.submit(self.backend.click, pause=CLICK_PAUSE, origin=origin)  # small delay after click (on dispatcher thread)
             print(f"Click at ({int(self.smoothed_x)}, {int(self.smoothed_y)})")
             self.last_click_time = current_time 
-            time.sleep(0.1)  # Small delay after click
 
-def main():
+    def close(self):
+        ''' finish queued actions and stop dispatcher '''
+        self.actions.stop()
+        print(f"Dispatcher stats: {self.actions.stats()}")
 
-    # Initialize webcam
+def default_filter():
+    ''' pointer filter from config '''
+    if POINTER_FILTER == "ema":
+        return make_filter("ema", predict=POINTER_PREDICTION, alpha=MOVEMENT_SMOOTHING)
+    return make_filter(POINTER_FILTER, predict=POINTER_PREDICTION)
 
-    cap = cv2.VideoCapture(0)
-    if not cap.isOpened():                   # if not web came then exit           
-        print("Error: Could not open webcam")
-        sys.exit(1)
+def draw_frame(mouse, frame):
+
+    ''' render/dispatch stage - runs on main thread for every inferred frame '''
+
+    results = frame.results
+    canvas = frame.canvas       # None - frame is not shown (headless / throttled preview), only dispatch
+
+    '''if hands are detected'''
+
+    if results.multi_hand_landmarks:
+        hand_landmarks = results.multi_hand_landmarks[0]                            # get hand landmarks
+        
+        # Get finger positions
+        index_tip = hand_landmarks.landmark[8]  # index finger 
+        thumb_tip = hand_landmarks.landmark[4]  # thumb 
+        
+        # Handle gestures , contol the mouse through pyautogui's DesktopMouse class
+        mouse.handle_gestures(index_tip, thumb_tip, origin=frame.captured_at)
+
+        if canvas is not None:
+            with metrics.timer("draw"):
+                draw_hand(canvas, hand_landmarks) # draw landmarks    
+        
+                # Draw connection line between fingers
+                cv2.line(canvas, 
+                        (int(index_tip.x * canvas.shape[1]), int(index_tip.y * canvas.shape[0])),  # from index tip cordinates
+                        (int(thumb_tip.x * canvas.shape[1]), int(thumb_tip.y * canvas.shape[0])),  # to thumb cordinates                 
+                        (0, 255, 0), 2)                                                            # green line
+
+    if canvas is None:
+        return
+
+    # text sized for the canvas (smaller when the overlay is drawn on a downscaled copy)
+    s = canvas.shape[1] / frame.image.shape[1]
+    thickness = max(1, round(2 * s))
+
+    # Display status and instructions
+    status_text = "Desktop Mouse Control"
+    cv2.putText(canvas, status_text, (int(20 * s), int(40 * s)), 
+               cv2.FONT_HERSHEY_SIMPLEX, 1 * s, (0, 255, 0), thickness)
+    help_text = "Touch thumb and index to click"
+    cv2.putText(canvas, help_text, (int(20 * s), int(80 * s)),
+               cv2.FONT_HERSHEY_SIMPLEX, 0.7 * s, (255, 255, 255), thickness)
     
-    # Set camera resolution
-    cap.set(cv2.CAP_PROP_FRAME_WIDTH, 1280)
-    cap.set(cv2.CAP_PROP_FRAME_HEIGHT, 720)
+    # Show click distance threshold
+    cv2.putText(canvas, f"Click Threshold: {CLICK_DISTANCE*100:.1f}%", (int(20 * s), int(120 * s)),
+               cv2.FONT_HERSHEY_SIMPLEX, 0.7 * s, (255, 255, 255), thickness)
+    
+    # Show action queue depth and dropped events
+    cv2.putText(canvas, f"Queue: {mouse.actions.depth}  Dropped: {mouse.actions.dropped}", (int(20 * s), int(160 * s)),
+               cv2.FONT_HERSHEY_SIMPLEX, 0.7 * s, (255, 255, 255), thickness)
+
+def make_pipeline(source=0, render=None, control_port=None):
+
+    # Capture, inference and render run on separate threads (camera index or video file)
+    # render - "full", "headless", "preview:10", "downscale:0.5" (see render_policy)
+
+    return VisionPipeline(source,
+                      width=1280, height=720,           # camera resolution
+                      window='Desktop Mouse Control',
+                      roi=ROI_TRACKING,                 # crop inference to the hand
+                      idle_gate=IDLE_GATE,              # low inference rate while idle
+                      max_num_hands=1,                  # you can onlu use one hand
+                      min_detection_confidence=0.7,     # 0-1  0 < 0.1 < traking and detection gets better and strict < 1
+                      min_tracking_confidence=0.7,
+                      render=render,                    # preview policy
+                      control_port=control_port)        # local "quit" socket for headless units
+
+def main(source=0, render=None, control_port=None, pipeline=None):
+
+    # pipeline - camera / model already prepared (see remotecontrol), otherwise made here
+    pipeline = pipeline or make_pipeline(source, render, control_port)
     
     # Initialize mouse controller
     mouse = DesktopMouse()
+    metrics.configure()                     # RC_METRICS=jsonl / prom:file to export timings
     
-    with mp_hands.Hands(
-            max_num_hands=1,               # you can onlu use one hand
-            min_detection_confidence=0.7,  # 0-1  0 < 0.1 < traking and detection gets better and strict < 1
-            min_tracking_confidence=0.7) as hands:
-        
-        '''while camera is opened (main loop for frames)'''
-        while cap.isOpened():
-
-            try:
-                success, image = cap.read()                # read each frame
-                if not success:                            # if not then move to next frame after 0.1s
-                    print("Warning: Frame read failed") 
-                    time.sleep(0.1)
-                    continue
-                
-                # Mirror and convert colors (opencv detects in BGR , mediapipe works with RGB)
-                image = cv2.flip(image, 1)
-                image_rgb = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
-                
-                # Process hand landmarks
-                results = hands.process(image_rgb)
-                
-                '''if hands are detected'''
-
-                if results.multi_hand_landmarks:
-                    hand_landmarks = results.multi_hand_landmarks[0]                            # get hand landmarks
-                    mp_drawing.draw_landmarks(image, hand_landmarks, mp_hands.HAND_CONNECTIONS) # draw landmarks    
-                    
-                    # Get finger positions
-                    index_tip = hand_landmarks.landmark[8]  # index finger 
-                    thumb_tip = hand_landmarks.landmark[4]  # thumb 
-                    
-                    # Draw connection line between fingers
-                    cv2.line(image, 
-                            (int(index_tip.x * image.shape[1]), int(index_tip.y * image.shape[0])),  # from index tip cordinates
-                            (int(thumb_tip.x * image.shape[1]), int(thumb_tip.y * image.shape[0])),  # to thumb cordinates                 
-                            (0, 255, 0), 2)                                                          # green line
-                    
-                    # Handle gestures , contol the mouse through pyautogui's DesktopMouse class
-                    mouse.handle_gestures(index_tip, thumb_tip, image.shape[1], image.shape[0])
-                
-                # Display status and instructions
-                status_text = "Desktop Mouse Control"
-                cv2.putText(image, status_text, (20, 40), 
-                           cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 255, 0), 2)
-                help_text = "Touch thumb and index to click"
-                cv2.putText(image, help_text, (20, 80),
-                           cv2.FONT_HERSHEY_SIMPLEX, 0.7, (255, 255, 255), 2)
-                
-                # Show click distance threshold
-                cv2.putText(image, f"Click Threshold: {CLICK_DISTANCE*100:.1f}%", (20, 120),
-                           cv2.FONT_HERSHEY_SIMPLEX, 0.7, (255, 255, 255), 2)
-                
-                cv2.imshow('Desktop Mouse Control', image)
-                if cv2.waitKey(5) & 0xFF == 27:
-                    break
-            
-            except Exception as e:
-                print(f"Error in main loop: {str(e)}")
-                time.sleep(0.1)
-                continue
-    
-    cap.release()
-    cv2.destroyAllWindows()
+    try:
+        stats = pipeline.run(lambda frame: draw_frame(mouse, frame))
+        print(f"Pipeline stats: {stats}")
+    except IOError as e:                     # if not web came then exit           
+        print(f"Error: {str(e)}")
+        sys.exit(1)
+    finally:
+        mouse.close()
+        metrics.close()
 
-'''execute main loop'''
+'''execute main loop - optional argument: camera index or video file, --render=<mode>, --control=<port>'''
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    args = [a for a in sys.argv[1:] if not a.startswith("--")]
+    render, control_port = render_options(sys.argv)
+    main(args[0] if args else 0, render, control_port)
\ No newline at end of file
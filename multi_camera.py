@@ -0,0 +1,447 @@
+'''   process parallel multi camera / multi hand inference
+
+mediapipe runs under the GIL, so one process can only use one core for inference.
+here every camera gets its own worker process(es) with its own mp_hands.Hands:
+
+  capture thread (main process) --frame--> shared memory ring --slot index--> worker process
+  worker process --landmarks (small arrays)--> results queue --> one merged stream (main process)
+
+frames are decoded straight into the shared memory slot and the worker runs mediapipe on
+that memory - only slot numbers and landmarks go through the queues, never pixels.
+several workers per camera share its ring (frame n goes to whichever worker is free).
+each hand of each camera (handedness "Left" / "Right") is one operator for the gesture layer.
+
+  python multi_camera.py cam1.mp4 cam2.mp4 cam3.mp4 [--workers 2] [--roi]    # benchmark
+  python multi_camera.py 0 1 --swipes [--devices=all]                        # two cameras -> phones
+'''
+
+import multiprocessing     # for worker processes and queues
+import queue               # for queue.Empty
+import sys                 # for command line
+import threading           # for capture threads
+import time                # for timing
+from multiprocessing import shared_memory  # for frame rings
+
+import cv2                 # for capture
+import numpy as np         # for frame views and landmark arrays
+
+from metrics import metrics                  # per camera inference time
+from render_policy import ExitControl        # Ctrl+C / SIGTERM / control socket
+
+''' config '''
+
+SLOTS_PER_WORKER = 2        # ring slots per worker - one being inferred, one being filled
+MAX_NUM_HANDS = 2           # hands per camera (each one is an operator)
+START_METHOD = "spawn"      # fresh interpreter per worker (no forked locks / threads, same on every OS)
+
+
+class FrameRing:
+    ''' N frames of the same shape in one shared memory block '''
+
+    def __init__(self, shape, slots, name=None):
+        self.shape = tuple(shape)
+        self.slots = slots
+        size = int(np.prod(self.shape)) * slots
+        self.owner = name is None
+        self.shm = shared_memory.SharedMemory(create=True, size=size) if self.owner \
+            else shared_memory.SharedMemory(name=name)
+        self.frames = np.ndarray((slots,) + self.shape, dtype=np.uint8, buffer=self.shm.buf)
+
+    @property
+    def name(self):
+        return self.shm.name
+
+    def close(self):
+        del self.frames                             # release the buffer view before closing
+        self.shm.close()
+        if self.owner:
+            self.shm.unlink()
+
+
+class HandFrame:
+    ''' merged stream item - landmarks of one inferred frame of one camera '''
+
+    __slots__ = ("camera", "index", "captured_at", "inferred_at", "width", "height", "hands", "labels")
+
+    def __init__(self, camera, index, captured_at, inferred_at, width, height, hands, labels):
+        self.camera = camera                # camera number (position in sources)
+        self.index = index                  # frame number of that camera
+        self.captured_at = captured_at      # perf_counter (same clock in every process)
+        self.inferred_at = inferred_at
+        self.width = width
+        self.height = height
+        self.hands = hands                  # list of (21, 3) float32 arrays, mirrored like the preview
+        self.labels = labels                # handedness per hand ("Left" / "Right")
+
+
+def inference_worker(camera, ring_name, shape, slots, ready, free, results, roi, hands_options):
+    ''' worker process - mediapipe on frames in the shared ring, landmarks to the results queue '''
+    from roi_tracking import HandTracker    # imported here - mediapipe is only loaded in workers
+
+    ring = FrameRing(shape, slots, name=ring_name)
+    height, width = shape[:2]
+    swap = {"Left": "Right", "Right": "Left"}
+    try:
+        with HandTracker(roi=roi, **hands_options) as tracker:
+            tracker.warm_up(width, height)              # model loaded before the clock starts
+            results.put(("ready", camera))
+            while True:
+                item = ready.get()
+                if item is None:
+                    break
+                slot, index, captured_at = item
+                start = time.perf_counter()
+                found = tracker.process(ring.frames[slot])      # no copy - straight from shared memory
+                inferred_at = time.perf_counter()
+                free.put(slot)                                  # slot can be filled again
+
+                hands, labels = [], []
+                for i, hand in enumerate(found.multi_hand_landmarks or []):
+                    points = np.array([(1.0 - lm.x, lm.y, lm.z) for lm in hand.landmark], dtype=np.float32)
+                    hands.append(points)                        # x mirrored - frame was not flipped
+                    label = found.multi_handedness[i].classification[0].label if found.multi_handedness else "Right"
+                    labels.append(swap.get(label, label))
+                results.put(("frame", camera, index, captured_at, inferred_at, inferred_at - start,
+                             width, height, hands, labels))
+    finally:
+        del ring.frames
+        ring.shm.close()
+        results.put(("done", camera))
+
+
+class CameraFeed:
+    ''' one camera (or video file) - capture thread, ring and its workers '''
+
+    def __init__(self, camera, source, workers, realtime, context):
+        self.camera = camera
+        self.source = source
+        self.is_file = isinstance(source, str) and not source.isdigit()
+        self.realtime = (not self.is_file) if realtime is None else realtime
+        self.cap = cv2.VideoCapture(source if self.is_file else int(source))
+        if not self.cap.isOpened():
+            raise IOError(f"Could not open video source {source}")
+        success, first = self.cap.read()                    # frame size for the ring
+        if not success:
+            raise IOError(f"No frames from video source {source}")
+        self.workers = workers
+        self.ring = FrameRing(first.shape, workers * SLOTS_PER_WORKER)
+        self.ready = context.Queue()                         # (slot, index, captured_at) -> workers
+        self.free = context.Queue()                          # slot numbers back from workers
+        for slot in range(self.ring.slots):
+            self.free.put(slot)
+        self.pending = first                                 # first frame goes into the ring with the rest
+        self.running = True
+        self.thread = None
+
+        # counters
+        self.captured = 0
+        self.dropped = 0                                     # camera frames skipped, every slot busy
+        self.copied = 0                                      # frames the decoder did not write in place
+
+    def capture(self):
+        ''' capture thread - decode frames into free ring slots '''
+        interval = 0
+        if self.is_file and self.realtime:
+            interval = 1.0 / (self.cap.get(cv2.CAP_PROP_FPS) or 30)
+        next_time = time.perf_counter()
+        try:
+            while self.running:
+                if interval:                                 # pace video file like a camera
+                    time.sleep(max(0, next_time - time.perf_counter()))
+                    next_time += interval
+                try:
+                    slot = self.free.get(timeout=0.5) if not self.realtime else self.free.get_nowait()
+                except queue.Empty:
+                    if self.realtime:                        # workers busy - skip this camera frame
+                        success, _ = self.cap.read()
+                        if not success and self.is_file:
+                            break
+                        self.dropped += 1
+                        metrics.count(f"frames.dropped.camera{self.camera}")
+                    continue
+                target = self.ring.frames[slot]
+                if self.pending is not None:
+                    np.copyto(target, self.pending)
+                    success, self.pending = True, None
+                else:
+                    success, image = self.cap.read(target)   # decode into shared memory
+                    if success and image is not None and image.ctypes.data != target.ctypes.data:
+                        np.copyto(target, image)              # decoder allocated its own buffer
+                        self.copied += 1
+                if not success:
+                    self.free.put(slot)
+                    if self.is_file:                          # end of video
+                        break
+                    time.sleep(0.1)
+                    continue
+                self.ready.put((slot, self.captured, time.perf_counter()))
+                self.captured += 1
+        finally:
+            self.cap.release()
+            for _ in range(self.workers):
+                self.ready.put(None)                          # stop the workers
+
+    def start(self):
+        self.thread = threading.Thread(target=self.capture, name=f"capture{self.camera}", daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.running = False
+        if self.thread:
+            self.thread.join(timeout=2)
+
+    def close(self):
+        self.ring.close()
+
+
+class MultiCameraPipeline:
+    ''' several cameras, one or more inference processes each, one merged landmark stream.
+    handler(HandFrame) runs on the main thread; old frames of a camera that arrive after
+    newer ones (several workers) are dropped so every camera stays in order '''
+
+    def __init__(self, sources, workers_per_camera=1, realtime=None, roi=False, control_port=None,
+                 max_num_hands=MAX_NUM_HANDS, min_detection_confidence=0.7, min_tracking_confidence=0.7):
+        self.sources = list(sources)
+        self.workers_per_camera = workers_per_camera
+        self.realtime = realtime
+        self.roi = roi
+        self.control_port = control_port
+        self.hands_options = dict(max_num_hands=max_num_hands,
+                                  min_detection_confidence=min_detection_confidence,
+                                  min_tracking_confidence=min_tracking_confidence)
+        self.context = multiprocessing.get_context(START_METHOD)
+        self.feeds = []
+        self.processes = []
+        self.results = None                 # landmarks from every worker
+        self.started_at = None              # all workers ready, capture started
+        self.startup = 0.0                  # seconds to spawn the workers and load the models
+
+        # counters
+        self.inferred = 0
+        self.delivered = 0
+        self.stale = 0                      # out of order frames dropped
+        self.inference_time = {}            # camera -> seconds spent in mediapipe
+
+    def start(self, control=None):
+        ''' spawn the workers, wait until every model is loaded, then start capture -
+        returns the number of workers running '''
+        begin = time.perf_counter()
+        results = self.results = self.context.Queue()
+        for camera, source in enumerate(self.sources):
+            feed = CameraFeed(camera, source, self.workers_per_camera, self.realtime, self.context)
+            self.feeds.append(feed)
+            for _ in range(self.workers_per_camera):
+                process = self.context.Process(
+                    target=inference_worker, name=f"hands{camera}",
+                    args=(camera, feed.ring.name, feed.ring.shape, feed.ring.slots, feed.ready, feed.free,
+                          results, self.roi, self.hands_options),
+                    daemon=True)
+                process.start()
+                self.processes.append(process)
+
+        waiting = running = len(self.processes)
+        while waiting and not (control and control.stopped):
+            try:
+                message = results.get(timeout=0.5)
+            except queue.Empty:
+                if not any(p.is_alive() for p in self.processes):
+                    break
+                continue
+            waiting -= 1
+            if message[0] == "done":            # worker failed while loading
+                running -= 1
+
+        self.startup = time.perf_counter() - begin
+        self.started_at = time.perf_counter()
+        for feed in self.feeds:
+            feed.start()
+        return running
+
+    def run(self, handler, max_frames=None):
+        ''' run until every source ended, max_frames were delivered or stop was requested '''
+        control = ExitControl(self.control_port, status=self.stats)
+        control.install_signals()
+        last_index = {}
+        try:
+            running = self.start(control)
+            results = self.results
+            while running and not control.stopped:
+                try:
+                    message = results.get(timeout=0.5)
+                except queue.Empty:
+                    continue
+                if message[0] == "done":
+                    running -= 1
+                    continue
+                _, camera, index, captured_at, inferred_at, took, width, height, hands, labels = message
+                self.inferred += 1
+                self.inference_time[camera] = self.inference_time.get(camera, 0.0) + took
+                metrics.observe(f"inference.camera{camera}", took)
+                if index < last_index.get(camera, -1):
+                    self.stale += 1
+                    continue
+                last_index[camera] = index
+                frame = HandFrame(camera, index, captured_at, inferred_at, width, height, hands, labels)
+                try:
+                    handler(frame)
+                except Exception as e:
+                    metrics.error("multi camera", e)
+                self.delivered += 1
+                metrics.observe("frame", time.perf_counter() - captured_at)
+                if max_frames and self.delivered >= max_frames:
+                    break
+        finally:
+            control.close()
+            self.stop()
+        return self.stats()
+
+    def drain(self):
+        ''' drop results nobody will read - a worker can not exit while its queue pipe is full '''
+        while self.results is not None:
+            try:
+                self.results.get_nowait()
+            except queue.Empty:
+                break
+
+    def stop(self):
+        for feed in self.feeds:
+            feed.stop()
+        deadline = time.perf_counter() + 5
+        for process in self.processes:
+            while process.is_alive() and time.perf_counter() < deadline:
+                self.drain()
+                process.join(timeout=0.05)
+            if process.is_alive():
+                process.terminate()
+        for feed in self.feeds:
+            feed.close()
+        if self.started_at is not None:
+            self.elapsed = time.perf_counter() - self.started_at
+
+    def stats(self):
+        elapsed = getattr(self, "elapsed", None) or \
+            (time.perf_counter() - self.started_at if self.started_at is not None else 0.0)
+        return {
+            "cameras": len(self.sources),
+            "workers": len(self.processes),
+            "captured": sum(f.captured for f in self.feeds),
+            "dropped": sum(f.dropped for f in self.feeds),
+            "copied": sum(f.copied for f in self.feeds),
+            "inferred": self.inferred,
+            "delivered": self.delivered,
+            "stale": self.stale,
+            "fps": self.delivered / elapsed if elapsed else 0.0,
+            "per_camera_fps": [f.captured / elapsed if elapsed else 0.0 for f in self.feeds],
+            "elapsed": elapsed,
+            "startup": self.startup,
+        }
+
+
+class MultiHandEngine:
+    ''' merged stream -> one landmark history and set of gesture consumers per operator
+    (camera, handedness). make_consumers(key) builds the consumers for a new operator '''
+
+    def __init__(self, make_consumers):
+        from vision_engine import LandmarkHistory   # ring buffer the consumers read
+        self.history_class = LandmarkHistory
+        self.make_consumers = make_consumers
+        self.operators = {}                         # (camera, label) -> (history, consumers)
+
+    def handle_frame(self, frame):
+        seen = set()
+        for points, label in zip(frame.hands, frame.labels):
+            key = (frame.camera, label)
+            if key in seen:
+                continue                            # two hands with the same label - keep the first
+            seen.add(key)
+            self.update(key, points, frame)
+        for key in self.operators:
+            if key[0] == frame.camera and key not in seen:
+                self.update(key, None, frame)       # this operator's hand is gone
+
+    def update(self, key, points, frame):
+        if key not in self.operators:
+            if points is None:
+                return
+            self.operators[key] = (self.history_class(), self.make_consumers(key))
+        history, consumers = self.operators[key]
+        history.width, history.height = frame.width, frame.height
+        history.push(points, frame.captured_at)
+        for consumer in consumers:
+            consumer.update(history, origin=frame.captured_at)
+
+
+def benchmark(sources, workers_per_camera=1, roi=False):
+    ''' every frame of every video through one process vs one process per camera (lossless) '''
+    from roi_tracking import HandTracker
+
+    trackers = [HandTracker(roi=roi, max_num_hands=MAX_NUM_HANDS) for _ in sources]
+    caps = [cv2.VideoCapture(s) for s in sources]
+    for tracker, cap in zip(trackers, caps):        # models loaded before the clock starts, like the workers
+        tracker.warm_up(int(cap.get(cv2.CAP_PROP_FRAME_WIDTH)) or 640, int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT)) or 480)
+    start = time.perf_counter()
+    frames = 0
+    active = list(range(len(sources)))
+    while active:                                   # cameras take turns like one pipeline serving all
+        for camera in list(active):
+            success, image = caps[camera].read()
+            if not success:
+                active.remove(camera)
+                continue
+            trackers[camera].process(image)
+            frames += 1
+    sequential = frames / (time.perf_counter() - start)
+    for tracker in trackers:
+        tracker.close()
+
+    pipeline = MultiCameraPipeline(sources, workers_per_camera, realtime=False, roi=roi)
+    stats = pipeline.run(lambda frame: None)
+    parallel = stats["inferred"] / stats["elapsed"]
+    print(f"cameras                : {len(sources)} ({multiprocessing.cpu_count()} cpu)")
+    print(f"one process            : {sequential:.1f} frames/s")
+    print(f"process per camera     : {parallel:.1f} frames/s ({stats['workers']} workers, "
+          f"{stats['stale']} out of order, startup {stats['startup']:.2f} s not timed)")
+    print(f"speedup                : {parallel / sequential:.2f}x")
+    print(f"frames copied by decoder: {stats['copied']} of {stats['captured']}")
+
+
+def main(sources, devices=None):
+    ''' several cameras -> swipes, one DirectionalSwipe per operator '''
+    import adb_transport
+    from action_dispatcher import ActionDispatcher
+    from device_pool import open_devices
+    from touch_mapper import TouchMapper
+    from vision_engine import DirectionalSwipe
+
+    pool = open_devices(devices)
+    send = TouchMapper(pool)
+    actions = ActionDispatcher(name="swipes").start()
+    engine = MultiHandEngine(lambda key: [DirectionalSwipe(send, actions)])
+    pipeline = MultiCameraPipeline(sources)
+    metrics.configure()
+    try:
+        print(f"Pipeline stats: {pipeline.run(engine.handle_frame)}")
+        print(f"Operators: {sorted(engine.operators)}")
+    finally:
+        actions.stop()
+        if pool:
+            pool.close()
+        adb_transport.close_all()
+        metrics.close()
+
+
+if __name__ == "__main__":
+    from device_pool import devices_option
+
+    args = [a for a in sys.argv[1:] if not a.startswith("--")]
+    if not args:
+        print("usage: python multi_camera.py <video | camera index> ... [--workers N] [--roi] [--swipes]")
+        sys.exit(1)
+    workers = 1
+    if "--workers" in sys.argv:
+        workers = int(sys.argv[sys.argv.index("--workers") + 1])
+        args.remove(str(workers))
+    if "--swipes" in sys.argv:
+        main(args, devices=devices_option(sys.argv))
+    else:
+        benchmark(args, workers, roi="--roi" in sys.argv)
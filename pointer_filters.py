@@ -0,0 +1,177 @@
+'''   pointer filters - smoothing and latency compensation for the mouse pointer
+
+  ema       - fixed exponential moving average (the old MOVEMENT_SMOOTHING behaviour)
+  one_euro  - adaptive low pass: heavy smoothing when the hand is still, little lag when it moves fast
+  + predict - extrapolates with the filtered velocity by the measured pipeline latency
+
+all filters work on pixel positions and keep their state in small NumPy arrays
+'''
+
+import math                # for cutoff -> alpha
+import numpy as np         # for filter state
+
+''' config '''
+
+ONE_EURO_MIN_CUTOFF = 1.0   # Hz - smoothing when still (lower = less jitter)
+ONE_EURO_BETA = 0.007       # speed coefficient (higher = less lag when moving fast)
+ONE_EURO_D_CUTOFF = 1.0     # Hz - smoothing of the velocity estimate
+MAX_PREDICTION = 0.1        # seconds - never extrapolate further than this
+LATENCY_SMOOTHING = 0.1     # EMA factor for the measured latency
+
+
+def _alpha(cutoff, dt):
+    ''' smoothing factor of a first order low pass for a cutoff frequency '''
+    tau = 1.0 / (2 * math.pi * cutoff)
+    return 1.0 / (1.0 + tau / dt)
+
+
+class EmaFilter:
+    ''' fixed exponential moving average - alpha of new position + (1 - alpha) of previous '''
+
+    def __init__(self, alpha=0.2):
+        self.alpha = alpha
+        self.state = None               # last output
+
+    def reset(self):
+        self.state = None
+
+    def filter(self, point, t, latency=0.0):
+        point = np.asarray(point, dtype=np.float64)
+        if self.state is None:
+            self.state = point.copy()
+        else:
+            self.state += self.alpha * (point - self.state)
+        return self.state.copy()
+
+
+class OneEuroFilter:
+    ''' One Euro filter (Casiez et al.) - cutoff grows with the filtered speed.
+    state rows: 0 - filtered position, 1 - filtered velocity, 2 - previous raw position '''
+
+    def __init__(self, min_cutoff=ONE_EURO_MIN_CUTOFF, beta=ONE_EURO_BETA, d_cutoff=ONE_EURO_D_CUTOFF):
+        self.min_cutoff = min_cutoff
+        self.beta = beta
+        self.d_cutoff = d_cutoff
+        self.state = None
+        self.t = None
+
+    def reset(self):
+        self.state = None
+        self.t = None
+
+    @property
+    def velocity(self):
+        return self.state[1] if self.state is not None else None
+
+    def filter(self, point, t, latency=0.0):
+        point = np.asarray(point, dtype=np.float64)
+        if self.state is None:
+            self.state = np.zeros((3, point.shape[0]))
+            self.state[0] = point
+            self.state[2] = point
+            self.t = t
+            return self.state[0].copy()
+        dt = t - self.t
+        if dt <= 0:                                             # same timestamp - nothing new
+            return self.state[0].copy()
+        self.t = t
+
+        velocity = (point - self.state[2]) / dt
+        self.state[1] += _alpha(self.d_cutoff, dt) * (velocity - self.state[1])
+        cutoff = self.min_cutoff + self.beta * float(np.hypot(*self.state[1][:2]))
+        self.state[0] += _alpha(cutoff, dt) * (point - self.state[0])
+        self.state[2] = point
+        return self.state[0].copy()
+
+
+class PredictiveFilter:
+    ''' wraps a filter and moves its output ahead along the filtered velocity by the pipeline
+    latency (capture -> pointer moved), so the pointer is where the hand is now, not where it was '''
+
+    def __init__(self, inner, horizon=None, max_prediction=MAX_PREDICTION):
+        self.inner = inner
+        self.horizon = horizon          # fixed seconds, None - use measured latency
+        self.max_prediction = max_prediction
+        self.latency = 0.0              # smoothed measured latency
+        self.velocity = None            # fallback velocity when inner has none (rows: velocity, last output)
+        self.t = None
+
+    def reset(self):
+        self.inner.reset()
+        self.velocity = None
+        self.t = None
+
+    def filter(self, point, t, latency=0.0):
+        if latency:
+            self.latency += LATENCY_SMOOTHING * (latency - self.latency)
+        smoothed = np.array(self.inner.filter(point, t), dtype=np.float64)
+
+        velocity = getattr(self.inner, "velocity", None)
+        if velocity is None:                                    # eg. ema - estimate from outputs
+            if self.velocity is None or self.t is None or t <= self.t:
+                self.velocity = np.vstack([np.zeros_like(smoothed), smoothed])
+            else:
+                self.velocity[0] = (smoothed - self.velocity[1]) / (t - self.t)
+                self.velocity[1] = smoothed
+            velocity = self.velocity[0]
+        self.t = t
+        velocity = np.array(velocity)
+
+        horizon = self.latency if self.horizon is None else self.horizon
+        return smoothed + velocity * min(horizon, self.max_prediction)
+
+
+def make_filter(name="one_euro", predict=False, horizon=None, **options):
+    ''' build a filter by name: "ema" or "one_euro", optionally with prediction '''
+    filters = {"ema": EmaFilter, "one_euro": OneEuroFilter}
+    if name not in filters:
+        raise ValueError(f"Unknown pointer filter '{name}' (use {', '.join(filters)})")
+    pointer_filter = filters[name](**options)
+    return PredictiveFilter(pointer_filter, horizon) if predict else pointer_filter
+
+
+''' offline evaluation '''
+
+def reference_path(times, points, window=0.1):
+    ''' non causal centered moving average - stands in for the "true" hand path of a recorded trace '''
+    reference = np.empty_like(points)
+    for i, t in enumerate(times):
+        near = np.abs(times - t) <= window / 2
+        reference[i] = points[near].mean(axis=0)
+    return reference
+
+
+def evaluate(pointer_filter, times, points, latency=0.0, still_speed=50.0):
+    ''' run filter over a trace (pixels) and score it against the reference path.
+    the output at t is compared to the hand at t + latency (when the pointer actually moves).
+    lag_ms    - time shift that best aligns output with reference (0 = no lag)
+    jitter_px - rms frame to frame movement of the output while the hand is still
+    error_px  - rms distance to the reference while moving '''
+    pointer_filter.reset()
+    output = np.array([pointer_filter.filter(p, t, latency) for t, p in zip(times, points)])
+    reference = reference_path(times, points)
+    target = np.column_stack([np.interp(times + latency, times, reference[:, d]) for d in range(points.shape[1])])
+
+    dt = np.diff(times)
+    speed = np.linalg.norm(np.diff(reference, axis=0), axis=1) / np.maximum(dt, 1e-6)
+    still = speed < still_speed
+    moving = ~still
+
+    steps = np.linalg.norm(np.diff(output, axis=0), axis=1)
+    jitter = float(np.sqrt(np.mean(steps[still] ** 2))) if still.any() else 0.0
+    errors = np.linalg.norm(output - target, axis=1)[1:]
+    error = float(np.sqrt(np.mean(errors[moving] ** 2))) if moving.any() else 0.0
+
+    frame_time = float(np.median(dt)) if len(dt) else 0.0
+    best_shift, best_error = 0, None
+    for shift in range(-8, 16):                                 # output[i] vs target[i - shift], negative = leads
+        if abs(shift) >= len(output) - 1:
+            continue
+        if shift >= 0:
+            diff = np.linalg.norm(output[shift:] - target[:len(target) - shift], axis=1)
+        else:
+            diff = np.linalg.norm(output[:shift] - target[-shift:], axis=1)
+        rms = float(np.sqrt(np.mean(diff ** 2)))
+        if best_error is None or rms < best_error:
+            best_shift, best_error = shift, rms
+    return {"lag_ms": best_shift * frame_time * 1000, "jitter_px": jitter, "error_px": error}
@@ -0,0 +1,177 @@
+'''   one entry point for every mode - fast startup
+
+  python remotecontrol.py mouse    [camera | video] [--render=preview:10] [--control=port]
+  python remotecontrol.py gestures [camera | video] [--devices=all] [--drag] [--events=file] [--render=...] [--control=port]
+  python remotecontrol.py voice    [--devices=all] [--stream] [--recalibrate]
+  python remotecontrol.py all      [camera | video] [--devices=all] [--stream] [--recalibrate] [--render=...]
+
+only the modules of the chosen mode are imported (no mediapipe for voice, no
+speech_recognition for gestures). the camera, the hand model, the adb connection and the
+microphone start on their own threads at the same time, the microphone noise level is
+saved between runs (see speech_recognization) and the time from launch to the first
+action on the desktop / phone is printed.
+'''
+
+import time                # for startup timing
+
+STARTED = time.perf_counter()   # before any heavy import
+
+import argparse            # for command line
+import concurrent.futures  # for parallel startup steps
+import sys                 # for exit code
+
+
+class Startup:
+    ''' runs startup steps on their own threads and reports how long each one took '''
+
+    def __init__(self):
+        self.executor = concurrent.futures.ThreadPoolExecutor(thread_name_prefix="startup")
+        self.futures = {}               # name -> future
+        self.times = {}                 # name -> seconds
+
+    def _timed(self, name, func, args):
+        start = time.perf_counter()
+        try:
+            return func(*args)
+        finally:
+            self.times[name] = time.perf_counter() - start
+
+    def start(self, name, func, *args):
+        ''' run func(*args) on a startup thread '''
+        self.futures[name] = self.executor.submit(self._timed, name, func, args)
+
+    def run(self, name, func, *args):
+        ''' run func(*args) here (eg. imports the next steps need) - timed like the others '''
+        return self._timed(name, func, args)
+
+    def result(self, name):
+        return self.futures[name].result()
+
+    def wait(self):
+        ''' wait for every step and print the report - exits when a step failed '''
+        for name, future in self.futures.items():
+            try:
+                future.result()
+            except Exception as e:
+                print(f"Error in startup ({name}): {str(e)}")
+                sys.exit(1)
+        self.executor.shutdown(wait=False)
+        steps = ", ".join(f"{name} {seconds:.2f} s" for name, seconds in self.times.items())
+        print(f"Startup: {steps} - ready {time.perf_counter() - STARTED:.2f} s after launch")
+
+
+''' startup steps (each one imports what it needs) '''
+
+def connect_devices(devices):
+    ''' open the adb shell(s) and read every screen size - None (default phone) or a DevicePool '''
+    from device_pool import open_devices
+    from touch_mapper import TouchMapper
+
+    pool = open_devices(devices)
+    touch = TouchMapper(pool)
+    for serial in (pool.serials if pool else [None]):
+        touch.screen(serial)            # connects the shell, screen size is cached for the swipes
+    return pool
+
+
+def open_microphone():
+    import speech_recognition as sr
+    return sr.Microphone()
+
+
+def import_module(name):
+    return __import__(name)
+
+
+def prepare_vision(startup, module, options):
+    ''' import the vision module, then open the camera and load the model at the same time '''
+    vision = startup.run("import", import_module, module)
+    pipeline = vision.make_pipeline(options.source, options.render, options.control)
+    startup.start("camera", pipeline.open)
+    startup.start("model", pipeline.warm_up)
+    return vision, pipeline
+
+
+def start_voice(pool, microphone, options):
+    ''' voice controller listening on its own thread - None when it could not start '''
+    import speech_recognization
+
+    controller = speech_recognization.AndroidVoiceController(shell=pool)
+    controller.microphone = microphone
+    controller.recalibrate = options.recalibrate
+    return controller if controller.start(options.stream) else None
+
+
+''' modes '''
+
+def run_mouse(startup, options):
+    vision, pipeline = prepare_vision(startup, "mouse_control", options)
+    startup.wait()
+    vision.main(options.source, pipeline=pipeline)
+
+
+def run_gestures(startup, options):
+    startup.start("adb", connect_devices, options.devices)
+    vision, pipeline = prepare_vision(startup, "hand_gestures", options)
+    startup.wait()
+    vision.main(options.source, devices=startup.result("adb"), drag=options.drag or vision.drag,
+                pipeline=pipeline, events=options.events)
+
+
+def run_voice(startup, options):
+    startup.start("adb", connect_devices, options.devices)
+    startup.start("microphone", open_microphone)
+    voice = startup.run("import", import_module, "speech_recognization")
+    startup.wait()
+    voice.main(options.stream, devices=startup.result("adb"), recalibrate=options.recalibrate,
+               microphone=startup.result("microphone"))
+
+
+def run_all(startup, options):
+    ''' vision engine (mouse + swipes) on the main thread, voice on its own '''
+    startup.start("adb", connect_devices, options.devices)
+    startup.start("microphone", open_microphone)
+    startup.start("import voice", import_module, "speech_recognization")
+    vision, pipeline = prepare_vision(startup, "vision_engine", options)
+    startup.wait()
+    pool = startup.result("adb")
+    controller = start_voice(pool, startup.result("microphone"), options)
+    try:
+        vision.main(options.source, devices=pool, pipeline=pipeline)
+    finally:
+        if controller:
+            controller.stop()
+
+
+MODES = {"mouse": run_mouse, "gestures": run_gestures, "voice": run_voice, "all": run_all}
+
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(prog="remotecontrol", description="Control the desktop and Android phones with hand gestures and voice")
+    parser.add_argument("mode", choices=MODES)
+    parser.add_argument("source", nargs="?", default=0, help="camera index or video file (default 0)")
+    parser.add_argument("--devices", help='phones - "all", "serial,serial" or a DEVICE_GROUPS name (default phone when not given)')
+    parser.add_argument("--render", help='"full", "headless", "preview:10", "downscale:0.5" (see render_policy)')
+    parser.add_argument("--control", type=int, help="local control socket port (send 'quit' to stop)")
+    parser.add_argument("--drag", action="store_true", help="gestures: phone finger follows the hand")
+    parser.add_argument("--events", help="gestures: record the gesture event stream (JSON lines, see gesture_state)")
+    parser.add_argument("--stream", action="store_true", help="voice: streaming recognition (see voice_streaming)")
+    parser.add_argument("--recalibrate", action="store_true", help="voice: measure the noise level again")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    options = parse_args(sys.argv[1:] if argv is None else argv)
+    from metrics import metrics         # light - no cv2 / mediapipe
+    metrics.mark_start(STARTED)         # first action prints "Time to first action"
+
+    startup = Startup()
+    try:
+        MODES[options.mode](startup, options)
+    except IOError as e:
+        print(f"Error: {str(e)}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,179 @@
+'''   render policy - how much preview work every frame pays for
+
+  full            - overlay and window on every frame (old behaviour)
+  preview:<fps>   - overlay and window only <fps> times per second, every frame is still dispatched
+  downscale:<s>   - overlay drawn on a copy scaled by <s> (0-1), the window shows that copy
+  headless        - no overlay, no window
+modes can be combined, eg. "preview:10,downscale:0.5"
+
+without a window (headless, kiosks) the loop is stopped with Ctrl+C / SIGTERM or over a
+local control socket:   echo quit | nc 127.0.0.1 <port>     (also "stats", "ping")
+'''
+
+import json                # for stats over the control socket
+import os                  # for display check
+import signal              # for SIGINT / SIGTERM
+import socket              # for control socket
+import sys                 # for platform check
+import threading           # for control socket thread and stop flag
+
+import cv2                 # for resize and window
+
+''' config '''
+
+RENDER_MODE = "full"        # default when a window is given
+CONTROL_HOST = "127.0.0.1"  # control socket only listens locally
+PREVIEW_SLACK = 0.002       # seconds - frame times a bit under the preview interval still count
+
+
+class RenderPolicy:
+    ''' decides per frame whether to draw and show it, and on what image '''
+
+    def __init__(self, window=None, headless=False, preview_fps=None, scale=1.0):
+        self.window = None if headless else window
+        self.headless = headless
+        self.preview_fps = preview_fps      # None - every frame
+        self.scale = scale
+        self.last_shown = None
+
+        # counters
+        self.shown = 0
+        self.skipped = 0
+
+    @classmethod
+    def parse(cls, spec=None, window=None):
+        ''' "full", "headless", "preview:10", "downscale:0.5" or a comma separated mix.
+        no mode and no window - headless '''
+        if spec is None and window is None:
+            return cls(headless=True)
+        options = {}
+        for part in (spec or RENDER_MODE).split(","):
+            name, _, value = part.strip().partition(":")
+            if name == "headless":
+                options["headless"] = True
+            elif name == "preview":
+                options["preview_fps"] = float(value or 10)
+            elif name == "downscale":
+                options["scale"] = float(value or 0.5)
+            elif name != "full":
+                raise ValueError(f"Unknown render mode '{name}' (use full, headless, preview:<fps>, downscale:<scale>)")
+        return cls(window, **options)
+
+    def should_render(self, now):
+        ''' True when this frame gets an overlay (and is shown) '''
+        if self.headless:
+            self.skipped += 1
+            return False
+        if self.preview_fps and self.last_shown is not None and \
+                now - self.last_shown < 1.0 / self.preview_fps - PREVIEW_SLACK:
+            self.skipped += 1
+            return False
+        self.last_shown = now
+        self.shown += 1
+        return True
+
+    def canvas(self, image):
+        ''' image to draw the overlay on - the frame itself or a smaller copy '''
+        if self.scale >= 1.0:
+            return image
+        return cv2.resize(image, None, fx=self.scale, fy=self.scale, interpolation=cv2.INTER_NEAREST)
+
+    def show(self, canvas):
+        ''' show canvas in the window, returns pressed key (-1 none) '''
+        if self.window is None:
+            return -1
+        cv2.imshow(self.window, canvas)
+        return cv2.waitKey(1) & 0xFF
+
+    def close(self):
+        if self.window is not None:
+            cv2.destroyWindow(self.window)
+
+    def stats(self):
+        return {"render_shown": self.shown, "render_skipped": self.skipped}
+
+
+class ExitControl:
+    ''' stop flag for loops without a window - set by SIGINT / SIGTERM or by a
+    "quit" line on a local TCP control socket (port=None - no socket, 0 - any free port) '''
+
+    def __init__(self, port=None, status=None):
+        self.stop_event = threading.Event()
+        self.status = status                # function -> dict for the "stats" command
+        self.server = None
+        self.previous = {}                  # signal -> previous handler
+        if port is not None:
+            self.server = socket.create_server((CONTROL_HOST, port))
+            self.port = self.server.getsockname()[1]
+            threading.Thread(target=self._serve, name="control", daemon=True).start()
+            print(f"Control socket on {CONTROL_HOST}:{self.port} (send 'quit' to stop)")
+
+    @property
+    def stopped(self):
+        return self.stop_event.is_set()
+
+    def stop(self, *args):
+        self.stop_event.set()
+
+    def install_signals(self):
+        ''' Ctrl+C / SIGTERM stop the loop cleanly (main thread only) '''
+        if threading.current_thread() is not threading.main_thread():
+            return
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            self.previous[sig] = signal.signal(sig, self.stop)
+
+    def _serve(self):
+        while not self.stopped:
+            try:
+                connection, _ = self.server.accept()
+            except OSError:                                 # socket closed
+                return
+            with connection, connection.makefile("r") as lines:
+                for line in lines:
+                    command = line.strip().lower()
+                    if command in ("quit", "stop", "exit"):
+                        self.stop()
+                        reply = "ok"
+                    elif command == "stats":
+                        reply = json.dumps(self.status() if self.status else {}, default=str)
+                    elif command == "ping":
+                        reply = "pong"
+                    else:
+                        reply = f"unknown command '{command}'"
+                    try:
+                        connection.sendall((reply + "\n").encode())
+                    except OSError:                         # client already gone
+                        break
+                    if self.stopped:
+                        break
+
+    def close(self):
+        for sig, handler in self.previous.items():
+            signal.signal(sig, handler)
+        self.previous = {}
+        if self.server is not None:
+            self.server.close()
+            self.server = None
+
+
+def render_options(argv):
+    ''' --render=<mode> and --control=<port> from argv - (spec or None, port or None) '''
+    spec = port = None
+    for arg in argv:
+        if arg.startswith("--render="):
+            spec = arg.split("=", 1)[1]
+        elif arg.startswith("--control="):
+            port = int(arg.split("=", 1)[1])
+    return spec, port
+
+
+def preview_available():
+    ''' False for opencv-python-headless and machines without a display '''
+    if sys.platform.startswith("linux") and not (os.environ.get("DISPLAY") or os.environ.get("WAYLAND_DISPLAY")):
+        return False                                    # Qt would abort the process instead of raising
+    try:
+        cv2.namedWindow("render test")
+        cv2.destroyWindow("render test")
+        return True
+    except cv2.error:
+        return False
@@ -0,0 +1,130 @@
+'''   hand ROI tracking - run mediapipe on a crop around the last hand instead of the full frame  '''
+
+import cv2                 # for crop resize and color conversion
+import mediapipe as mp     # for hand detection and traking
+import numpy as np         # for warm up frame
+from metrics import metrics  # full vs roi inference time
+
+mp_hands = mp.solutions.hands               # mediapipe hand-traking model
+
+''' config '''
+
+ROI_PADDING = 0.6           # grow hand box by 60% of its size on each side (hand moves between frames)
+ROI_SIZE = 256              # crops bigger than this (pixels) are downscaled before inference
+ROI_EDGE_MARGIN = 0.02      # hand box closer than this to the crop edge (part of crop) -> hand leaving, search full frame
+ROI_HAND_SIZE = (0.15, 0.9) # hand box size as part of the crop side - outside this the detection is not trusted
+
+
+class HandTracker:
+    ''' wraps mp_hands.Hands. first frame (and after losing the hand) runs on the full frame,
+    then on a padded, downscaled crop around the previous landmarks. landmarks are mapped back
+    to full frame coordinates so callers can't tell the difference.
+    the crop moves every frame, so it is detected from scratch (static image mode, no tracking
+    state) and only trusted while the hand sits inside it with a sane size '''
+
+    def __init__(self, roi=True, padding=ROI_PADDING, roi_size=ROI_SIZE,
+                 edge_margin=ROI_EDGE_MARGIN, hand_size=ROI_HAND_SIZE, **hands_options):
+        self.roi = roi                              # False - always full frame (same as plain Hands)
+        self.padding = padding
+        self.roi_size = roi_size
+        self.edge_margin = edge_margin
+        self.hand_size = hand_size
+        self.full = mp_hands.Hands(**hands_options)                       # full frame search
+        self.cropped = mp_hands.Hands(**dict(hands_options, static_image_mode=True)) if roi else None   # detection on the crop
+        self.box = None                             # (x0, y0, x1, y1) pixels of next crop
+
+        # counters
+        self.full_frames = 0
+        self.roi_frames = 0
+        self.fallbacks = 0                          # roi lost the hand -> full frame search
+
+    def process(self, image):
+        ''' image - BGR frame, returns mediapipe results in full frame coordinates '''
+        height, width = image.shape[:2]
+        if self.box is not None:
+            results = self._process_roi(image, width, height)
+            if results is not None:
+                return results
+            self.fallbacks += 1
+            metrics.count("roi.fallbacks")
+
+        with metrics.timer("inference.full"):
+            results = self.full.process(cv2.cvtColor(image, cv2.COLOR_BGR2RGB))  # convert BGR to RGB
+        self.full_frames += 1
+        self._update_box(results, width, height)
+        return results
+
+    def _process_roi(self, image, width, height):
+        ''' run on the crop, None if the hand was lost / is leaving the crop '''
+        x0, y0, x1, y1 = self.box
+        crop = image[y0:y1, x0:x1]
+        side = max(x1 - x0, y1 - y0)
+        if side > self.roi_size:                    # downscale big crops (hand close to camera)
+            scale = self.roi_size / side
+            crop = cv2.resize(crop, (max(1, int((x1 - x0) * scale)), max(1, int((y1 - y0) * scale))),
+                              interpolation=cv2.INTER_AREA)
+
+        with metrics.timer("inference.roi"):
+            results = self.cropped.process(cv2.cvtColor(crop, cv2.COLOR_BGR2RGB))
+        self.roi_frames += 1
+
+        if not results.multi_hand_landmarks or not self._inside(results):
+            self.box = None
+            return None
+
+        '''crop coordinates -> full frame coordinates (normalized)'''
+        crop_width, crop_height = x1 - x0, y1 - y0
+        for hand_landmarks in results.multi_hand_landmarks:
+            for lm in hand_landmarks.landmark:
+                lm.x = (x0 + lm.x * crop_width) / width
+                lm.y = (y0 + lm.y * crop_height) / height
+                lm.z = lm.z * crop_width / width
+        self._update_box(results, width, height)
+        return results
+
+    def _inside(self, results):
+        ''' every hand box (crop coordinates) away from the crop edges and of a plausible size '''
+        low, high = self.edge_margin, 1.0 - self.edge_margin
+        for hand in results.multi_hand_landmarks:
+            xs = [lm.x for lm in hand.landmark]
+            ys = [lm.y for lm in hand.landmark]
+            if min(xs) < low or min(ys) < low or max(xs) > high or max(ys) > high:
+                return False
+            size = max(max(xs) - min(xs), max(ys) - min(ys))
+            if not self.hand_size[0] <= size <= self.hand_size[1]:
+                return False
+        return True
+
+    def _update_box(self, results, width, height):
+        ''' padded square box around all detected landmarks for next frame '''
+        if not self.roi or not results.multi_hand_landmarks:
+            self.box = None
+            return
+        xs = [lm.x * width for hand in results.multi_hand_landmarks for lm in hand.landmark]
+        ys = [lm.y * height for hand in results.multi_hand_landmarks for lm in hand.landmark]
+        center_x, center_y = (min(xs) + max(xs)) / 2, (min(ys) + max(ys)) / 2
+        half = max(max(xs) - min(xs), max(ys) - min(ys)) * (0.5 + self.padding)
+        x0, x1 = int(max(0, center_x - half)), int(min(width, center_x + half))
+        y0, y1 = int(max(0, center_y - half)), int(min(height, center_y + half))
+        self.box = (x0, y0, x1, y1) if x1 - x0 > 16 and y1 - y0 > 16 else None
+
+    def warm_up(self, width=640, height=480):
+        ''' run the models once on a blank frame - loading is not paid by the first real frame '''
+        blank = np.zeros((height, width, 3), dtype=np.uint8)
+        self.full.process(blank)
+        if self.cropped is not None:
+            self.cropped.process(blank[:self.roi_size, :self.roi_size])
+
+    def stats(self):
+        return {"full_frames": self.full_frames, "roi_frames": self.roi_frames, "fallbacks": self.fallbacks}
+
+    def close(self):
+        self.full.close()
+        if self.cropped is not None:
+            self.cropped.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -1,28 +1,51 @@
 import speech_recognition as sr             # for speech recognition
-import subprocess                           # for running ADB commands   
 import time                                 # for timing operations            
 import threading                            # for running commands background
 import sys                                  # for system operations
-import wave                                 # for handling audio files
 import os                                   # for file and directory operations
-from datetime import datetime               # for timestamping audio files
+import json                                 # for the saved noise level
+import adb_transport                        # persistent adb shell for commands
+from device_pool import DevicePool, FanoutResult, devices_option, open_devices  # several phones at once
+from touch_mapper import TouchMapper        # swipes sized for each phone screen
+from audio_log import AudioLogWriter        # background audio debug logging
+from voice_commands import CommandGrammar   # compiled command matching
+from metrics import metrics                 # recognizer / adb latency
 
 ''' main class '''
 class AndroidVoiceController:
 
-    def __init__(self):
+    def __init__(self, shell=None, recognizers=None):
         self.recognizer = sr.Recognizer()  # initialize speech recognizer 
-        self.microphone = sr.Microphone()  # initialize microphone associated with device
+        self.microphone = None             # microphone associated with device (opened in start)
         self.listening = False             # control for listining loop
+        self.shell = shell or adb_transport.get_shell()  # shared persistent adb shell, DevicePool (or a stub for replay)
+        self.touch = TouchMapper(self.shell)                # renders "swipe up" for the screen of every phone
 
-        '''origin of pixels(0,0) starts from top-left corner of screen'''
+        '''recognizers tried in order - (name, function(audio) -> text)'''
+        self.recognizers = recognizers or [
+            ("google", lambda audio: self.recognizer.recognize_google(audio, language="en-US")),  # google(online) speech recognizer - higher accuracy 
+            ("sphinx", self.recognizer.recognize_sphinx),                                           # CMU sphinx - local recognizer(offline)
+        ]
+
+        '''origin of pixels(0,0) starts from top-left corner of screen
+        {x} {y} - numbers from the sentence, {text} - rest of the sentence (see voice_commands)
+        "swipe <direction>" - finger direction, sized for the phone screen by touch_mapper'''
         self.commands = {
-            "scroll up": ["adb", "shell", "input", "swipe", "500", "1500", "500", "500"],       # y axis - from 1500p (bottom) to 500p (up) 
-            "scroll down": ["adb", "shell", "input", "swipe", "500", "500", "500", "1500"],     # y axis - from 500p (up) to 1500p (bottom) 
-            "swipe left": ["adb", "shell", "input", "swipe", "1000", "500", "200", "500"],      # x axis - from 200p (left) to 1000p (right) 
-            "swipe right": ["adb", "shell", "input", "swipe", "200", "500", "1000", "500"],     # x axis - from 1000p (right) to 1500p (left) 
+            "scroll up": "swipe up",                            # finger from bottom to top
+            "scroll down": "swipe down",                        # finger from top to bottom
+            "swipe left": "swipe left",                         # finger from right to left
+            "swipe right": "swipe right",                       # finger from left to right
+            "tap {x} {y}": "input tap {x} {y}",                 # tap at pixel x, y
+            "type {text}": "input text {text}",                 # type into focused field
+            "go home": "input keyevent KEYCODE_HOME",
+            "go back": "input keyevent KEYCODE_BACK",
+            "recent apps": "input keyevent KEYCODE_APP_SWITCH",
+            "volume up": "input keyevent KEYCODE_VOLUME_UP",
+            "volume down": "input keyevent KEYCODE_VOLUME_DOWN",
             "stop": None        # command for exit
         }
+        self.grammar = CommandGrammar(self.commands)        # compiled once - word index + slots
+        self.adb_timeout = 3                                # seconds per device command ("scroll down 20" gets 20 x)
 
         '''improved accuracy of recognization'''
         self.recognizer.dynamic_energy_threshold = False    # use fixed threshold
@@ -30,10 +53,15 @@ class AndroidVoiceController:
         self.recognizer.pause_threshold = 1.0               # Longer pause before considering speech ended
         self.recognizer.phrase_threshold = 0.3              # Minimum audio length to consider
 
+        '''noise calibration is saved and reused for a day (3 seconds of silence on every launch otherwise)'''
+        self.noise_file = "noise_level.json"                # saved energy threshold (in audio_log_dir)
+        self.noise_max_age = 24 * 3600                      # seconds before calibrating again
+        self.recalibrate = False                            # True - ignore the saved level (--recalibrate)
+
         '''audio debugging and logging'''
         self.debug_audio = True                             # enable audio debugging
         self.audio_log_dir = "audio_logs"                   # directory to save audio logs
-        os.makedirs(self.audio_log_dir, exist_ok=True)      # make directory if not exits
+        self.audio_log = AudioLogWriter(self.audio_log_dir, fmt="wav")  # queued writes, size / age rotation
 
     '''Save audio data for debugging recognition issues'''
     def save_audio_debug(self, audio_data, prefix=""):
@@ -41,93 +69,143 @@ class AndroidVoiceController:
         if not self.debug_audio:    # if not detected
             return
             
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")          # save timestamp for logging
-        filename = f"{self.audio_log_dir}/{prefix}{timestamp}.wav"    # file name with command and timestamp
-
-        '''save file'''
-        with wave.open(filename, 'wb') as wf:
-            wf.setnchannels(1)             # mono audio 
-            wf.setsampwidth(2)             # 2bytes per sample
-            wf.setframerate(16000)         # 16kHz waves   
-            wf.writeframes(audio_data.get_wav_data())
-
-    '''Execute ADB command'''
-    def run_adb(self, command):
-        # run the command with timeout
+        # queued only - the file is written on the logger thread (dropped if the queue is full)
+        self.audio_log.submit(audio_data, prefix)
+
+    '''Execute ADB command - count: device commands batched in the line (timeout grows with it)'''
+    def run_adb(self, command, count=1):
+        # run the command on the persistent shell with timeout
         try:
-            result = subprocess.run(command, 
-                                  capture_output=True, 
-                                  text=True, 
-                                  timeout=3)
-            if result.returncode == 0:                        # if executed
-                print(f" Executed: {' '.join(command)}")
+            result = self.touch.run(command, timeout=self.adb_timeout * max(count, 1))
+            if result.ok:                                     # if executed
+                print(f" Executed: {result.command} ({result.elapsed*1000:.0f} ms)")
+                if isinstance(result, FanoutResult):          # several phones - latency per device
+                    print("   " + ", ".join(f"{s}: {ms:.0f} ms" for s, ms in result.latencies().items()))
                 return True
-            print(f"Command failed: {result.stderr.strip()}") # else why not executed
+            print(f"Command failed: {result.output.strip()}") # else why not executed
         except Exception as e:
             print(f"Error executing command: {str(e)}")       # other execptions
         return False
 
-     '''voice command listener with multiple recognition strategies'''
+    '''Recognize one utterance, match it and run the command - returns matched command or None'''
+    def process_audio(self, audio, heard_at=None):
+
+        heard_at = heard_at or time.perf_counter()       # end of utterance - for command to action latency
+        metrics.count("voice.utterances")
+
+        # Save audio for debugging
+        with metrics.timer("voice.save_audio"):
+            self.save_audio_debug(audio, "command_")
+
+        return self.execute_text(self.recognize(audio), heard_at)
+
+    '''Try recognition methods in order (google first, then local sphinx) - returns text or None'''
+    def recognize(self, audio):
+        for name, recognize in self.recognizers:
+            text = self.run_recognizer(name, recognize, audio)
+            if text:
+                return text
+        return None
+
+    '''Run one recognizer - returns lower case text or None'''
+    def run_recognizer(self, name, recognize, audio):
+        try:
+            with metrics.timer(f"recognizer.{name}"):
+                return recognize(audio).lower() or None
+        except sr.UnknownValueError:                 # if fails or can't detect then 'UnknownValueError'
+            return None
+        except (sr.RequestError, OSError) as e:      # recognizer not available (no network / not installed) - try the next one
+            metrics.error(f"recognizer.{name}", e)
+            return None
+
+    '''Find best matching command (atleast 60% of its words) - returns readable command eg. "scroll down x3" or None'''
+    def match_command(self, text):
+        command = self.grammar.parse(text)
+        return command.name if command else None
+
+    '''Match recognized text and execute it through adb - returns matched command or None'''
+    def execute_text(self, command, heard_at=None):
+
+        # if not recognized 
+        if not command:
+            print(" No speech detected (try speaking louder/closer)")
+            metrics.count("voice.unrecognized")
+            return None
+
+        # if recognized then print                    
+        print(f"Heard: '{command}'")
+        
+        # Find best matching command 
+        matched = self.grammar.parse(command)
+
+        # if command matched (atleast 60%) then execute through adb - all actions in one shell line
+        if matched:
+            print(f"Matched command: '{matched.name}'")
+            if matched.commands:
+                self.run_adb(matched.shell_line, count=len(matched.commands))
+                if heard_at:
+                    metrics.observe("voice.command_to_action", time.perf_counter() - heard_at)
+            if matched.stop:
+                self.listening = False               # "stop" - exit listening loop
+            return matched.name
+
+        # else show avaivable commands
+        print("No matching command found")
+        print("Available commands:", ", ".join(self.grammar.phrases))
+        metrics.count("voice.unmatched")
+        return None
+
+    '''Adjust the recognizer energy threshold for background noise - saved level is reused when recent'''
+    def calibrate(self, source, duration=3):
+        level = None if self.recalibrate else self.load_noise_level()
+        if level is not None:
+            self.recognizer.energy_threshold = level
+            print(f"\n Using saved noise level {level:.0f} (--recalibrate to measure again)")
+            return
+        print("\n Calibrating microphone... (Please stay silent)")        
+        self.recognizer.adjust_for_ambient_noise(source, duration=duration)        # adjust the recognizer for backgroung noise
+        self.save_noise_level(self.recognizer.energy_threshold)
+
+    '''Saved energy threshold or None (missing, unreadable or older than noise_max_age)'''
+    def load_noise_level(self):
+        try:
+            with open(os.path.join(self.audio_log_dir, self.noise_file)) as f:
+                saved = json.load(f)
+            if time.time() - saved["saved_at"] > self.noise_max_age:
+                return None
+            return float(saved["energy_threshold"])
+        except (OSError, ValueError, KeyError, TypeError):
+            return None
+
+    '''Save energy threshold for the next launches'''
+    def save_noise_level(self, level):
+        try:
+            os.makedirs(self.audio_log_dir, exist_ok=True)
+            with open(os.path.join(self.audio_log_dir, self.noise_file), "w") as f:
+                json.dump({"energy_threshold": level, "saved_at": time.time()}, f)
+        except OSError as e:
+            print(f"Could not save noise level: {str(e)}")
+
+    '''voice command listener with multiple recognition strategies'''
     def listen_commands(self):
 
         # use associated microphone
         with self.microphone as source:
-            print("\n Calibrating microphone... (Please stay silent)")        
-            self.recognizer.adjust_for_ambient_noise(source, duration=3)        # adjust the recognizer for backgroung noise
+            self.calibrate(source)
 
             # instructions 
             print("Ready. Speak clearly 🔽")
-            print("'scroll up', 'scroll down', 'swipe left', 'swipe right', or 'stop'\n")
+            print(", ".join(f"'{p}'" for p in self.grammar.phrases), "\n")
 
             # loop for listening if true(till stop command) 
             while self.listening:
                 try:
                     print("Listening..", end='\r')
-                    audio = self.recognizer.listen(source, timeout=5, phrase_time_limit=3)   # timeout : raise waitTimeoutError if speech not start in 5 seconds
-                                                                                             # phrase_time_limit : words pr listening of first 3 seconds will be counted
+                    with metrics.timer("voice.listen"):
+                        audio = self.recognizer.listen(source, timeout=5, phrase_time_limit=3)   # timeout : raise waitTimeoutError if speech not start in 5 seconds
+                                                                                                 # phrase_time_limit : words pr listening of first 3 seconds will be counted
                     print("                                ", end='\r')  # Clear line
-                    
-                    # Save audio for debugging
-                    self.save_audio_debug(audio, "command_")
-                    
-                    # Try multiple recognition methods
-                    command = None
-                    try:
-                        command = self.recognizer.recognize_google(audio, language="en-US").lower()  # google(online) speech recognizer - higher accuracy 
-                    except sr.UnknownValueError:                                                     # if fails or can't detect then 'UnknownValueError'
-                        # Fallback to local recognizer if available
-                        try:
-                            command = self.recognizer.recognize_sphinx(audio).lower()                # CMU sphinx - local recognizer(offline)
-                        except:
-                            pass
-
-                    # if not recognized 
-                    if not command:
-                        print(" No speech detected (try speaking louder/closer)")
-                        continue
-
-                    # if recognized then print                    
-                    print(f"Heard: '{command}'")
-                    
-                    # Find best matching command 
-                    best_match = None
-                    best_score = 0
-                    for cmd in self.commands:
-                        score = self.command_similarity(cmd, command) # execute connamd_similarity function
-                        if score > best_score and score > 0.6:  # Minimum 60% match
-                            best_score = score
-                            best_match = cmd
-
-                    # if command matched (atleast 60%) then execute through adb
-                    if best_match:
-                        print(f"Matched command: '{best_match}'")
-                        if self.commands[best_match]:
-                            self.run_adb(self.commands[best_match])
-
-                    # else show avaivable commands
-                    else:
-                        print("No matching command found")
-                        print("Available commands:", ", ".join(self.commands.keys()))
+                    self.process_audio(audio)
 
                 # after silent 5 sec , speech not detected for 5 seconds
                 except sr.WaitTimeoutError:
@@ -135,26 +213,16 @@ class AndroidVoiceController:
 
                 # other execption
                 except Exception as e:
-                    print(f" Error: {str(e)}")
+                    metrics.error("voice", e)
                     time.sleep(1)
 
-     '''Calculate similarity between command and heard text using word matching'''
-    def command_similarity(self, command, heard_text):
-       
-        command_words = set(command.split())                        # command words (defined in self.commands) eg.{'scroll','up'}
-        heard_words = set(heard_text.split())                       # heard words eg.{'i','want','to','scroll','up'}
-        intersection = command_words.intersection(heard_words)      # words that instesect {'scroll','up'}
-        return len(intersection) / len(command_words)               # here len(intersection)=2 / len(command_words)=2 = 1 > 0.6 pass 
-
-    def start(self):
-        """Start the voice command listener with comprehensive checks"""
+    def start(self, streaming=False):
+        """Start the voice command listener with comprehensive checks
+        streaming=True - continuous frames, early end of utterance, parallel recognizers (voice_streaming)"""
       
         try:
-            result = subprocess.run(["adb", "devices"], 
-                                   capture_output=True, 
-                                   text=True, 
-                                   timeout=3)
-            if "device" not in result.stdout:
+            devices = self.shell.serials if isinstance(self.shell, DevicePool) else adb_transport.ready_devices()
+            if not devices:
                 print("\n❌ No Android device found. Please:")
                 print("1. Enable USB Debugging in Developer Options")
                 print("2. Connect your device via USB")
@@ -162,15 +230,21 @@ class AndroidVoiceController:
                 print("4. Try 'adb devices' in terminal to verify")
                 return False
             
-            print("✅ ADB device connected")
+            print(f"✅ ADB device connected: {', '.join(devices)}")
             print("\n💡 Tips for better voice recognition:")
             print("- Speak clearly at normal volume")
             print("- Use full commands like 'scroll up'")
             print("- Reduce background noise")
             print("- Position microphone 6-12 inches from your mouth\n")
             
+            if self.microphone is None:
+                self.microphone = sr.Microphone()  # initialize microphone associated with device
             self.listening = True
-            self.thread = threading.Thread(target=self.listen_commands)
+            target = self.listen_commands
+            if streaming:
+                from voice_streaming import StreamingVoice
+                target = StreamingVoice(self).listen_microphone
+            self.thread = threading.Thread(target=target)
             self.thread.daemon = True
             self.thread.start()
             return True
@@ -186,11 +260,16 @@ class AndroidVoiceController:
         self.listening = False
         if hasattr(self, 'thread'):
             self.thread.join(timeout=1)
+        self.shell.close()
+        self.audio_log.close()                # write what is still queued
         print("\n🛑 Voice control stopped")
 
-def main():
-    controller = AndroidVoiceController()
-    if not controller.start():
+def main(streaming=False, devices=None, recalibrate=False, microphone=None):
+    metrics.configure()                     # RC_METRICS=jsonl / prom:file to export timings
+    controller = AndroidVoiceController(shell=open_devices(devices))   # None - default phone
+    controller.recalibrate = recalibrate
+    controller.microphone = microphone      # opened ahead (see remotecontrol), None - opened in start
+    if not controller.start(streaming):
         sys.exit(1)
     
     try:
@@ -200,9 +279,10 @@ def main():
         pass
     finally:
         controller.stop()
+        metrics.close()
 
 if __name__ == "__main__":
     # Clear console for better visibility
     os.system('cls' if os.name == 'nt' else 'clear')
     print("=== Android Voice Control ===")
-    main()
+    main(streaming="--stream" in sys.argv, devices=devices_option(sys.argv), recalibrate="--recalibrate" in sys.argv)
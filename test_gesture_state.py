@@ -0,0 +1,48 @@
+'''   swipe state machine - python -m pytest test_gesture_state.py  '''
+
+from gesture_state import NOMINAL_FPS, SwipeDetector
+
+
+def stroke(detector, vx=0.0, vy=0.0, fps=30):
+    ''' hold still, move at (vx, vy) frame widths / heights per second, hold still - fired gestures '''
+    x, y, t, fired = 0.5, 0.5, 0.0, []
+    for i in range(30):
+        moving = 10 <= i < 18
+        x, y = x + (vx / fps if moving else 0.0), y + (vy / fps if moving else 0.0)
+        result = detector.update(t, x, y)
+        if result:
+            fired.append(result[0])
+        t += 1 / fps
+    return fired
+
+
+def test_pixel_thresholds_use_width_for_swipes():
+    detector = SwipeDetector(0.0, 0.0)
+    detector.pixel_thresholds(85, 95, 1280, 720)
+    assert detector.thresholds == (95 * NOMINAL_FPS / 1280, 85 * NOMINAL_FPS / 720)
+    assert detector.aspect == 1280 / 720
+
+
+def detector_720p():
+    detector = SwipeDetector(0.0, 0.0)
+    detector.pixel_thresholds(85, 95, 1280, 720)       # swipe ~2.2 frame widths / s, scroll ~3.5 frame heights / s
+    return detector
+
+
+def test_swipe_over_threshold_fires_once():
+    assert stroke(detector_720p(), vx=-2.5) == ["right"]
+    assert stroke(detector_720p(), vy=4.0) == ["down"]
+
+
+def test_slow_motion_does_not_fire():
+    assert stroke(detector_720p(), vx=-1.5) == []
+    assert stroke(detector_720p(), vy=2.0) == []
+
+
+def test_decide_with_measured_velocity():
+    detector = detector_720p()
+    assert detector.decide(0.0, (0.0, 5.0))[0] == "down"
+    assert detector.decide(0.05, (0.0, 5.0)) is None    # same motion still going
+    assert detector.decide(0.1, (0.0, 0.5)) is None     # released
+    assert detector.decide(0.2, (0.0, -5.0)) is None    # stroke back
+    assert detector.log.counts() == {"fire": 1, "release": 1, "suppressed.return": 1}
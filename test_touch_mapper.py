@@ -0,0 +1,41 @@
+'''   shell line splitting and swipe rendering - python -m pytest test_touch_mapper.py  '''
+
+from types import SimpleNamespace
+
+from adb_transport import split_commands
+from touch_mapper import TouchMapper
+
+
+class RecordingShell:
+    ''' answers "wm size; wm density" like a 1080x2340 phone '''
+    serial = "test-phone"
+
+    def run(self, line, timeout=None):
+        return SimpleNamespace(ok=True, output="Physical size: 1080x2340\nPhysical density: 440\n")
+
+
+touch = TouchMapper(RecordingShell())
+
+
+def test_split_plain():
+    assert split_commands("a; b;c ;") == ["a", "b", "c"]
+
+
+def test_split_keeps_quoted_semicolons():
+    assert split_commands("input text 'a;b'; input keyevent 66") == ["input text 'a;b'", "input keyevent 66"]
+    assert split_commands('echo "x; y"') == ['echo "x; y"']
+    assert split_commands("input text 'it'\"'\"';s'") == ["input text 'it'\"'\"';s'"]
+    assert split_commands(r"echo a\;b; true") == [r"echo a\;b", "true"]
+
+
+def test_render_leaves_quoted_text_alone():
+    assert touch.render("input text 'a;b'", "test-phone") == "input text 'a;b'"
+    assert touch.render("input text 'swipe down;x'", "test-phone") == "input text 'swipe down;x'"
+
+
+def test_render_rewrites_whole_commands():
+    line = touch.render("swipe down; input text 'a;b'; swipe up", "test-phone")
+    parts = split_commands(line)
+    assert len(parts) == 3
+    assert parts[0].startswith("input swipe ") and parts[2].startswith("input swipe ")
+    assert parts[1] == "input text 'a;b'"
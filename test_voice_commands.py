@@ -0,0 +1,73 @@
+'''   voice_commands grammar - python -m pytest test_voice_commands.py  '''
+
+from voice_commands import MAX_REPEAT, CommandGrammar
+
+COMMANDS = {
+    "scroll up": "swipe up",
+    "scroll down": "swipe down",
+    "tap {x} {y}": "input tap {x} {y}",
+    "type {text}": "input text {text}",
+    "go home": "input keyevent KEYCODE_HOME",
+    "go back": "input keyevent KEYCODE_BACK",
+    "stop": None,
+}
+
+grammar = CommandGrammar(COMMANDS)
+
+
+def test_plain_phrase():
+    command = grammar.parse("go home")
+    assert command.name == "go home"
+    assert command.commands == ["input keyevent KEYCODE_HOME"]
+    assert not command.stop
+
+
+def test_extra_words_still_match():
+    assert grammar.parse("please scroll down now").commands == ["swipe down"]
+
+
+def test_counts():
+    assert grammar.parse("scroll down 3").commands == ["swipe down"] * 3
+    assert grammar.parse("go back twice").name == "go back x2"
+    assert grammar.parse("scroll up five times").commands == ["swipe up"] * 5
+    assert len(grammar.parse("scroll down 500").commands) == MAX_REPEAT
+
+
+def test_number_slots():
+    assert grammar.parse("tap 300 800").commands == ["input tap 300 800"]
+    assert grammar.parse("tap") is None             # coordinates missing
+
+
+def test_compound_sentence():
+    command = grammar.parse("scroll down twice and then go home")
+    assert command.parts == ["scroll down x2", "go home"]
+    assert command.shell_line == "swipe down; swipe down; input keyevent KEYCODE_HOME"
+
+
+def test_type_takes_rest_of_sentence():
+    command = grammar.parse("type salt and pepper")
+    assert command.commands == ["input text salt%sand%spepper"]
+
+
+def test_type_not_first_word():
+    assert grammar.parse("please type hello").commands == ["input text hello"]
+    assert grammar.parse("i said type hello world").commands == ["input text hello%sworld"]
+    assert grammar.parse("scroll down and type hi").commands == ["swipe down", "input text hi"]
+
+
+def test_type_without_text():
+    assert grammar.parse("type") is None
+    assert grammar.parse("please type") is None
+
+
+def test_typed_text_is_quoted():
+    assert grammar.parse("type it's").commands == ["input text 'it'\"'\"'s'"]
+
+
+def test_stop():
+    command = grammar.parse("stop")
+    assert command.stop and command.commands == []
+
+
+def test_unknown_sentence():
+    assert grammar.parse("make me a sandwich") is None
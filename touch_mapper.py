@@ -0,0 +1,202 @@
+'''   resolution aware touch commands - swipes sized for the real screen and the finger speed
+
+gesture and voice code send small screen independent commands, rendered here per device:
+  swipe <up|down|left|right> [speed]   -> input swipe x1 y1 x2 y2 ms
+  touch <down|move|up> <x> <y>         -> input motionevent DOWN|MOVE|UP px py   (x, y 0-1)
+direction is the way the finger moves on the phone, speed is the hand speed in frame
+heights per second (faster hand = longer, quicker swipe). screen size and density are
+read once per device with "wm size" / "wm density" and cached.
+
+"touch" events stream a continuous drag over the persistent shell (Android 10+).
+'''
+
+import re                  # for parsing wm output
+import threading           # for cache lock
+
+import adb_transport       # default shell
+from device_pool import DevicePool  # per device rendering
+from metrics import metrics  # adb errors
+
+''' config '''
+
+DEFAULT_SCREEN = (1080, 2340, 440)  # width, height, density used when the query fails
+SWIPE_DISTANCE = (0.3, 0.7)         # fraction of the screen - slow hand, fast hand
+SWIPE_DURATION = (300, 80)          # milliseconds - slow hand, fast hand (short = fling)
+SLOW_SPEED = 3.0                    # hand speed (frame heights / s) that gives the slow swipe
+FAST_SPEED = 10.0                   # hand speed that gives the fast swipe
+EDGE_MARGIN_DP = 48                 # keep away from the system back / home gesture edges
+
+DIRECTIONS = {"up": (0, -1), "down": (0, 1), "left": (-1, 0), "right": (1, 0)}
+MOTION_EVENTS = {"down": "DOWN", "move": "MOVE", "up": "UP"}
+
+
+class ScreenInfo:
+    ''' screen size in pixels and density (dpi) of one device '''
+
+    def __init__(self, width, height, density):
+        self.width = width
+        self.height = height
+        self.density = density
+
+    def dp(self, value):
+        ''' density independent pixels -> pixels '''
+        return value * self.density / 160.0
+
+    def __repr__(self):
+        return f"ScreenInfo({self.width}x{self.height}, {self.density}dpi)"
+
+
+def parse_wm(output, name):
+    ''' value of "Physical <name>: ..." - "Override <name>" wins when set '''
+    values = dict(re.findall(rf"(Physical|Override) {name}: (\S+)", output))
+    return values.get("Override") or values.get("Physical")
+
+
+def query_screen(shell):
+    ''' ask the device for its screen - ScreenInfo (DEFAULT_SCREEN when it can not be read) '''
+    try:
+        output = shell.run("wm size; wm density").output
+        size = parse_wm(output, "size")
+        density = parse_wm(output, "density")
+        width, height = (int(v) for v in size.split("x"))
+        return ScreenInfo(width, height, int(density))
+    except Exception as e:
+        print(f"Could not read screen size ({e}), using {DEFAULT_SCREEN[0]}x{DEFAULT_SCREEN[1]}")
+        return ScreenInfo(*DEFAULT_SCREEN)
+
+
+''' screens are cached for the whole program - serial -> ScreenInfo '''
+
+_screens = {}
+_screens_lock = threading.Lock()
+
+
+class PerDevice:
+    ''' command rendered for each device of a DevicePool (called in the device worker) '''
+
+    def __init__(self, render, line):
+        self.render = render
+        self.line = line
+
+    def __call__(self, serial):
+        return self.render(self.line, serial)
+
+    def __str__(self):
+        return self.line
+
+
+class TouchMapper:
+    ''' wraps a shell (AdbShell, DevicePool or a recording stub) and renders swipe / touch
+    commands for the screen of every device before sending them '''
+
+    def __init__(self, target=None):
+        self.target = target or adb_transport.get_shell()
+
+    def shell_for(self, serial):
+        if isinstance(self.target, DevicePool):
+            return self.target.workers[serial].shell
+        return self.target
+
+    def screen(self, serial=None):
+        ''' cached ScreenInfo of a device '''
+        with _screens_lock:
+            if serial in _screens:
+                return _screens[serial]
+        screen = query_screen(self.shell_for(serial))
+        with _screens_lock:
+            return _screens.setdefault(serial, screen)
+
+    def swipe_command(self, direction, speed=None, serial=None):
+        ''' input swipe through the screen center, length and duration from hand speed '''
+        screen = self.screen(serial)
+        dx, dy = DIRECTIONS[direction]
+        if speed is None:
+            fast = 0.5
+        else:
+            fast = min(max((speed - SLOW_SPEED) / (FAST_SPEED - SLOW_SPEED), 0.0), 1.0)
+        distance = SWIPE_DISTANCE[0] + (SWIPE_DISTANCE[1] - SWIPE_DISTANCE[0]) * fast
+        duration = SWIPE_DURATION[0] + (SWIPE_DURATION[1] - SWIPE_DURATION[0]) * fast
+
+        margin = screen.dp(EDGE_MARGIN_DP)
+        points = []
+        for side in (-0.5, 0.5):
+            x = screen.width / 2 + dx * side * distance * screen.width
+            y = screen.height / 2 + dy * side * distance * screen.height
+            points += [int(min(max(x, margin), screen.width - margin)),
+                       int(min(max(y, margin), screen.height - margin))]
+        return "input swipe {} {} {} {} {}".format(*points, int(duration))
+
+    def touch_command(self, action, x, y, serial=None):
+        ''' one motion event at normalized x, y '''
+        screen = self.screen(serial)
+        return f"input motionevent {MOTION_EVENTS[action]} {int(x * screen.width)} {int(y * screen.height)}"
+
+    def render(self, line, serial=None):
+        ''' replace swipe / touch commands of a shell line with real input commands '''
+        parts = []
+        for part in adb_transport.split_commands(line):    # ; inside quotes (typed text) is not a separator
+            words = part.split()
+            if words[:1] == ["swipe"] and len(words) in (2, 3) and words[1] in DIRECTIONS:
+                part = self.swipe_command(words[1], float(words[2]) if len(words) == 3 else None, serial)
+            elif words[:1] == ["touch"] and len(words) == 4 and words[1] in MOTION_EVENTS:
+                part = self.touch_command(words[1], float(words[2]), float(words[3]), serial)
+            parts.append(part.strip())
+        return "; ".join(p for p in parts if p)
+
+    def prepare(self, line):
+        ''' line for the target - string, or PerDevice when every device needs its own '''
+        line = adb_transport.strip_adb_prefix(line)
+        if isinstance(self.target, DevicePool):
+            return PerDevice(self.render, line)
+        return self.render(line, getattr(self.target, "serial", None))
+
+    def run(self, line, timeout=None):
+        ''' like AdbShell.run - for AndroidVoiceController '''
+        result = self.target.run(self.prepare(line), timeout=timeout)
+        if result.ok:
+            metrics.action_done("phone")
+        return result
+
+    def __call__(self, line):
+        ''' send(command) for gesture handlers '''
+        if isinstance(self.target, DevicePool):
+            return self.target(self.prepare(line))      # queued per device, does not wait for the phones
+        try:
+            result = self.run(line)
+        except adb_transport.AdbError as e:
+            metrics.error("adb", e)
+            return None
+        if not result.ok:
+            print(f"Command failed: {result.output.strip()}")
+        return result
+
+    def close(self):
+        self.target.close()
+
+
+class DragStream:
+    ''' streams a continuous drag - the phone finger follows the hand while it is visible.
+    moves are coalesced in the dispatcher, so a slow device only gets the latest position '''
+
+    def __init__(self, send, actions):
+        self.send = send
+        self.actions = actions
+        self.position = None            # last normalized position while dragging
+
+    @property
+    def dragging(self):
+        return self.position is not None
+
+    def update(self, x, y, origin=None):
+        x, y = min(max(x, 0.0), 1.0), min(max(y, 0.0), 1.0)
+        if self.position is None:
+            self.actions.submit(self.send, f"touch down {x:.4f} {y:.4f}", origin=origin)
+        else:
+            self.actions.submit(self.send, f"touch move {x:.4f} {y:.4f}", key="drag", origin=origin)
+        self.position = (x, y)
+
+    def release(self, origin=None):
+        if self.position is not None:
+            x, y = self.position
+            self.actions.submit(self.send, f"touch up {x:.4f} {y:.4f}", origin=origin)
+            self.position = None
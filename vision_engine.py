@@ -0,0 +1,270 @@
+'''   unified vision engine - one camera, one mediapipe, many gesture consumers
+
+capture and inference run once, the 21 landmarks become one NumPy array per frame,
+and every consumer (pointer move, pinch click, swipe/scroll) reads the same
+ring buffer history. thresholds are checked over a time window, not frame vs previous frame.
+
+  python vision_engine.py [camera index | video file] [--no-mouse] [--no-swipes] [--devices=all]
+                          [--render=headless|preview:10|downscale:0.5] [--control=port]
+'''
+
+import numpy as np         # for landmark arrays
+import sys                 # for command line
+import time                # for latency
+
+import adb_transport                            # persistent adb shell
+from device_pool import devices_option, open_devices  # swipes to several phones
+from gesture_state import SCROLL_PIXELS, SWIPE_PIXELS, SWIPES, WINDOW, SwipeDetector  # one swipe per hand motion
+from touch_mapper import TouchMapper            # swipes sized for each phone screen
+from action_dispatcher import ActionDispatcher  # actions off the frame loop
+from metrics import metrics                     # per-stage timing
+from render_policy import render_options        # --render= / --control= flags
+from vision_pipeline import VisionPipeline, draw_hand  # threaded capture -> inference -> render
+
+
+''' config '''
+
+HISTORY_SIZE = 32           # frames kept in the ring buffer (~1 s at 30 fps)
+SWIPE_WINDOW = WINDOW       # seconds of history used for swipe velocity
+PINCH_FRAMES = 2            # pinch must hold this many frames in a row before it clicks
+
+INDEX_TIP = 8               # landmark ids
+THUMB_TIP = 4
+
+
+def landmarks_to_array(hand_landmarks):
+    ''' mediapipe landmark list -> (21, 3) float32 array (x, y, z normalized) '''
+    return np.array([(lm.x, lm.y, lm.z) for lm in hand_landmarks.landmark], dtype=np.float32)
+
+
+class LandmarkHistory:
+    ''' ring buffer of the last N frames - landmarks (N, 21, 3), capture times and hand present mask '''
+
+    def __init__(self, size=HISTORY_SIZE):
+        self.size = size
+        self.points = np.zeros((size, 21, 3), dtype=np.float32)
+        self.times = np.zeros(size, dtype=np.float64)
+        self.present = np.zeros(size, dtype=bool)
+        self.count = 0                  # frames pushed so far
+        self.width = 1                  # frame size in pixels (for pixel thresholds)
+        self.height = 1
+
+    def push(self, points, t):
+        ''' add a frame - points (21, 3) or None when no hand '''
+        i = self.count % self.size
+        if points is None:
+            self.present[i] = False
+        else:
+            self.points[i] = points
+            self.present[i] = True
+        self.times[i] = t
+        self.count += 1
+
+    def _order(self, n):
+        ''' ring indices of the last n frames, oldest first '''
+        n = min(n, self.count, self.size)
+        return (np.arange(self.count - n, self.count)) % self.size
+
+    def last(self, n):
+        ''' (times, points, present) of last n frames, oldest first '''
+        order = self._order(n)
+        return self.times[order], self.points[order], self.present[order]
+
+    def window(self, seconds, since=None):
+        ''' frames with a hand from the last `seconds` (and after `since`), oldest first '''
+        times, points, present = self.last(self.size)
+        if not len(times):
+            return times, points
+        keep = present & (times >= times[-1] - seconds)
+        if since is not None:
+            keep &= times > since
+        return times[keep], points[keep]
+
+    @property
+    def hand_present(self):
+        return self.count > 0 and bool(self.present[(self.count - 1) % self.size])
+
+
+''' gesture consumers - update(history, origin) is called once per frame '''
+
+class PointerMove:
+    ''' index tip -> screen position through a pointer filter (see pointer_filters) '''
+
+    def __init__(self, backend, actions, pointer_filter):
+        self.backend = backend
+        self.actions = actions
+        self.filter = pointer_filter
+        self.screen_width, self.screen_height = backend.size()
+        self.screen = np.array([self.screen_width, self.screen_height], dtype=np.float64)
+        self.position = None
+
+    def update(self, history, origin=None):
+        if not history.hand_present:
+            return
+        times, points, present = history.last(1)
+        latency = time.perf_counter() - origin if origin else 0.0
+        x, y = self.filter.filter(points[-1, INDEX_TIP, :2] * self.screen, times[-1], latency)
+        self.position = (int(x), int(y))
+        self.actions.move(self.backend.moveTo, *self.position, duration=0.01, origin=origin)
+
+
+class PinchClick:
+    ''' click when index and thumb tips stay closer than click_distance for PINCH_FRAMES frames '''
+
+    def __init__(self, backend, actions, click_distance=0.04, cooldown=0.3, pause=0.1, frames=PINCH_FRAMES):
+        self.backend = backend
+        self.actions = actions
+        self.click_distance = click_distance
+        self.cooldown = cooldown
+        self.pause = pause
+        self.frames = frames
+        self.last_click = -np.inf
+        self.pinched = False            # already clicked for this pinch
+
+    def update(self, history, origin=None):
+        times, points, present = history.last(self.frames)
+        if len(times) < self.frames or not present.all():
+            self.pinched = False
+            return
+        distance = np.linalg.norm(points[:, INDEX_TIP, :2] - points[:, THUMB_TIP, :2], axis=1)
+        closed = bool((distance < self.click_distance).all())
+        if closed and not self.pinched and times[-1] - self.last_click > self.cooldown:
+            self.actions.submit(self.backend.click, pause=self.pause, origin=origin)
+            self.last_click = times[-1]
+            print("Click")
+        self.pinched = closed
+
+
+class DirectionalSwipe:
+    ''' index tip velocity over the last SWIPE_WINDOW seconds (least squares slope of the
+    ring buffer window) -> up/down/left/right swipe. thresholds are the old per frame pixel
+    values (scroll / swipes) at 30 fps, the gesture_state.SwipeDetector state machine fires
+    once per motion (release, cooldown, return stroke ignored) '''
+
+    def __init__(self, send, actions, commands=SWIPES, scroll=SCROLL_PIXELS, swipes=SWIPE_PIXELS, window=SWIPE_WINDOW, log=None):
+        self.send = send
+        self.actions = actions
+        self.commands = commands        # gesture -> adb command
+        self.scroll = scroll
+        self.swipes = swipes
+        self.window = window
+        self.detector = SwipeDetector(0.0, 0.0, window=window, log=log)    # thresholds set per frame size
+        self.lost_at = None             # hand left the frame - older frames belong to the last motion
+
+    def velocity(self, history):
+        ''' (frame widths / s, frame heights / s) of the index tip over the window, None with too few frames '''
+        times, points = history.window(self.window, since=self.lost_at)
+        if len(times) < 2 or times[-1] - times[0] < 1e-3:
+            return None
+        dt = times - times.mean()
+        tips = points[:, INDEX_TIP, :2] - points[:, INDEX_TIP, :2].mean(axis=0)
+        vx, vy = dt @ tips / (dt @ dt)
+        return float(vx), float(vy)
+
+    def update(self, history, origin=None):
+        times, _, present = history.last(1)
+        if not len(times):
+            return None
+        t = times[-1]
+        if not present[-1]:
+            self.lost_at = t
+            self.detector.lost(t)
+            return None
+
+        self.detector.pixel_thresholds(self.scroll, self.swipes, history.width, history.height)
+        velocity = self.velocity(history)
+        if velocity is None:
+            return None
+        fired = self.detector.decide(t, velocity)
+        if fired is None:
+            return None
+
+        gesture, speed = fired
+        print(gesture)
+        command = self.commands[gesture]
+        if command.startswith("swipe "):                                # touch_mapper swipe - add hand speed
+            command = f"{command} {speed:.2f}"                          # frame heights per second
+        self.actions.submit(self.send, command, origin=origin)
+        return gesture
+
+
+class VisionEngine:
+    ''' runs the pipeline once and feeds every consumer from the same landmark history '''
+
+    def __init__(self, pipeline, consumers, draw=True):
+        self.pipeline = pipeline
+        self.consumers = consumers
+        self.draw = draw
+        self.history = LandmarkHistory()
+
+    def handle_frame(self, frame):
+        image = frame.image
+        self.history.height, self.history.width = image.shape[:2]
+        hands = frame.results.multi_hand_landmarks
+        self.history.push(landmarks_to_array(hands[0]) if hands else None, frame.captured_at)
+
+        for consumer in self.consumers:
+            with metrics.timer(f"consumer.{type(consumer).__name__}"):
+                consumer.update(self.history, origin=frame.captured_at)
+
+        if self.draw and hands and frame.canvas is not None:     # only frames that are shown
+            with metrics.timer("draw"):
+                draw_hand(frame.canvas, hands[0])
+
+    def run(self):
+        return self.pipeline.run(self.handle_frame)
+
+
+def make_pipeline(source=0, render=None, control_port=None):
+    return VisionPipeline(source, width=1280, height=720, window='Remote Control',
+                          roi=False, idle_gate=True, render=render, control_port=control_port,
+                          min_detection_confidence=0.7, min_tracking_confidence=0.7)
+
+
+def main(source=0, mouse=True, swipes=True, devices=None, render=None, control_port=None, pipeline=None):
+    ''' pipeline - camera / model already prepared (see remotecontrol), otherwise made here '''
+    consumers = []
+    dispatchers = []
+    swipe = None
+    pool = open_devices(devices) if swipes else None
+    if mouse:
+        import pyautogui
+        from mouse_control import CLICK_DISTANCE, CLICK_COOLDOWN, CLICK_PAUSE, default_filter
+        pyautogui.FAILSAFE = False
+        pyautogui.PAUSE = 0.01
+        mouse_actions = ActionDispatcher(name="mouse").start()
+        dispatchers.append(mouse_actions)
+        consumers += [PointerMove(pyautogui, mouse_actions, default_filter()),
+                      PinchClick(pyautogui, mouse_actions, CLICK_DISTANCE, CLICK_COOLDOWN, CLICK_PAUSE)]
+    if swipes:
+        swipe_actions = ActionDispatcher(name="swipes").start()
+        dispatchers.append(swipe_actions)
+        swipe = DirectionalSwipe(TouchMapper(pool), swipe_actions)
+        consumers.append(swipe)
+
+    pipeline = pipeline or make_pipeline(source, render, control_port)
+    metrics.configure()                     # RC_METRICS=jsonl / prom:file to export timings
+    try:
+        stats = VisionEngine(pipeline, consumers).run()
+        print(f"Pipeline stats: {stats}")
+    except IOError as e:
+        print(f"Error: {str(e)}")
+        sys.exit(1)
+    finally:
+        for actions in dispatchers:
+            actions.stop()
+            print(f"Dispatcher stats ({actions.name}): {actions.stats()}")
+        if swipe:
+            print(f"Gesture events: {swipe.detector.log.counts()}")
+        if pool:
+            print(f"Device stats: {pool.stats()}")
+            pool.close()
+        adb_transport.close_all()
+        metrics.close()
+
+
+if __name__ == "__main__":
+    args = [a for a in sys.argv[1:] if not a.startswith("--")]
+    render, control_port = render_options(sys.argv)
+    main(args[0] if args else 0, mouse="--no-mouse" not in sys.argv, swipes="--no-swipes" not in sys.argv,
+         devices=devices_option(sys.argv), render=render, control_port=control_port)
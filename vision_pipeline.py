@@ -0,0 +1,297 @@
+'''   threaded capture -> inference -> render pipeline  '''
+
+import cv2                 # for cam and vision
+import threading           # for stage threads
+import time                # for timing and pacing
+import sys                 # for benchmark entry point
+from metrics import metrics  # per-stage timing
+from motion_gate import MotionGate, NO_HANDS  # skip inference while idle
+from render_policy import ExitControl, RenderPolicy  # preview throttling / headless stop control
+
+
+def draw_hand(canvas, hand_landmarks):
+    ''' mediapipe landmark drawing - mediapipe is imported on the first drawn frame, not by headless runs / replays '''
+    import mediapipe as mp
+    mp.solutions.drawing_utils.draw_landmarks(canvas, hand_landmarks, mp.solutions.hands.HAND_CONNECTIONS)
+
+
+class LatestSlot:
+    ''' single slot buffer between two stages - a new item overwrites an unread one
+    so the next stage always works on the newest frame ("latest frame wins") '''
+
+    def __init__(self, name="slot"):
+        self.name = name            # used for the dropped frames counter
+        self.cond = threading.Condition()
+        self.item = None
+        self.seq = 0                # increases on every put
+        self.read_seq = 0           # seq of last item taken
+        self.overwritten = 0        # items replaced before anyone read them
+        self.closed = False
+
+    def put(self, item, wait=False):
+        ''' store item, with wait=True block until the previous item was taken (lossless) '''
+        with self.cond:
+            if wait:
+                while self.seq > self.read_seq and not self.closed:
+                    self.cond.wait()
+            if self.seq > self.read_seq:
+                self.overwritten += 1
+                metrics.count(f"frames.dropped.{self.name}")
+            self.item = item
+            self.seq += 1
+            self.cond.notify_all()
+
+    def get(self, timeout=None):
+        ''' wait for an item newer than the last one taken, None when closed '''
+        with self.cond:
+            while self.seq == self.read_seq and not self.closed:
+                if not self.cond.wait(timeout):
+                    return None
+            if self.seq == self.read_seq:
+                return None
+            self.read_seq = self.seq
+            item, self.item = self.item, None
+            self.cond.notify_all()
+            return item
+
+    def close(self):
+        with self.cond:
+            self.closed = True
+            self.cond.notify_all()
+
+
+class Frame:
+    ''' one camera frame travelling through the pipeline '''
+
+    __slots__ = ("index", "image", "results", "captured_at", "inferred_at", "canvas")
+
+    def __init__(self, index, image, captured_at):
+        self.index = index                  # frame number from capture
+        self.image = image                  # mirrored BGR image
+        self.results = None                 # mediapipe results (after inference)
+        self.captured_at = captured_at      # perf_counter at cap.read
+        self.inferred_at = None             # perf_counter after hands.process
+        self.canvas = None                  # image to draw the overlay on, None - frame is not shown
+
+
+class VisionPipeline:
+    ''' runs capture, mediapipe inference and render/dispatch on separate threads.
+    source can be a camera index or a video file, window=None runs headless,
+    render - render_policy mode ("headless", "preview:10", "downscale:0.5", ...),
+    control_port - local socket that accepts "quit" (see render_policy),
+    roi=True runs inference on a crop around the last hand (see roi_tracking),
+    idle_gate=True skips inference while nothing moves (see motion_gate) '''
+
+    def __init__(self, source=0, width=None, height=None, window=None, realtime=None, roi=False,
+                 idle_gate=False, max_num_hands=1, min_detection_confidence=0.7, min_tracking_confidence=0.7,
+                 render=None, control_port=None):
+        self.source = source
+        self.width = width                  # requested camera resolution
+        self.height = height
+        self.render = RenderPolicy.parse(render, window)
+        self.window = self.render.window    # window title for preview (None - headless)
+        self.control_port = control_port
+        self.is_file = isinstance(source, str) and not source.isdigit()
+        # video files: realtime=True paces them at file fps like a camera,
+        # otherwise every frame is processed (lossless, for benchmarks)
+        self.realtime = (not self.is_file) if realtime is None else realtime
+        self.roi = roi
+        self.cap = None                     # opened ahead of run() by open() (eg. on a startup thread)
+        self.tracker = None                 # built ahead of run() by warm_up()
+        self.gate = MotionGate() if idle_gate else None
+        self.hands_options = dict(max_num_hands=max_num_hands,
+                                  min_detection_confidence=min_detection_confidence,
+                                  min_tracking_confidence=min_tracking_confidence)
+
+        self.captured = LatestSlot("capture")     # capture -> inference
+        self.inferred = LatestSlot("inference")   # inference -> render
+        self.running = False
+        self.error = None
+
+        # counters
+        self.frames_captured = 0
+        self.frames_inferred = 0
+        self.frames_rendered = 0
+
+    def open(self):
+        ''' open camera or video file '''
+        cap = cv2.VideoCapture(int(self.source) if not self.is_file else self.source)
+        if not cap.isOpened():
+            raise IOError(f"Could not open video source {self.source}")
+        if self.width and not self.is_file:
+            cap.set(cv2.CAP_PROP_FRAME_WIDTH, self.width)
+        if self.height and not self.is_file:
+            cap.set(cv2.CAP_PROP_FRAME_HEIGHT, self.height)
+        self.cap = cap
+        return cap
+
+    def warm_up(self):
+        ''' build mediapipe and run it once before run() - the first frame does not wait for model loading.
+        safe to call on another thread while the camera opens '''
+        tracker = self._make_tracker()
+        with metrics.timer("warm_up"):
+            tracker.warm_up(self.width or 640, self.height or 480)
+        self.tracker = tracker
+        return tracker
+
+    def _make_tracker(self):
+        ''' mediapipe hands (see roi_tracking) - imported here, where the model is built '''
+        from roi_tracking import HandTracker
+        return HandTracker(roi=self.roi, **self.hands_options)
+
+    def _capture(self, cap):
+        ''' capture stage - read and mirror frames '''
+        interval = 0
+        if self.is_file and self.realtime:
+            fps = cap.get(cv2.CAP_PROP_FPS) or 30
+            interval = 1.0 / fps
+        next_time = time.perf_counter()
+        try:
+            while self.running:
+                with metrics.timer("capture"):
+                    success, image = cap.read()
+                if not success:
+                    if self.is_file:                    # end of video
+                        break
+                    print("Warning: Frame read failed")
+                    metrics.count("frames.failed")
+                    time.sleep(0.1)
+                    continue
+                image = cv2.flip(image, 1)              # horizontal flip
+                frame = Frame(self.frames_captured, image, time.perf_counter())
+                self.frames_captured += 1
+                metrics.count("frames.captured")
+                self.captured.put(frame, wait=not self.realtime)
+                if interval:                            # pace video file like a camera
+                    next_time += interval
+                    time.sleep(max(0, next_time - time.perf_counter()))
+        except Exception as e:
+            self.error = e
+        finally:
+            cap.release()
+            self.captured.close()
+
+    def _infer(self):
+        ''' inference stage - mediapipe hands on the newest frame '''
+        try:
+            tracker = self.tracker or self._make_tracker()  # warmed up or created here
+            with tracker:
+                self.tracker = tracker
+                while True:
+                    frame = self.captured.get()
+                    if frame is None:
+                        break
+                    if self.gate and not self.gate.should_infer(frame.image, frame.captured_at):
+                        frame.results = NO_HANDS                # idle - nothing moved, no recent hand
+                    else:
+                        with metrics.timer("inference"):
+                            frame.results = tracker.process(frame.image)
+                        self.frames_inferred += 1
+                        metrics.count("frames.inferred")
+                    frame.inferred_at = time.perf_counter()
+                    if self.gate:
+                        self.gate.report(frame.results, frame.inferred_at)
+                    self.inferred.put(frame, wait=not self.realtime)
+        except Exception as e:
+            self.error = e
+        finally:
+            self.inferred.close()
+
+    def run(self, handler, max_frames=None):
+        ''' run pipeline until ESC / end of video. handler(frame) is called on this
+        (main) thread for every inferred frame - draw and dispatch actions there '''
+        cap, self.cap = self.cap or self.open(), None   # capture thread owns (and releases) it
+        control = ExitControl(self.control_port, status=self.stats)
+        control.install_signals()                        # Ctrl+C / SIGTERM end the loop cleanly
+        self.running = True
+        self.started_at = time.perf_counter()
+        self.cpu_started_at = time.process_time()         # cpu seconds used by this process
+        next_cpu_report = self.started_at + 1.0
+        threads = [threading.Thread(target=self._capture, args=(cap,), name="capture", daemon=True),
+                   threading.Thread(target=self._infer, name="inference", daemon=True)]
+        for t in threads:
+            t.start()
+
+        try:
+            while not control.stopped:
+                frame = self.inferred.get(timeout=0.5)
+                if frame is None:
+                    if self.inferred.closed:
+                        break
+                    continue                            # no frame yet - check the stop flag again
+                if self.render.should_render(frame.captured_at):
+                    frame.canvas = self.render.canvas(frame.image)
+                try:
+                    with metrics.timer("render"):
+                        handler(frame)
+                except Exception as e:
+                    metrics.error("main loop", e)
+                self.frames_rendered += 1
+                metrics.count("frames")                 # rate of this counter = fps
+
+                if frame.canvas is not None and self.window:
+                    with metrics.timer("display"):
+                        key = self.render.show(frame.canvas)
+                    if key == 27:                       # ESC
+                        break
+                metrics.observe("frame", time.perf_counter() - frame.captured_at)   # capture -> shown
+                if metrics.enabled and time.perf_counter() >= next_cpu_report:
+                    metrics.gauge("cpu_percent", self.cpu_percent())
+                    next_cpu_report += 1.0
+                if max_frames and self.frames_rendered >= max_frames:
+                    break
+        finally:
+            control.close()
+            self.stop(threads)
+        if self.error:
+            raise self.error
+        return self.stats()
+
+    def stop(self, threads=()):
+        ''' stop stage threads '''
+        self.running = False
+        self.captured.close()
+        self.inferred.close()
+        for t in threads:
+            t.join(timeout=2)
+        self.elapsed = time.perf_counter() - self.started_at
+        self.render.close()
+
+    def cpu_percent(self):
+        ''' average cpu use since start (100 = one full core) '''
+        elapsed = time.perf_counter() - self.started_at
+        return (time.process_time() - self.cpu_started_at) / elapsed * 100 if elapsed else 0.0
+
+    def stats(self):
+        ''' frame counters and fps '''
+        elapsed = getattr(self, "elapsed", None) or (time.perf_counter() - self.started_at)
+        tracker = self.tracker.stats() if self.tracker else {}
+        gate = self.gate.stats() if self.gate else {}
+        return {
+            **tracker,
+            **gate,
+            **self.render.stats(),
+            "cpu_percent": self.cpu_percent(),
+            "captured": self.frames_captured,
+            "inferred": self.frames_inferred,
+            "rendered": self.frames_rendered,
+            "dropped": self.captured.overwritten + self.inferred.overwritten,
+            "fps": self.frames_rendered / elapsed if elapsed else 0.0,
+            "elapsed": elapsed,
+        }
+
+
+'''headless benchmark - python vision_pipeline.py video.mp4 [--realtime] [--roi] [--idle]'''
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print("usage: python vision_pipeline.py <video file | camera index> [--realtime] [--roi] [--idle]")
+        sys.exit(1)
+    latency = []
+    pipeline = VisionPipeline(sys.argv[1], realtime=True if "--realtime" in sys.argv else None,
+                              roi="--roi" in sys.argv, idle_gate="--idle" in sys.argv)
+    stats = pipeline.run(lambda frame: latency.append(frame.inferred_at - frame.captured_at))
+    latency.sort()
+    for key, value in stats.items():
+        print(f"{key:10}: {value:.2f}" if isinstance(value, float) else f"{key:10}: {value}")
+    if latency:
+        print(f"capture->inference p50: {latency[len(latency)//2]*1000:.1f} ms")
@@ -0,0 +1,255 @@
+'''   compiled voice command grammar - inverted index, parameters, batched device commands
+
+phrases are the keys of AndroidVoiceController.commands, the values are shell templates:
+  "scroll down": "input swipe 500 500 500 1500"
+  "tap {x} {y}": "input tap {x} {y}"          - number slots
+  "type {text}": "input text {text}"          - rest of the sentence
+  "stop": None                                - exit
+every phrase can be repeated ("scroll down 5", "go back twice") and chained
+("scroll down three times and go home"). all device commands of one sentence are
+joined with ";" and sent as one shell line.
+
+matching looks up the heard words in a word -> phrases index. a phrase is only indexed
+under its rarest words - just enough of them that it can not reach MIN_SCORE without
+hearing one - so a common word ("open", "go") does not pull in every phrase using it and
+the time stays flat as the vocabulary grows.
+'''
+
+import math                # for required word count
+import re                  # for splitting sentences
+import shlex               # for quoting typed text
+import time                # for benchmark
+from collections import defaultdict  # for inverted index
+
+''' config '''
+
+MIN_SCORE = 0.6             # share of phrase words that must be heard (same as command_similarity)
+MAX_REPEAT = 20             # upper limit for "scroll down 50 times"
+SEPARATORS = r"\s+(?:and then|and|then)\s+"
+COUNT_WORDS = {"once": 1, "twice": 2, "thrice": 3}
+TIMES_WORDS = {"times", "time", "x"}
+
+NUMBER_WORDS = {
+    "zero": 0, "one": 1, "two": 2, "three": 3, "four": 4, "five": 5, "six": 6, "seven": 7,
+    "eight": 8, "nine": 9, "ten": 10, "eleven": 11, "twelve": 12, "thirteen": 13,
+    "fourteen": 14, "fifteen": 15, "sixteen": 16, "seventeen": 17, "eighteen": 18,
+    "nineteen": 19, "twenty": 20, "thirty": 30, "forty": 40, "fifty": 50,
+    "sixty": 60, "seventy": 70, "eighty": 80, "ninety": 90, "hundred": 100,
+}
+
+
+def parse_number(word):
+    ''' "5" / "five" -> 5, else None '''
+    if word.isdigit():
+        return int(word)
+    return NUMBER_WORDS.get(word)
+
+
+class Rule:
+    ''' one compiled phrase - literal words, slot names and the shell template '''
+
+    def __init__(self, phrase, template, order):
+        self.phrase = phrase
+        self.template = template
+        self.order = order              # position in the command dict (tie break)
+        tokens = phrase.split()
+        self.words = [t for t in tokens if not t.startswith("{")]
+        self.word_set = set(self.words)
+        self.slots = [t[1:-1] for t in tokens if t.startswith("{")]
+        self.text_slot = "text" in self.slots
+        self.number_slots = [s for s in self.slots if s != "text"]
+        self.name = " ".join(self.words)
+
+
+class Command:
+    ''' a matched sentence - readable name, device commands and whether it stops listening '''
+
+    def __init__(self, parts, commands, stop):
+        self.parts = parts              # readable name per part eg. ["scroll down x3", "go home"]
+        self.commands = commands        # shell commands in order
+        self.stop = stop
+
+    @property
+    def name(self):
+        return " + ".join(self.parts)
+
+    @property
+    def shell_line(self):
+        ''' all commands as one shell invocation '''
+        return "; ".join(self.commands) if self.commands else None
+
+
+class CommandGrammar:
+    ''' compiles the phrase -> template dict into an inverted word index '''
+
+    def __init__(self, commands, min_score=MIN_SCORE, max_repeat=MAX_REPEAT):
+        self.min_score = min_score
+        self.max_repeat = max_repeat
+        self.rules = [Rule(phrase, template, i) for i, (phrase, template) in enumerate(commands.items())]
+
+        # word -> rules indexed under it (rarest words of each rule only)
+        frequency = defaultdict(int)
+        for rule in self.rules:
+            for word in rule.word_set:
+                frequency[word] += 1
+        self.index = defaultdict(list)
+        self.text_rules = [rule for rule in self.rules if rule.text_slot]   # matched by text_rule only
+        for rule in self.rules:
+            if rule.text_slot:
+                continue
+            required = math.floor(min_score * len(rule.word_set)) + 1     # words needed for score > min_score
+            rarest = sorted(rule.word_set, key=lambda w: (frequency[w], w))
+            for word in rarest[:len(rule.word_set) - required + 1]:
+                self.index[word].append(rule)
+
+    @property
+    def phrases(self):
+        ''' readable phrases for help text, eg. "tap {x} {y}" '''
+        return [rule.phrase for rule in self.rules]
+
+    @property
+    def keywords(self):
+        ''' phrases without slots (for keyword spotting) '''
+        return [rule.phrase for rule in self.rules if not rule.slots]
+
+    def best_rule(self, words):
+        ''' highest scoring rule for a word list - only rules indexed under a heard word are scored '''
+        heard = set(words)
+        candidates = set()
+        for word in heard:
+            candidates.update(self.index.get(word, ()))
+        best, best_key = None, None
+        for rule in candidates:
+            score = len(rule.word_set & heard) / len(rule.word_set)
+            if score <= self.min_score:
+                continue
+            key = (score, len(rule.word_set), -rule.order)     # more specific phrases win ties
+            if best_key is None or key > best_key:
+                best, best_key = rule, key
+        return best
+
+    def text_rule(self, words):
+        ''' rule that takes free text and whose literal words are in the part (eg. "please type ...")
+        - (rule, number of words up to the end of its literal words) or None '''
+        for rule in self.text_rules:
+            n = len(rule.words)
+            for i in range(len(words) - n + 1):
+                if words[i:i + n] == rule.words:
+                    return rule, i + n
+        return None
+
+    def parse_part(self, words):
+        ''' one part of a sentence -> (readable name, [commands], stop) or None '''
+        rule = self.best_rule(words)
+        if rule is None:
+            return None
+        if rule.template is None:
+            return rule.name, [], True
+
+        values = {}
+        rest = [w for w in words if w not in rule.words]
+        numbers = []                    # (position in rest, value)
+        for i, word in enumerate(rest):
+            value = parse_number(word)
+            if value is not None:
+                numbers.append((i, value))
+
+        # number slots take the first numbers in order
+        if len(numbers) < len(rule.number_slots):
+            return None                 # eg. "tap" without coordinates
+        for slot, (_, value) in zip(rule.number_slots, numbers):
+            values[slot] = value
+        numbers = numbers[len(rule.number_slots):]
+
+        # repeat count - "twice", "<n> times" or a left over number
+        count = 1
+        for word in rest:
+            if word in COUNT_WORDS:
+                count = COUNT_WORDS[word]
+        for i, value in numbers:
+            if (i + 1 < len(rest) and rest[i + 1] in TIMES_WORDS) or not rule.number_slots:
+                count = value
+                break
+        count = max(1, min(count, self.max_repeat))
+
+        name = " ".join([rule.name] + [str(values[s]) for s in rule.number_slots])
+        if count > 1:
+            name += f" x{count}"
+        return name, [rule.template.format(**values)] * count, False
+
+    def parse(self, text):
+        ''' heard sentence -> Command or None when any part does not match '''
+        pieces = re.split(f"({SEPARATORS})", text.lower().strip())
+        parts, commands = [], []
+        i = 0
+        while i < len(pieces):
+            words = pieces[i].split()
+            found = self.text_rule(words)
+            if found is not None:
+                # free text takes the rest of the sentence ("type salt and pepper")
+                rule, skip = found
+                typed = "".join(pieces[i:]).split(None, skip)[skip:]
+                if not typed:
+                    return None
+                text_value = shlex.quote(typed[0].replace(" ", "%s"))   # input text uses %s for spaces
+                parts.append(f"{rule.name} {typed[0]}")
+                commands.append(rule.template.format(text=text_value))
+                break
+            parsed = self.parse_part(words)
+            if parsed is None:
+                return None
+            name, part_commands, stop = parsed
+            parts.append(name)
+            commands += part_commands
+            if stop:
+                return Command(parts, commands, True)
+            i += 2                      # skip the separator
+        return Command(parts, commands, False) if parts else None
+
+
+def linear_match(commands, text, min_score=MIN_SCORE):
+    ''' the old matcher - scores every phrase (for the benchmark) '''
+    heard = set(text.split())
+    best, best_score = None, 0
+    for command in commands:
+        words = set(command.split())
+        score = len(words & heard) / len(words)
+        if score > best_score and score > min_score:
+            best, best_score = command, score
+    return best
+
+
+def benchmark(sizes=(10, 100, 1000, 5000), repeat=2000):
+    ''' match time per sentence for growing vocabularies - inverted index vs scoring every phrase '''
+    sentences = ["scroll down three times", "tap 300 800", "please go home", "open app 7 now"]
+    for size in sizes:
+        commands = {"scroll down": "input swipe 500 500 500 1500", "tap {x} {y}": "input tap {x} {y}",
+                    "go home": "input keyevent KEYCODE_HOME"}
+        for i in range(size):
+            commands[f"open app{i} page{i}"] = f"am start -n app{i}"
+        grammar = CommandGrammar(commands)
+
+        start = time.perf_counter()
+        for n in range(repeat):
+            grammar.parse(sentences[n % len(sentences)])
+        indexed = (time.perf_counter() - start) / repeat
+
+        start = time.perf_counter()
+        for n in range(repeat // 10):
+            linear_match(commands, sentences[n % len(sentences)])
+        linear = (time.perf_counter() - start) / (repeat // 10)
+        print(f"{len(commands):5} phrases: index {indexed*1e6:7.1f} us   linear {linear*1e6:8.1f} us")
+
+
+'''test - python voice_commands.py ["sentence" ...]'''
+if __name__ == "__main__":
+    import sys
+    from speech_recognization import AndroidVoiceController
+
+    if len(sys.argv) > 1:
+        grammar = AndroidVoiceController().grammar     # shell is only opened when a command runs
+        for sentence in sys.argv[1:]:
+            command = grammar.parse(sentence)
+            print(f"{sentence!r:40} -> {command.name + ' | ' + str(command.shell_line) if command else None}")
+    else:
+        benchmark()
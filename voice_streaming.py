@@ -0,0 +1,267 @@
+'''   streaming voice commands - cut utterances early, keyword spot first, recognizers in parallel
+
+instead of recognizer.listen (waits pause_threshold = 1 s of silence) and google -> sphinx one
+after the other, microphone frames are read continuously and an energy segmenter ends the
+utterance after END_SILENCE. the offline keyword spotter runs first for the fixed vocabulary,
+if it is not sure every recognizer runs at the same time and the first confident match wins.
+
+  python speech_recognization.py --stream                       # microphone
+  python voice_streaming.py cmd.wav --script "scroll up"        # WAV file + stand-in recognizer
+'''
+
+import concurrent.futures  # for parallel recognizers
+import threading           # for stand-in recognizer lock
+import time                # for timing
+import wave                # for WAV input
+
+import numpy as np         # for frame energy
+import speech_recognition as sr  # for AudioData and sphinx keyword mode
+
+from action_dispatcher import ActionDispatcher  # utterances handled off the capture loop, in order
+from metrics import metrics                     # segment / recognizer latency
+
+''' config '''
+
+FRAME_SECONDS = 0.03        # audio frame size
+END_SILENCE = 0.35          # silence that ends an utterance (recognizer.pause_threshold was 1.0)
+MIN_SPEECH = 0.15           # shorter bursts are ignored (clicks, bumps)
+MAX_UTTERANCE = 3.0         # same as phrase_time_limit
+PRE_ROLL = 0.2              # audio kept from before speech started (first syllable)
+KEYWORD_SENSITIVITY = 0.8   # sphinx keyword spotting sensitivity (0-1)
+
+
+class EnergySegmenter:
+    ''' cuts a stream of 16 bit frames into utterances using RMS energy '''
+
+    def __init__(self, sample_rate, sample_width, threshold, end_silence=END_SILENCE,
+                 min_speech=MIN_SPEECH, max_length=MAX_UTTERANCE, pre_roll=PRE_ROLL):
+        self.sample_rate = sample_rate
+        self.sample_width = sample_width
+        self.dtype = {2: np.int16, 4: np.int32}[sample_width]
+        self.threshold = threshold
+        self.end_silence = end_silence
+        self.min_speech = min_speech
+        self.max_length = max_length
+        self.pre_roll_bytes = int(pre_roll * sample_rate) * sample_width
+        self.reset()
+
+    def reset(self):
+        self.buffer = bytearray()       # current utterance (or pre roll while silent)
+        self.speaking = False
+        self.speech = 0.0               # seconds above threshold in current utterance
+        self.silence = 0.0              # seconds of silence since last speech frame
+
+    def energy(self, chunk):
+        samples = np.frombuffer(chunk, dtype=self.dtype).astype(np.float64)
+        if self.sample_width == 4:
+            samples /= 65536                            # same scale as 16 bit (energy_threshold units)
+        return float(np.sqrt(np.mean(samples ** 2))) if len(samples) else 0.0
+
+    def feed(self, chunk):
+        ''' add one frame, returns utterance bytes when one just ended, else None '''
+        seconds = len(chunk) / (self.sample_rate * self.sample_width)
+        loud = self.energy(chunk) > self.threshold
+        self.buffer += chunk
+
+        if not self.speaking:
+            if loud:
+                self.speaking = True
+                self.speech = seconds
+                self.silence = 0.0
+            elif len(self.buffer) > self.pre_roll_bytes:
+                del self.buffer[:len(self.buffer) - self.pre_roll_bytes]      # keep only pre roll
+            return None
+
+        if loud:
+            self.speech += seconds
+            self.silence = 0.0
+        else:
+            self.silence += seconds
+        length = len(self.buffer) / (self.sample_rate * self.sample_width)
+        if self.silence >= self.end_silence or length >= self.max_length:
+            utterance = bytes(self.buffer) if self.speech >= self.min_speech else None
+            self.reset()
+            return utterance
+        return None
+
+    def flush(self):
+        ''' end of stream - return what is left if it was speech '''
+        utterance = bytes(self.buffer) if self.speaking and self.speech >= self.min_speech else None
+        self.reset()
+        return utterance
+
+
+class KeywordSpotter:
+    ''' offline keyword spotting for the fixed command list (pocketsphinx keyword mode) '''
+
+    def __init__(self, recognizer, commands, sensitivity=KEYWORD_SENSITIVITY):
+        self.recognizer = recognizer
+        self.keywords = [(command, sensitivity) for command in commands]
+        self.available = True           # False after pocketsphinx turned out to be missing
+
+    def __call__(self, audio):
+        if not self.available:
+            raise sr.UnknownValueError()
+        try:
+            return self.recognizer.recognize_sphinx(audio, keyword_entries=self.keywords)
+        except sr.RequestError:
+            self.available = False                      # pocketsphinx not installed
+            raise sr.UnknownValueError()
+
+
+class ScriptedRecognizer:
+    ''' local stand-in recognizer for tests - returns the next text of a script for every
+    utterance ("" = not understood), optional delay like a network recognizer '''
+
+    def __init__(self, texts, delay=0.0):
+        self.texts = list(texts)
+        self.delay = delay
+        self.lock = threading.Lock()
+        self.calls = 0
+
+    def __call__(self, audio):
+        time.sleep(self.delay)
+        with self.lock:
+            index = self.calls
+            self.calls += 1
+        if index >= len(self.texts) or not self.texts[index]:
+            raise sr.UnknownValueError()
+        return self.texts[index]
+
+
+class StreamingVoice:
+    ''' streaming front end for AndroidVoiceController - uses its commands, recognizers and adb '''
+
+    def __init__(self, controller, keyword_spotting=True, workers=None):
+        self.controller = controller
+        self.spotter = KeywordSpotter(controller.recognizer, controller.grammar.keywords) \
+            if keyword_spotting else None
+        self.pool = concurrent.futures.ThreadPoolExecutor(max_workers=workers or max(2, len(controller.recognizers)),
+                                                          thread_name_prefix="recognizer")
+        self.utterances = ActionDispatcher(max_pending=4, name="utterances", user_actions=False).start()
+        self.results = []               # (matched command, seconds from end of speech to action)
+
+    def recognize_parallel(self, audio):
+        ''' run all recognizers at once, return the first text that matches a command
+        (or the best non matching text when none is confident) '''
+        controller = self.controller
+        futures = {self.pool.submit(controller.run_recognizer, name, recognize, audio): i
+                   for i, (name, recognize) in enumerate(controller.recognizers)}
+        texts = {}
+        pending = set(futures)
+        while pending:
+            done, pending = concurrent.futures.wait(pending, return_when=concurrent.futures.FIRST_COMPLETED)
+            for future in done:
+                text = future.result()
+                if text and controller.match_command(text):
+                    for other in pending:
+                        other.cancel()                  # not started yet - skip, running ones are ignored
+                    return text
+                texts[futures[future]] = text
+        for i in sorted(texts):                         # recognizer priority order
+            if texts[i]:
+                return texts[i]
+        return None
+
+    def handle_utterance(self, audio, heard_at):
+        ''' keyword spotter first, then parallel recognizers, then execute '''
+        controller = self.controller
+        metrics.count("voice.utterances")
+        controller.save_audio_debug(audio, "command_")
+
+        text = None
+        if self.spotter is not None:
+            text = controller.run_recognizer("keywords", self.spotter, audio)
+            if text and not controller.match_command(text):
+                text = None
+        if text is None:
+            text = self.recognize_parallel(audio)
+        matched = controller.execute_text(text, heard_at)
+        self.results.append((matched, time.perf_counter() - heard_at))
+        metrics.observe("voice.utterance_to_action", time.perf_counter() - heard_at)
+        return matched
+
+    def run(self, frames, sample_rate, sample_width):
+        ''' read frames until the controller stops listening (or the stream ends) '''
+        segmenter = EnergySegmenter(sample_rate, sample_width, self.controller.recognizer.energy_threshold)
+
+        def utterance_ready(data):
+            audio = sr.AudioData(data, sample_rate, sample_width)
+            metrics.observe("voice.utterance_length", len(data) / (sample_rate * sample_width))
+            self.utterances.submit(self.handle_utterance, audio, time.perf_counter())
+
+        for chunk in frames:
+            if not self.controller.listening:
+                break
+            data = segmenter.feed(chunk)
+            if data:
+                utterance_ready(data)
+        data = segmenter.flush()
+        if data:
+            utterance_ready(data)
+
+    def listen_microphone(self):
+        ''' listening thread target - continuous microphone frames '''
+        with self.controller.microphone as source:
+            self.controller.calibrate(source)
+            print("Ready (streaming). Speak clearly 🔽")
+            print(", ".join(f"'{p}'" for p in self.controller.grammar.phrases), "\n")
+            self.run(microphone_frames(source), source.SAMPLE_RATE, source.SAMPLE_WIDTH)
+        self.close()
+
+    def run_wav(self, path, realtime=False):
+        ''' feed a WAV file like a microphone (realtime=True paces it) '''
+        with wave.open(path, "rb") as wf:
+            if wf.getnchannels() != 1:
+                raise ValueError(f"{path}: only mono WAV files are supported")
+            self.run(wav_frames(wf, realtime), wf.getframerate(), wf.getsampwidth())
+        self.utterances.wait_idle()
+
+    def close(self):
+        self.utterances.stop()
+        self.pool.shutdown(wait=False)
+
+
+def microphone_frames(source):
+    ''' endless frames from an open sr.Microphone '''
+    while True:
+        yield source.stream.read(source.CHUNK)
+
+
+def wav_frames(wf, realtime=False):
+    ''' FRAME_SECONDS frames from an open WAV file '''
+    count = int(wf.getframerate() * FRAME_SECONDS)
+    start = time.perf_counter()
+    played = 0.0
+    while True:
+        chunk = wf.readframes(count)
+        if not chunk:
+            return
+        yield chunk
+        played += FRAME_SECONDS
+        if realtime:
+            time.sleep(max(0.0, played - (time.perf_counter() - start)))
+
+
+'''test with a WAV file - python voice_streaming.py cmd.wav [--script text ...] [--delay 0.5] [--realtime]'''
+if __name__ == "__main__":
+    import argparse
+    from speech_recognization import AndroidVoiceController
+
+    parser = argparse.ArgumentParser(description="streaming voice commands from a WAV file")
+    parser.add_argument("wav")
+    parser.add_argument("--script", nargs="*", help="stand-in recognizer texts, one per utterance")
+    parser.add_argument("--delay", type=float, default=0.0, help="stand-in recognizer delay (s)")
+    parser.add_argument("--realtime", action="store_true", help="feed the file at real time speed")
+    parser.add_argument("--no-keywords", action="store_true", help="skip sphinx keyword spotting")
+    args = parser.parse_args()
+
+    controller = AndroidVoiceController(
+        recognizers=[("script", ScriptedRecognizer(args.script, args.delay))] if args.script is not None else None)
+    controller.debug_audio = False
+    controller.listening = True
+    streaming = StreamingVoice(controller, keyword_spotting=not args.no_keywords)
+    streaming.run_wav(args.wav, args.realtime)
+    streaming.close()
+    for matched, latency in streaming.results:
+        print(f"{matched or '-':12} {latency*1000:.0f} ms")